@@ -1,91 +1,131 @@
 #!/usr/bin/python
 #
-# 0c_Taggart_TAIS_pre_parser.py - A pre-parser for *.raw files of 
-# Terrestrial AIS data, sourced from Dr. Chris Taggart's East Coast 
-# network of receivers. This script iterates over a number of input 
-# files, concatenating them into a single output, while prepending 
-# date values to NMEA lines and dropping empty lines. The output 
+# 0c_Taggart_TAIS_pre_parser.py - A pre-parser for *.raw files of
+# Terrestrial AIS data, sourced from Dr. Chris Taggart's East Coast
+# network of receivers. This script iterates over a number of input
+# files, concatenating them into a single output, while prepending
+# date values to NMEA lines and dropping empty lines. The output
 # should be suitable for subsequent parsing via 0_gpsd_ais_NM4_parsing.py
 #
 
 # CH20171205 Added parentheses to print calls for Python3 compatibility.
 
-from glob import glob 
-import os, sys
-from datetime import datetime, timedelta
-from pytz import timezone
-import pytz
+# Restructured into functions. The UTC prefix is formatted once per date
+# header, converting local time through a table of the America/Halifax
+# UTC offset transitions (derived from pytz) rather than localizing every
+# header, and input files may be processed over a pool of processes (-p).
+# The pre-parsing itself now lives in taggart_raw.py, so that the NM4
+# parsing scripts can decode *.raw files directly (--from-taggart-raw).
+# With -s, only a time slice is pre-parsed, read from the region of each
+# input file found through its sidecar date header index.
 
-usage_msg = ("\nUsage: 0c_Taggart_TAIS_pre_parser.py outfilename infile1 {infile2, infile3, ...}\n"
+from glob import glob
+import os, sys, getopt, shutil
+from multiprocessing import Pool
+
+usage_msg = ("\nUsage: 0c_Taggart_TAIS_pre_parser.py [-p processes] [-s start..end] outfilename infile1 {infile2, infile3, ...}\n"
             "Where outfilename is the path to the output file under which the concatenated results "
-            "will be stored, and infile1 ... are the *.raw input files of T-AIS data to be concatenated."
+            "will be stored, and infile1 ... are the *.raw input files of T-AIS data to be concatenated. "
+            "With -p, the input files are pre-parsed over a pool of that many processes, and the results "
+            "concatenated in input order. With -s, only the lines received from start up to (but excluding) end, "
+            "each given as UTC YYYYmmddTHHMMSS or epoch seconds, are pre-parsed, reading just the region of each "
+            "input file holding them through its date header index (infile.idx, built or extended as needed)."
 )
 
-# Establish the timezones to be used.
-utctz = pytz.utc
-localtz = timezone('America/Halifax')
-
-# If at least two arguments are not provided, display an usage message.
-if (len(sys.argv) < 3):
-    print (usage_msg)
-    quit()
-    
-# retrieve the output directory and filename prefix
-out_filename = sys.argv[1]
-
-# Check the output file for existence before running.
-if os.path.exists(out_filename):
-    print ("Error, output file exists: (" + out_filename +  ") aborting.")
-    quit()
-        
-# Open the output file.
-with open(out_filename,'w') as outfile:
-
-    # Process each input file reference passed as input.
-    for infile_index in range(len(sys.argv) - 2):
-
-        # Attempt wildcard expansion on any input file specified.
-        for in_filename in glob(sys.argv[(2 + infile_index)]):
-        
-            print ("Processing: " + in_filename)
-            
-            # Open the incoming filename.
-            with open(in_filename,'r') as in_T_AIS_records:
-            
-                # Reset a counter into the input file.
-                in_line_counter = 0
-            
-                # Initialize a date string to be stamped across output NMEA lines.
-                curr_date_text = ""
-            
-                # Iterate over the lines in the incoming records.
-                for line in in_T_AIS_records:
-                
-                    # Strip any leading / trailing whitespace characters from 
-                    # the input line.
-                    strip_line = line.strip()
-                
-                    # If the line is empty, skip it.
-                    if (strip_line == ""):
-                        continue
-                        
-                    # If the line is a date header, copy its value for the 
-                    # succeeding line.
-                    elif (strip_line[-5:] == "data:"):
-                    
-                        # Extract the date portion of the line, and formate as a datetime object.
-                        curr_date_text = strip_line[:-5].strip()
-                        formatted_local_date = datetime.strptime(curr_date_text, "%d,%m,%y,%H,%M,%S,%Z")
-                        
-                        # Interpret the date as local to America/Halifax (sic) 
-                        # including provision for daylight savings.
-                        formatted_utc_date = localtz.localize(formatted_local_date).astimezone(utctz)
-                        
-                    # If the line is not empty, nor a date, copy it to output, 
-                    # with the data header as a prefix.
-                    else:
-                    
-                        # Original -- Carry original date through.
-                        #outfile.write(curr_date_text + " " + strip_line + "\n")
-                        # Output the UTC date, reformatted as: yyyymmddTHHMMSS.000Z
-                        outfile.write(formatted_utc_date.strftime("%Y%m%dT%H%M%S") + ".000Z " + strip_line + "\n")
+from taggart_raw import *
+from nm4_decoder import parse_time_slice
+
+# Function (pre_parse_file) - Pre-parse a single T-AIS input file, writing to an open output.
+def pre_parse_file(in_filename, outfile, time_slice=None):
+
+    source = open_pre_parsed(in_filename, time_slice=time_slice)
+    try:
+        outfile.writelines(source.lines)
+    finally:
+        source.close()
+
+# Function (pre_parse_part) - Pool worker, pre-parsing a single T-AIS input file to a part file.
+def pre_parse_part(in_args):
+
+    (in_filename, part_filename, time_slice) = in_args
+    with open(part_filename, 'w', buffering=io_buffer_size) as part_file:
+        pre_parse_file(in_filename, part_file, time_slice)
+    return part_filename
+
+def main():
+
+    try:
+        (options, arguments) = getopt.getopt(sys.argv[1:], "?p:s:")
+    except getopt.GetoptError as msg:
+        print ("0c_Taggart_TAIS_pre_parser.py: " + str(msg))
+        print (usage_msg)
+        quit()
+
+    processes = 1
+    time_slice = None
+    for (switch, val) in options:
+        if switch == '-p':
+            try:
+                processes = int(val)
+            except ValueError:
+                processes = 0
+            if processes < 1:
+                print ("Error, processes must be a positive integer.")
+                print (usage_msg)
+                quit()
+        elif switch == '-s':
+            try:
+                time_slice = parse_time_slice(val)
+            except ValueError as msg:
+                print ("Error, " + str(msg))
+                print (usage_msg)
+                quit()
+        else:
+            print (usage_msg)
+            quit()
+
+    # If at least two arguments are not provided, display an usage message.
+    if (len(arguments) < 2):
+        print (usage_msg)
+        quit()
+
+    # retrieve the output directory and filename prefix
+    out_filename = arguments[0]
+
+    # Check the output file for existence before running.
+    if os.path.exists(out_filename):
+        print ("Error, output file exists: (" + out_filename +  ") aborting.")
+        quit()
+
+    # Attempt wildcard expansion on any input file specified.
+    in_filenames = []
+    for in_fileref in arguments[1:]:
+        in_filenames.extend(glob(in_fileref))
+
+    # Open the output file.
+    with open(out_filename, 'w', buffering=io_buffer_size) as outfile:
+
+        # Process each input file in turn.
+        if processes == 1:
+            for in_filename in in_filenames:
+                print ("Processing: " + in_filename)
+                pre_parse_file(in_filename, outfile, time_slice)
+
+        # Or pre-parse the input files to part files over a pool of processes,
+        # appending each part to the output, in input order, as it is ready.
+        else:
+            part_jobs = [(in_filename, out_filename + ".part%05d" % index, time_slice) for (index, in_filename) in enumerate(in_filenames)]
+            part_pool = Pool(processes)
+            try:
+                for ((in_filename, part_filename, part_slice), done_filename) in zip(part_jobs, part_pool.imap(pre_parse_part, part_jobs)):
+                    print ("Processing: " + in_filename)
+                    with open(part_filename, 'r', buffering=io_buffer_size) as part_file:
+                        shutil.copyfileobj(part_file, outfile, io_buffer_size)
+                    os.remove(part_filename)
+            finally:
+                part_pool.close()
+                part_pool.join()
+
+# If we're invoked directly (which we generally expect), run.
+if __name__ == "__main__":
+    main()
@@ -11,7 +11,10 @@
 from glob import glob
 import sys
 import os
-import re
+import getopt
+import fileinput
+from coordinate_repair import REPAIR_KINDS, repair_coordinate
+from field_schema import SPLIT_MESSAGE_GROUPS, compile_extractor
 
 # Stackoverflow sourced short f'n for testing whether / not string values are numeric, modified from 
 # source to account for multiple number types. 
@@ -36,62 +39,166 @@ def is_integer(s):
         return False
        
 # Usage string for the script.
-USAGE_STRING = ("Usage: split_ONC_AIS_msg_type.py datafile_date outputfilename inputfilename \n\n"
+USAGE_STRING = ("Usage: split_ONC_AIS_msg_type.py [--columnar] [--chunk-lines=N] [-p processes] [--pg=connectfile,table [--pg-batch=rows]] [--format=text|pgbinary] datafile_date {outputfilename} inputfilename [inputfilename ...]\n\n"
 "Parses out 5 basic fields (MMSI, Type, Lat, Lon, Date) from Terrestrial AIS data obtained from ONC's "
 "online dmas.uvic.ca data service and pre-parsed / formatted, generates a unique line ID. Also tests that the basic fields "
 "parse properly. Inserts the 7 generated fields (5 + ID, Flag as result of parse test) along with the original line, all in a "
 "tab delimited output file. Uses OV (ONC, Venus) designation along with the datafile date to aid in generating the "
-"appropriate unique ID, based on line number within the file. Designed to handle only messages 1,2,3,5,18\n")
+"appropriate unique ID, based on line number within the file. Designed to handle only messages 1,2,3,5,18\n\n"
+"--columnar: Split the input in chunks (of --chunk-lines lines, default 100000) read as bytes, validating the basic fields "
+"and assembling the output lines as whole arrays (NumPy), giving the same output several times faster, with parse errors "
+"counted by kind rather than printed per line.\n"
+"-p: Split the input as --columnar, over a pool of that many processes, in line aligned byte chunks whose starting line "
+"numbers are counted in a first pass, giving the same output (and unique IDs) as a serial run.\n\n"
+"--pg: Instead of writing outputfilename (not given), stream the output lines into the (existing) Postgres table by COPY, "
+"in transactions of --pg-batch lines (default 10000). A batch the table will not accept is kept in table_reject "
+"(created if need be) with the error. connectfile holds the connection as host:port:dbname:user:password (as in .pgpass).\n\n"
+"--format=pgbinary: Write outputfilename in Postgres' binary COPY format, to be loaded with \\COPY table FROM 'outputfilename' "
+"(FORMAT binary), rather than as text lines. The columns are then typed as text, integer, double precision, double precision, "
+"timestamp, integer, integer and text, as those of the table must be.\n\n"
+"Several input files are split one after another, as a single input, numbering their lines in turn.\n")
 
 # Array of message types with positional information.
 POSITIONAL_MESSAGE_TYPES = [1, 2, 3, 18]
 
-# If at least four arguments are not provided, display an usage message.
-if (len(sys.argv) < 4):
-    # Adjust to print function / python3 CH 20180107 (Add parens)
+# Formatting of the output line (PG_safe_line) for each message type handled, from the tokens of the input line (see field_schema.py).
+line_extractors = dict([(msg_type, compile_extractor(group)) for (msg_type, group) in SPLIT_MESSAGE_GROUPS.items()])
+
+# Read any options ahead of the positional arguments.
+try:
+    (options, arguments) = getopt.getopt(sys.argv[1:], "p:", ["columnar", "chunk-lines=", "pg=", "pg-batch=", "format="])
+except getopt.GetoptError as msg:
+    print("Error, " + str(msg) + "\n")
     print(USAGE_STRING)
     quit()
 
-# Retrieve the datafile date (as a component of the unique_id to be generated)
-datafile_date = sys.argv[1]
-    
-# retrieve the output filename.
-out_filename = sys.argv[2]
+columnar = False
+chunk_lines = 100000
+processes = 1
+pg_output = None
+pg_batch = 10000
+out_format = 'text'
+for (switch, val) in options:
+    if switch == '--columnar':
+        columnar = True
+    elif switch == '--pg':
+        pg_output = val.split(",")
+        if len(pg_output) != 2:
+            print("Error, --pg takes a connect file and a table, separated by a comma.\n")
+            print(USAGE_STRING)
+            quit()
+    elif switch == '--format':
+        if val not in ('text', 'pgbinary'):
+            print("Error, --format must be text or pgbinary.\n")
+            print(USAGE_STRING)
+            quit()
+        out_format = val
+    elif switch == '--pg-batch':
+        try:
+            pg_batch = int(val)
+        except ValueError:
+            pg_batch = 0
+        if pg_batch < 1:
+            print("Error, --pg-batch must be a positive integer.\n")
+            print(USAGE_STRING)
+            quit()
+    elif switch == '-p':
+        try:
+            processes = int(val)
+        except ValueError:
+            processes = 0
+        if processes < 1:
+            print("Error, processes must be a positive integer.\n")
+            print(USAGE_STRING)
+            quit()
+    elif switch == '--chunk-lines':
+        try:
+            chunk_lines = int(val)
+        except ValueError:
+            chunk_lines = 0
+        if chunk_lines < 1:
+            print("Error, chunk lines must be a positive integer.\n")
+            print(USAGE_STRING)
+            quit()
+
+# A binary COPY file is written rather than streamed to Postgres.
+if out_format == 'pgbinary' and pg_output is not None:
+    print("Error, --format=pgbinary writes outputfilename, and cannot be used with --pg.\n")
+    print(USAGE_STRING)
+    quit()
+
+# The columnar splitting needs NumPy, only imported when used.
+if columnar or processes > 1:
+    from split_columnar import ONCSplitter, split_files, split_files_parallel
 
-# Check the output file for existence before running.
-if os.path.exists(out_filename):
+# If at least three arguments (two with --pg) are not provided, display an usage message.
+if (len(arguments) < (2 if pg_output is not None else 3)):
     # Adjust to print function / python3 CH 20180107 (Add parens)
-    print("Error, output file exists: (" + out_filename +  ") aborting.")
+    print(USAGE_STRING)
     quit()
-        
-# Open the output file.
-try:
 
-    out_records = open(out_filename, 'w')
+# Retrieve the datafile date (as a component of the unique_id to be generated)
+datafile_date = arguments[0]
     
-except IOError:
-    # Adjust to print function / python3 CH 20180107 (Add parens)
-    print("Error opening output file: " + out_filename + "\n")
-    quit()
+if pg_output is None:
 
-# Retrieve the input filename.
-in_filename = sys.argv[3]
+    # retrieve the output filename.
+    out_filename = arguments[1]
 
-# Check the input file for existence before running.
-if( not os.path.exists(in_filename)):
-    # Adjust to print function / python3 CH 20180107 (Add parens)
-    print("Error, input file does not exist: (" + in_filename +  ") aborting.")
-    quit()
+    # Check the output file for existence before running.
+    if os.path.exists(out_filename):
+        # Adjust to print function / python3 CH 20180107 (Add parens)
+        print("Error, output file exists: (" + out_filename +  ") aborting.")
+        quit()
+        
+    # Open the output file.
+    try:
+
+        if out_format == 'pgbinary':
+            from pgcopy_binary import BinaryCopyTextSink, split_line_column_types
+            out_records = BinaryCopyTextSink(open(out_filename, 'wb'), split_line_column_types)
+        else:
+            out_records = open(out_filename, 'w')
+    
+    except IOError:
+        # Adjust to print function / python3 CH 20180107 (Add parens)
+        print("Error opening output file: " + out_filename + "\n")
+        quit()
+
+    # Retrieve the input filenames.
+    in_filenames = arguments[2:]
+
+else:
+
+    # Retrieve the input filenames, any parts of a parallel split being written alongside the first.
+    in_filenames = arguments[1:]
+    out_filename = in_filenames[0]
+
+# Check the input files for existence before running.
+for in_filename in in_filenames:
+    if( not os.path.exists(in_filename)):
+        # Adjust to print function / python3 CH 20180107 (Add parens)
+        print("Error, input file does not exist: (" + in_filename +  ") aborting.")
+        quit()
+
+# Or connect to Postgres, to stream the output lines into the table.
+if pg_output is not None:
+    from nm4_decoder import read_pgpass_connect_string
+    from pgcopy_text import PGTextCopySink
+    try:
+        out_records = PGTextCopySink(read_pgpass_connect_string(pg_output[0]), pg_output[1], pg_batch)
+    except (ValueError, IOError) as msg:
+        print("Error, " + str(msg) + "\n")
+        quit()
     
 # Print a header line for each of the output files to be generated from the eE AIS data.
 # Do not write out a header line, gets in the way of \copy - out_records.write("Unq_ID\tMMSI\tLongitude\tLatitude\tDate\tMsgType\tParseError\tAIS_CSV\n")
 
-print("Processing: " + in_filename)
-
-with open(in_filename,'r') as in_vessel_records:
+for in_filename in in_filenames:
+    print("Processing: " + in_filename)
 
-    # Calculate the length of the input filename string.
-    in_filename_len = len(in_filename)
+# Read the input files one after another.
+with fileinput.input(in_filenames) as in_vessel_records:
 
     # Calculate a unique ID prefix value based on the input filename. Prepend the source suffix (S or T), plus 'T' 
     # to indicate Taggart/Terrestrial. Also include provided datafile date (presumed to indicate the time span of the
@@ -105,233 +212,217 @@ with open(in_filename,'r') as in_vessel_records:
     # Reset a counter into the input file.
     in_line_counter = 0
 
-    for line in in_vessel_records:
-
-        # Split the input line on pipe characters (output from pre-parsing step)
-        tokenizedline = line.strip().split('|')
+    # Split the input in chunks, as whole columns, if requested, over a pool of processes if requested.
+    if columnar or processes > 1:
+        if processes > 1:
+            splitter = split_files_parallel(in_filenames, out_records, out_filename, unq_ID_prefix, processes, ONCSplitter, chunk_lines)
+        else:
+            splitter = split_files(in_filenames, out_records, unq_ID_prefix, chunk_lines)
+        for (kind, count) in sorted(splitter.counts.items()):
+            if count:
+                print("Parse errors / warnings (" + kind + "): " + str(count))
+        if splitter.error is not None:
+            print("Parse error, too few tokens for the basic fields (or no message type), aborting.\n Line: " + str(splitter.line_counter) + " - " + splitter.error)
+            out_records.close()
+            quit()
+
+    # Otherwise, line by line.
+    else:
+        coordinate_repairs = dict([(coordinate + " " + kind, 0) for coordinate in ("longitude", "latitude") for kind in REPAIR_KINDS])
+        for line in in_vessel_records:
+
+            # Split the input line on pipe characters (output from pre-parsing step)
+            tokenizedline = line.strip().split('|')
         
-        # Initialize a flag indicating whether or not the base fields from record were found to be parseable.
-        parse_error_flag = False
+            # Initialize a flag indicating whether or not the base fields from record were found to be parseable.
+            parse_error_flag = False
 
-        # Obtain the string containing the message type.
-        str_msg_type = tokenizedline[1]
+            # Obtain the string containing the message type.
+            str_msg_type = tokenizedline[1]
 
-        # Attempt to obtain the message type as an integer from the second token returned by the split operation.
-        try:
-            input_msg_type = int(str_msg_type)
+            # Attempt to obtain the message type as an integer from the second token returned by the split operation.
+            try:
+                input_msg_type = int(str_msg_type)
             
-            #If the message type is not in the expected sest (1,2,3,5,18,27), update the value to null and set the parse error flag for the row.
-            if(not input_msg_type in (1,2,3,5,18,27)):
+                #If the message type is not in the expected sest (1,2,3,5,18,27), update the value to null and set the parse error flag for the row.
+                if(not input_msg_type in (1,2,3,5,18,27)):
 
-                #CCC Debug
-                print("Message type parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + str_msg_type + ")\n")
+                    #CCC Debug
+                    print("Message type parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + str_msg_type + ")\n")
 
-                # Had to create raw string to avoid Unicode error in Python 3 CH20180107 str_msg_type  = "\N"                
-                str_msg_type  = r"\N"
-                parse_error_flag = True
+                    # Had to create raw string to avoid Unicode error in Python 3 CH20180107 str_msg_type  = "\N"                
+                    str_msg_type  = r"\N"
+                    parse_error_flag = True
 
                 
-        # If the value for message type cannot be parsed into an integer, set the value to null and set the parse error flag for the row.
-        except ValueError:
+            # If the value for message type cannot be parsed into an integer, set the value to null and set the parse error flag for the row.
+            except ValueError:
         
-            #CCC Debug
-            print("Message type parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + str_msg_type + ")")
+                #CCC Debug
+                print("Message type parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + str_msg_type + ")")
 
-            # Had to create raw string to avoid Unicode error in Python 3 CH20180107 str_msg_type  = "\N"
-            str_msg_type = r"\N"
-            parse_error_flag = True
+                # Had to create raw string to avoid Unicode error in Python 3 CH20180107 str_msg_type  = "\N"
+                str_msg_type = r"\N"
+                parse_error_flag = True
 
-        # If the message type suggests that longitude and latitude fields should be present, verify that the values are actually coordinates.            
-        if(input_msg_type in POSITIONAL_MESSAGE_TYPES):
+            # If the message type suggests that longitude and latitude fields should be present, verify that the values are actually coordinates.            
+            if(input_msg_type in POSITIONAL_MESSAGE_TYPES):
         
-            longitude_string = tokenizedline[8]
-            latitude_string = tokenizedline[9]
+                longitude_string = tokenizedline[8]
+                latitude_string = tokenizedline[9]
             
-            # If either of the coordinates are not parseable as floating point numbers, check to see if they're just 
-            # improperly formatted exponenets (e.g. "1.0E2.0" -- trailing .0 is superfluous and wrong {unless the 
-            # system supports fractional powers of 10}, which python doesn't) -- either fix the value, or set it to 
-            # null.
-            if (not(is_float(longitude_string))): 
-            
-                suffix_search = re.search('([-]{0,1}[0-9]+[\.]{0,1}E[+-]{0,1}[0-9]+)(\.[0-9]+)\Z',longitude_string)
-                if(suffix_search is None):
-
-                    # Adjust to print function / python3 CH 20180107 (Add parens)
-                    print("Longitude parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + longitude_string + ")")
-            
-                    # Had to create raw string to avoid Unicode error in Python 3 longitude_string  = "\N"
-                    longitude_string = r"\N"
-                    parse_error_flag = True
-                else:
-                    # Adjust to print function / python3 CH 20180107 (Add parens)
-                    print("Translating: " + longitude_string + " to: " + suffix_search.group(1))
-                    longitude_string = suffix_search.group(1)
-
-            if (not(is_float(latitude_string))):
-                
-                suffix_search = re.search('([-]{0,1}[0-9]+[\.]{0,1}E[+-]{0,1}[0-9]+)(\.[0-9]+)\Z',latitude_string)
-                if(suffix_search is None):
-                    # Adjust to print function / python3 CH 20180107 (Add parens)
-                    print("Latitude parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + latitude_string + ")")
-
-                    # Had to create raw string to avoid Unicode error in Python 3 CH20180107 latitude_string  = "\N"
-                    latitude_string = r"\N"
-                    parse_error_flag = True
-                else:
-                    # Adjust to print function / python3 CH 20180107 (Add parens)
-                    print("Translating: " + latitude_string + " to: " + suffix_search.group(1))
-                    latitude_string = suffix_search.group(1)
-
-        # Attempt to set coordinate values for all non-positional message types to \N
-        else:
+                # If either of the coordinates are not parseable as floating point numbers, check to see if they're just 
+                # improperly formatted exponenets (e.g. "1.0E2.0") -- either fix the value, or set it to null, counting 
+                # each kind of repair (see coordinate_repair.py).
+                if (not(is_float(longitude_string))): 
+                    (longitude_string, repair_kind) = repair_coordinate(longitude_string)
+                    coordinate_repairs["longitude " + repair_kind] += 1
+                    if longitude_string is None:
+                        longitude_string = r"\N"
+                        parse_error_flag = True
+
+                if (not(is_float(latitude_string))):
+                    (latitude_string, repair_kind) = repair_coordinate(latitude_string)
+                    coordinate_repairs["latitude " + repair_kind] += 1
+                    if latitude_string is None:
+                        latitude_string = r"\N"
+                        parse_error_flag = True
+
+            # Attempt to set coordinate values for all non-positional message types to \N
+            else:
 
-            # Had to create raw strings to avoid Unicode error in Python 3 CH 20180107
-            longitude_string = r"\N"
-            latitude_string = r"\N"      
+                # Had to create raw strings to avoid Unicode error in Python 3 CH 20180107
+                longitude_string = r"\N"
+                latitude_string = r"\N"      
         
-        # If the date value is not of the expected length, or if it is, but has unexpected non-numeric components, set the parse error 
-        #flag and insert a null in place of the date.
-        raw_date_string = tokenizedline[0]
-
-        # Expected format: YYYYMMDDThhmmss.000Z
-        if(len(raw_date_string) != 20):
-            # Adjust to print function / python3 CH 20180107 (Add parens)
-            print("Date string parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + raw_date_string + ")")
-            parse_error_flag = True
+            # If the date value is not of the expected length, or if it is, but has unexpected non-numeric components, set the parse error 
+            #flag and insert a null in place of the date.
+            raw_date_string = tokenizedline[0]
+
+            # Expected format: YYYYMMDDThhmmss.000Z
+            if(len(raw_date_string) != 20):
+                # Adjust to print function / python3 CH 20180107 (Add parens)
+                print("Date string parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + raw_date_string + ")")
+                parse_error_flag = True
             
-            # Had to create raw string to avoid Unicode error in Python 3 CH 20180107 parsed_date_string = "\N"
-            parsed_date_string = r"\N"
+                # Had to create raw string to avoid Unicode error in Python 3 CH 20180107 parsed_date_string = "\N"
+                parsed_date_string = r"\N"
             
-        elif (not(is_integer(raw_date_string[0:8])) or not(is_integer(raw_date_string[9:15]))):
-            #CCC Debug
-            print("Date string parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + raw_date_string + ")")
-            parse_error_flag = True
+            elif (not(is_integer(raw_date_string[0:8])) or not(is_integer(raw_date_string[9:15]))):
+                #CCC Debug
+                print("Date string parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + raw_date_string + ")")
+                parse_error_flag = True
             
-            # Had to create raw string to avoid Unicode error in Python 3 CH 20180107 parsed_date_string = "\N"
-            parsed_date_string = r"\N"
+                # Had to create raw string to avoid Unicode error in Python 3 CH 20180107 parsed_date_string = "\N"
+                parsed_date_string = r"\N"
             
-        # If the date is ok, construct a Postgres-acceptable timestamp from the date_string value.
-        #e.g 20141001T000005 -> 2014-10-01 00:00:05                 
-        else:
-            parsed_date_string = raw_date_string[0:4] + "-" + raw_date_string[4:6] + "-" + raw_date_string[6:8] + " " + raw_date_string[9:11] + ":" + raw_date_string[11:13] + ":" + raw_date_string[13:15]
+            # If the date is ok, construct a Postgres-acceptable timestamp from the date_string value.
+            #e.g 20141001T000005 -> 2014-10-01 00:00:05                 
+            else:
+                parsed_date_string = raw_date_string[0:4] + "-" + raw_date_string[4:6] + "-" + raw_date_string[6:8] + " " + raw_date_string[9:11] + ":" + raw_date_string[11:13] + ":" + raw_date_string[13:15]
 
-        # If the MMSI is non numeric, set the parse error flag and insert a null in place of the MMSI.
-        MMSI_string = tokenizedline[3]
-        if(not(is_integer(MMSI_string))):
+            # If the MMSI is non numeric, set the parse error flag and insert a null in place of the MMSI.
+            MMSI_string = tokenizedline[3]
+            if(not(is_integer(MMSI_string))):
         
-            #CCC Debug
-            print("MMSI parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + MMSI_string + ")")
-            parse_error_flag = True
+                #CCC Debug
+                print("MMSI parse error.(" + unq_ID_prefix + str(in_line_counter) + ": " + MMSI_string + ")")
+                parse_error_flag = True
             
-            # Had to create raw string to avoid Unicode error in Python 3 CH 20180107 MMSI_string = "\N"
-            MMSI_string = r"\N"
+                # Had to create raw string to avoid Unicode error in Python 3 CH 20180107 MMSI_string = "\N"
+                MMSI_string = r"\N"
             
-        # Output tokenized raw fields according to the message type observed, escape any backslashes in the input line.
-        #1_2_3                
-        if(input_msg_type in (1, 2, 3)):
+            # Output tokenized raw fields according to the message type observed, escape any backslashes in the input line.
+            #1_2_3                
+            if(input_msg_type in (1, 2, 3)):
              
         
-            """Expecting
-            MMSI                3
-            Message_ID          1
-            Repeat_indicator    2
-            Time                0
-            Millisecond         -
-            Region              -
-            Country             -
-            Base_station        -
-            Online_data         -
-            Group_code          -
-            Sequence_ID         -
-            Channel             -
-            Data_length         -
-            Navigational_status 4
-            ROT                 5
-            SOG                 6
-            Accuracy            7
-            Longitude           8
-            Latitude            9
-            COG                 10
-            Heading             11
-            Maneuver            13  
-            RAIM_flag           14
-            Communication_state 15
-            UTC_second          12
-            spare               -
-            """
+                """Expecting
+                MMSI                3
+                Message_ID          1
+                Repeat_indicator    2
+                Time                0
+                Millisecond         -
+                Region              -
+                Country             -
+                Base_station        -
+                Online_data         -
+                Group_code          -
+                Sequence_ID         -
+                Channel             -
+                Data_length         -
+                Navigational_status 4
+                ROT                 5
+                SOG                 6
+                Accuracy            7
+                Longitude           8
+                Latitude            9
+                COG                 10
+                Heading             11
+                Maneuver            13  
+                RAIM_flag           14
+                Communication_state 15
+                UTC_second          12
+                spare               -
+                """
         
-            if(len(tokenizedline) < 16):
-                # Adjust to print function / python3 CH 20180107 (Add parens)
-                print("Parse error, invalid number of tokens in input line.\n Line: " + str(in_line_counter) + " - " + line.strip())
-                parse_error_flag = True
-                PG_safe_line = line.strip().replace("\\","\\\\")
-                
-                # Had to create raw strings to avoid Unicode error in Python 3 CH 20180107 out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
-                out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
-                continue
-                
-            else:
-                # Original eE data PG_safe_line = (tokenizedline[0] + "|" + tokenizedline[1] + "|" + tokenizedline[2] + "|" + tokenizedline[3] + "|" + tokenizedline[4] + "|" + tokenizedline[5] + "|" + tokenizedline[6] + "|" + tokenizedline[7] + "|" + tokenizedline[8] + "|" + tokenizedline[9] + "|" + tokenizedline[10] + "|" + tokenizedline[11] + "|" + tokenizedline[12] + "|" + tokenizedline[24] + "|" + tokenizedline[25] + "|" + tokenizedline[26] + "|" + tokenizedline[27] + "|" + tokenizedline[28] + "|" + tokenizedline[29] + "|" + tokenizedline[30] + "|" + tokenizedline[31] + "|" + tokenizedline[33] + "|" + tokenizedline[34] + "|" + tokenizedline[36] + "|" + tokenizedline[42] + "|" + tokenizedline[135] + "\n").replace("\\","\\\\")
-                PG_safe_line = (tokenizedline[3] + "|" + tokenizedline[1] + "|" + tokenizedline[2] + "|" + tokenizedline[0] + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + tokenizedline[4] + "|" + tokenizedline[5] + "|" + tokenizedline[6] + "|" + tokenizedline[7] + "|" + tokenizedline[8] + "|" + tokenizedline[9] + "|" + tokenizedline[10] + "|" + tokenizedline[11] + "|" + tokenizedline[13] + "|" + tokenizedline[14] + "|" + tokenizedline[15] + "|" + tokenizedline[12] + "|" + "" + "\n").replace("\\","\\\\")
-
-        #5  
-        elif(input_msg_type == 5):
-
-            """
-            Expecting:
-            MMSI                    3
-            Message_ID              1
-            Repeat_indicator        2
-            Time                    0
-            Millisecond             -
-            Region                  -
-            Country                 -
-            Base_station            -
-            Online_data             -
-            Group_code              -
-            Sequence_ID             -
-            Channel                 -
-            Data_length             -
-            Vessel_Name             7
-            Call_sign               6
-            IMO                     5
-            Ship_Type               8
-            Dimension_to_Bow        9
-            Dimension_to_stern      10
-            Dimension_to_port       11
-            Dimension_to_starboard  12
-            Draught                 18
-            Destination             19
-            AIS_version             4
-            Fixing_device           13
-            Transmission_control    -
-            ETA_month               14
-            ETA_day                 15
-            ETA_hour                16
-            ETA_minute              17
-            Sequence                -
-            Data_terminal           20
-            Mode                    -
-            spare                   -
-            spare2                  -
-            """
-
-            if(len(tokenizedline) < 21):
-                # Adjust to print function / python3 CH 20180107 (Add parens)
-                print("Parse error, invalid number of tokens in input line.\n Line: " + str(in_line_counter) + " - " + line.strip())
-                parse_error_flag = True
-                PG_safe_line = line.strip().replace("\\","\\\\")
-                # Had to create raw strings to avoid Unicode error in Python 3 CH 20180107 out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
-                out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
-                continue
+                if(len(tokenizedline) < 16):
+                    # Adjust to print function / python3 CH 20180107 (Add parens)
+                    print("Parse error, invalid number of tokens in input line.\n Line: " + str(in_line_counter) + " - " + line.strip())
+                    parse_error_flag = True
+                    PG_safe_line = line.strip().replace("\\","\\\\")
                 
-            else:
-                # Original eE data PG_safe_line = (tokenizedline[0] + "|" + tokenizedline[1] + "|" + tokenizedline[2] + "|" + tokenizedline[3] + "|" + tokenizedline[4] + "|" + tokenizedline[5] + "|" + tokenizedline[6] + "|" + tokenizedline[7] + "|" + tokenizedline[8] + "|" + tokenizedline[9] + "|" + tokenizedline[10] + "|" + tokenizedline[11] + "|" + tokenizedline[12] + "|" + tokenizedline[13] + "|" + tokenizedline[14] + "|" + tokenizedline[15] + "|" + tokenizedline[16] + "|" + tokenizedline[17] + "|" + tokenizedline[18] + "|" + tokenizedline[19] + "|" + tokenizedline[20] + "|" + tokenizedline[21] + "|" + tokenizedline[22] + "|" + tokenizedline[23] + "|" + tokenizedline[43] + "|" + tokenizedline[44] + "|" + tokenizedline[45] + "|" + tokenizedline[46] + "|" + tokenizedline[47] + "|" + tokenizedline[48] + "|" + tokenizedline[49] + "|" + tokenizedline[65] + "|" + tokenizedline[67] + "|" + tokenizedline[135] + "|" + tokenizedline[136] + "\n").replace("\\","\\\\")
-                PG_safe_line = (tokenizedline[3] + "|" + tokenizedline[1] + "|" + tokenizedline[2] + "|" + tokenizedline[0] + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + tokenizedline[7] + "|" + tokenizedline[6] + "|" + tokenizedline[5] + "|" + tokenizedline[8] + "|" + tokenizedline[9] + "|" + tokenizedline[10] + "|" + tokenizedline[11] + "|" + tokenizedline[12] + "|" + tokenizedline[18] + "|" + tokenizedline[19] + "|" + tokenizedline[4] + "|" + tokenizedline[13] + "|" + "" + "|" + tokenizedline[14] + "|" + tokenizedline[15] + "|" + tokenizedline[16] + "|" + tokenizedline[17] + "|" + "" + "|" + tokenizedline[20] + "|" + "" + "|" + "" + "|" + "" + "\n").replace("\\","\\\\")
+                    # Had to create raw strings to avoid Unicode error in Python 3 CH 20180107 out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
+                    out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
+                    continue
                 
-        elif(input_msg_type == 18):
-
-            if(len(tokenizedline) < 21):
+                else:
+                    # Original eE data PG_safe_line = (tokenizedline[0] + "|" + tokenizedline[1] + "|" + tokenizedline[2] + "|" + tokenizedline[3] + "|" + tokenizedline[4] + "|" + tokenizedline[5] + "|" + tokenizedline[6] + "|" + tokenizedline[7] + "|" + tokenizedline[8] + "|" + tokenizedline[9] + "|" + tokenizedline[10] + "|" + tokenizedline[11] + "|" + tokenizedline[12] + "|" + tokenizedline[24] + "|" + tokenizedline[25] + "|" + tokenizedline[26] + "|" + tokenizedline[27] + "|" + tokenizedline[28] + "|" + tokenizedline[29] + "|" + tokenizedline[30] + "|" + tokenizedline[31] + "|" + tokenizedline[33] + "|" + tokenizedline[34] + "|" + tokenizedline[36] + "|" + tokenizedline[42] + "|" + tokenizedline[135] + "\n").replace("\\","\\\\")
+                    PG_safe_line = line_extractors[input_msg_type](tokenizedline)
+
+            #5  
+            elif(input_msg_type == 5):
+
+                """
+                Expecting:
+                MMSI                    3
+                Message_ID              1
+                Repeat_indicator        2
+                Time                    0
+                Millisecond             -
+                Region                  -
+                Country                 -
+                Base_station            -
+                Online_data             -
+                Group_code              -
+                Sequence_ID             -
+                Channel                 -
+                Data_length             -
+                Vessel_Name             7
+                Call_sign               6
+                IMO                     5
+                Ship_Type               8
+                Dimension_to_Bow        9
+                Dimension_to_stern      10
+                Dimension_to_port       11
+                Dimension_to_starboard  12
+                Draught                 18
+                Destination             19
+                AIS_version             4
+                Fixing_device           13
+                Transmission_control    -
+                ETA_month               14
+                ETA_day                 15
+                ETA_hour                16
+                ETA_minute              17
+                Sequence                -
+                Data_terminal           20
+                Mode                    -
+                spare                   -
+                spare2                  -
+                """
+
+                if(len(tokenizedline) < 21):
                     # Adjust to print function / python3 CH 20180107 (Add parens)
                     print("Parse error, invalid number of tokens in input line.\n Line: " + str(in_line_counter) + " - " + line.strip())
                     parse_error_flag = True
@@ -339,19 +430,40 @@ with open(in_filename,'r') as in_vessel_records:
                     # Had to create raw strings to avoid Unicode error in Python 3 CH 20180107 out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
                     out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
                     continue
-            else:
-                PG_safe_line = (tokenizedline[3] + "|" + tokenizedline[1] + "|" + tokenizedline[2] + "|" + tokenizedline[0] + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + "" + "|" + tokenizedline[5] + "|" + tokenizedline[6] + "|" + tokenizedline[7] + "|" + tokenizedline[8] + "|" + tokenizedline[9] + "|" + tokenizedline[10] + "|" + "" + "|" + tokenizedline[19] + "|"  + "" + "|" + tokenizedline[20] + "|" + "|" + tokenizedline[11] + "" + "|" + "" + "|" + "|" + tokenizedline[18] + "|" + tokenizedline[13] + "|" + tokenizedline[14] + "|" + tokenizedline[15] + "|" + tokenizedline[16] + "|" + tokenizedline[17] + "|" + tokenizedline[4] + "|" + tokenizedline[12] + "\n").replace("\\","\\\\")
+                
+                else:
+                    # Original eE data PG_safe_line = (tokenizedline[0] + "|" + tokenizedline[1] + "|" + tokenizedline[2] + "|" + tokenizedline[3] + "|" + tokenizedline[4] + "|" + tokenizedline[5] + "|" + tokenizedline[6] + "|" + tokenizedline[7] + "|" + tokenizedline[8] + "|" + tokenizedline[9] + "|" + tokenizedline[10] + "|" + tokenizedline[11] + "|" + tokenizedline[12] + "|" + tokenizedline[13] + "|" + tokenizedline[14] + "|" + tokenizedline[15] + "|" + tokenizedline[16] + "|" + tokenizedline[17] + "|" + tokenizedline[18] + "|" + tokenizedline[19] + "|" + tokenizedline[20] + "|" + tokenizedline[21] + "|" + tokenizedline[22] + "|" + tokenizedline[23] + "|" + tokenizedline[43] + "|" + tokenizedline[44] + "|" + tokenizedline[45] + "|" + tokenizedline[46] + "|" + tokenizedline[47] + "|" + tokenizedline[48] + "|" + tokenizedline[49] + "|" + tokenizedline[65] + "|" + tokenizedline[67] + "|" + tokenizedline[135] + "|" + tokenizedline[136] + "\n").replace("\\","\\\\")
+                    PG_safe_line = line_extractors[input_msg_type](tokenizedline)
+                
+            elif(input_msg_type == 18):
+
+                if(len(tokenizedline) < 21):
+                        # Adjust to print function / python3 CH 20180107 (Add parens)
+                        print("Parse error, invalid number of tokens in input line.\n Line: " + str(in_line_counter) + " - " + line.strip())
+                        parse_error_flag = True
+                        PG_safe_line = line.strip().replace("\\","\\\\")
+                        # Had to create raw strings to avoid Unicode error in Python 3 CH 20180107 out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" +  "\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
+                        out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" +  r"\N" + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line.strip() + "\n")
+                        continue
+                else:
+                    PG_safe_line = line_extractors[input_msg_type](tokenizedline)
             
-        else:
+            else:
             
-            print("Parse warning, unhandled message type, skipping \n Line: " + str(in_line_counter) + " - " + line.strip())
-            continue
+                print("Parse warning, unhandled message type, skipping \n Line: " + str(in_line_counter) + " - " + line.strip())
+                continue
             
-        # Write the current line to output, formatted for ingest into Postgres.
-        out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + MMSI_string + "\t" + longitude_string + "\t" + latitude_string + "\t" + parsed_date_string + "\t" + str_msg_type + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line)
+            # Write the current line to output, formatted for ingest into Postgres.
+            out_records.write(unq_ID_prefix + str(in_line_counter) + "\t" + MMSI_string + "\t" + longitude_string + "\t" + latitude_string + "\t" + parsed_date_string + "\t" + str_msg_type + "\t" + str(int(parse_error_flag)) + "\t" + PG_safe_line)
+
+            # Increment the current input line counter.
+            in_line_counter += 1
 
-        # Increment the current input line counter.
-        in_line_counter += 1
+        for (kind, count) in sorted(coordinate_repairs.items()):
+            if count:
+                print("Coordinate repairs / parse errors (" + kind + "): " + str(count))
                 
-# Close the output file.
-out_records.close
+# Close the output file (sending any lines held, with --pg).
+out_records.close()
+if pg_output is not None:
+    print("Lines loaded into " + pg_output[1] + ": " + str(out_records.sent) + ", rejected into " + out_records.reject_table + ": " + str(out_records.rejected))
@@ -0,0 +1,95 @@
+#!/usr/bin/python
+#
+# coordinate_repair.py - Validation and repair of coordinate values, shared by
+# the scripts splitting AIS data for Postgres (1_split_ONC_*, 1_split_tT_* and
+# cypara_sql_loader). Some coordinates arrive with malformed exponents, e.g.
+# "1.0E2.0" (the trailing .0 is superfluous and wrong, unless the system
+# supports fractional powers of 10, which python doesn't), and these are
+# repaired by dropping the fraction of the exponent. Any other value that
+# does not parse as a float is invalid.
+#
+# Whole columns are converted by NumPy, which applies Python's own float() to
+# each value without the cost of a Python call per value, and the repair
+# pattern is run over just the values that fail. Repairs and invalid values
+# are counted by kind, for the caller to report, rather than printed per value,
+# and nothing here aborts the process.
+
+import re
+import numpy as np
+
+# Malformed exponents, e.g. 1.0E2.0, of which the leading group (the value without the fraction of its exponent) is kept.
+EXPONENT_FRACTION_PATTERN = re.compile(r"\s*([-+]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)[eE][-+]?[0-9]+)\.[0-9]+\s*\Z")
+
+# Kinds of values counted: those repaired, by repair, and those invalid.
+REPAIR_KINDS = ("exponent_fraction", "invalid")
+
+# Runs of values this short are converted one at a time.
+SCALAR_RUN = 16
+
+def scalar_float(s):
+    try:
+        return float(s)
+    except (ValueError, TypeError):
+        return None
+
+def convert_column(values, dtype, scalar):
+    "Convert an object array of strings to the dtype, returning the values and a mask of those converted."
+    converted = np.zeros(len(values), dtype=dtype)
+    ok = np.ones(len(values), dtype=bool)
+    pending = [(0, len(values))]
+    while pending:
+        (start, end) = pending.pop()
+        if end - start > SCALAR_RUN:
+            try:
+                converted[start:end] = values[start:end].astype(dtype)
+            except (ValueError, OverflowError, TypeError):
+                middle = (start + end) // 2
+                pending.extend([(start, middle), (middle, end)])
+            continue
+        for index in range(start, end):
+            value = scalar(values[index])
+            if value is None:
+                ok[index] = False
+            else:
+                converted[index] = value
+    return (converted, ok)
+
+def repair_coordinate(value):
+    "Repair a single value that does not parse as a float, returning the value (or None) and the kind of repair."
+    try:
+        suffix_search = EXPONENT_FRACTION_PATTERN.match(value)
+    except TypeError:
+        suffix_search = None
+    if suffix_search is None:
+        return (None, "invalid")
+    return (suffix_search.group(1), "exponent_fraction")
+
+def repair_coordinates(values, null=None):
+    "Repair a column of coordinate strings, returning the repaired values (invalid values given as null), a mask of those valid, and the counts per repair kind."
+    values = np.array(values, dtype=object)
+    valid = convert_column(values, float, scalar_float)[1]
+    counts = dict([(kind, 0) for kind in REPAIR_KINDS])
+    (invalid_index,) = np.nonzero(~valid)
+    for index in invalid_index:
+        (repaired, kind) = repair_coordinate(values[index])
+        counts[kind] += 1
+        if repaired is None:
+            values[index] = null
+        else:
+            values[index] = repaired
+            valid[index] = True
+    return (values, valid, counts)
+
+def coordinate_floats(values, valid):
+    "The float values of a repaired column, NaN where invalid."
+    floats = np.full(len(values), np.nan)
+    floats[valid] = values[valid].astype(float)
+    return floats
+
+def add_counts(totals, counts):
+    "Add counts per repair kind to running totals."
+    for (kind, count) in counts.items():
+        totals[kind] = totals.get(kind, 0) + count
+    return totals
+
+# End
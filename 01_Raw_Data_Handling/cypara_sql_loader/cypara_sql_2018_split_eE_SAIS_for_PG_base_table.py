@@ -23,12 +23,19 @@ from functools import partial
 import sys
 import os
 import re
+import getopt
 from datetime import *
 import pandas as pd
+import numpy as np
 import time
 import gc
 import math
 
+# Shared coordinate repair and binary COPY encoding, from the parent directory.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from coordinate_repair import REPAIR_KINDS, repair_coordinates, coordinate_floats, add_counts
+from pgcopy_binary import copy_header, copy_trailer
+
 import pyximport; pyximport.install()
 from para_helpers import *
 
@@ -49,9 +56,40 @@ def mygrouper(n, iterable):
 # Wrapper to pass 2 arguments to function call to multiprocessing.apply.
 def parse_single_file_star(indicated_filename_indicated_prefix_indicated_files):
     """Convert `f([1,2])` to `f(1,2)` call."""
-    return parse_single_file(indicated_filename_indicated_prefix_indicated_files[0], indicated_filename_indicated_prefix_indicated_files[1], indicated_filename_indicated_prefix_indicated_files[2])
+    return parse_single_file(*indicated_filename_indicated_prefix_indicated_files)
+
+# Append the indicated columns of a message dataframe to the output file for the day, as delimited text (.txt) or, 
+# with out_format 'pgbinary', as binary COPY tuples (.bin).
+def write_day_file(message_frame, out_filename, day_of_month_suffix, columns, out_format, delimiter='|', na_rep='', quotechar='"'):
+    if out_format == 'pgbinary':
+        with open(out_filename + '(' + day_of_month_suffix + ').bin', 'ab') as out_file:
+            write_binary_copy_rows(out_file, message_frame, columns)
+    else:
+        message_frame.to_csv(out_filename + '(' + day_of_month_suffix + ').txt', delimiter, na_rep, mode="a", columns=columns, header=False, index=False, quotechar=quotechar)
+
+# Render the indicated columns of a message dataframe as they would be appended to the output file for the day, 
+# as a list of rows (bytes), one per record.
+def render_rows(message_frame, columns, out_format):
+    if out_format == 'pgbinary':
+        rows = RowList()
+        write_binary_copy_rows(rows, message_frame, columns)
+        return rows
+    lines = message_frame.to_csv(sep='|', na_rep='', columns=columns, header=False, index=False).split('\n')[:-1]
+    # Render row by row should any value hold a line break.
+    if len(lines) != len(message_frame):
+        lines = [message_frame.iloc[[index]].to_csv(sep='|', na_rep='', columns=columns, header=False, index=False)[:-1] for index in range(len(message_frame))]
+    return [(line + '\n').encode('utf-8') for line in lines]
+
+# Read an eE daily file, whole or, with chunk_rows, as an iterator over chunks of that many rows (holding no 
+# reference to the chunks it has given).
+def read_ee_chunks(indicated_filename, fieldnames, fieldtypes, chunk_rows=None):
+    if chunk_rows is None:
+        yield pd.read_csv(indicated_filename, skiprows=1, names=fieldnames, dtype=fieldtypes,  delimiter=',', keep_default_na=False, na_values=['None','none',''], quotechar='"')
+    else:
+        for chunk in pd.read_csv(indicated_filename, skiprows=1, names=fieldnames, dtype=fieldtypes,  delimiter=',', keep_default_na=False, na_values=['None','none',''], quotechar='"', chunksize=chunk_rows):
+            yield chunk
 
-def parse_single_file(indicated_filename, indicated_prefix, indicated_out_filename_array):
+def parse_single_file(indicated_filename, indicated_prefix, indicated_out_filename_array, out_format='csv', chunk_rows=None):
 
     # Names of fields in eE AIS datafiles.
     fieldnames=['mmsi','message_id','repeat_indicator','time','millisecond','region','country','base_station','online_data','group_code','sequence_id','channel','data_length','vessel_name','call_sign','imo','ship_type','dimension_to_bow','dimension_to_stern','dimension_to_port','dimension_to_starboard','draught','destination','ais_version','navigational_status','rot','sog','accuracy','longitude','latitude','cog','heading','regional','maneuver','raim_flag','communication_flag','communication_state','utc_year','utc_month','utc_day','utc_hour','utc_minute','utc_second','fixing_device','transmission_control','eta_month','eta_day','eta_hour','eta_minute','sequence','destination_id','retransmit_flag','country_code','functional_id','data','destination_id_1','sequence_1','destination_id_2','sequence_2','destination_id_3','sequence_3','destination_id_4','sequence_4','altitude','altitude_sensor','data_terminal','mode','safety_text','non-standard_bits','name_extension','name_extension_padding','message_id_1_1','offset_1_1','message_id_1_2','offset_1_2','message_id_2_1','offset_2_1','destination_id_a','offset_a','increment_a','destination_id_b','offsetb','incrementb','data_msg_type','station_id','z_count','num_data_words','health','unit_flag','display','dsc','band','msg22','offset1','num_slots1','timeout1','increment_1','offset_2','number_slots_2','timeout_2','increment_2','offset_3','number_slots_3','timeout_3','increment_3','offset_4','number_slots_4','timeout_4','increment_4','aton_type','aton_name','off_position','aton_status','virtual_aton','channel_a','channel_b','tx_rx_mode','power','message_indicator','channel_a_bandwidth','channel_b_bandwidth','transzone_size','longitude_1','latitude_1','longitude_2','latitude_2','station_type','report_interval','quiet_time','part_number','vendor_id','mother_ship_mmsi','destination_indicator','binary_flag','gnss_status','spare','spare2','spare3','spare4']
@@ -79,9 +117,6 @@ def parse_single_file(indicated_filename, indicated_prefix, indicated_out_filena
     # Calculate the length of the incoming filename.
     indicated_filename_len = len(indicated_filename)
     
-    # Load the entire file into a pandas dataframe:
-    inner_ee_ais_datafile = pd.read_csv(indicated_filename, skiprows=1, names=fieldnames, dtype=fieldtypes,  delimiter=',', keep_default_na=False, na_values=['None','none',''], quotechar='"')
-    
     # Handle malformed records:
         # Check mmsi
             # Will crash on non integer / missing mmsi.
@@ -111,119 +146,132 @@ def parse_single_file(indicated_filename, indicated_prefix, indicated_out_filena
     print("unq_ID_prefix: " + unq_ID_prefix )
     print("Day of month suffix: " + day_of_month_suffix )
 
-    # Store the line number and a default errorflag in each of the records.
-    inner_ee_ais_datafile['lineno'] = inner_ee_ais_datafile.index + 1 
-    inner_ee_ais_datafile['unq_id_prefix'] = inner_ee_ais_datafile['lineno'].apply(lambda row: unq_ID_prefix)
-    inner_ee_ais_datafile['errorflag'] = 0
+    # Rows of M1/2/3 data for the day file, sorted across chunks once all are read.
+    if chunk_rows is not None:
+        m1_2_3_runs = SortedRowRuns(indicated_out_filename_array[0] + '(' + day_of_month_suffix + ').run')
 
-# Determine if any poorly formatted dates exist, and print error messages. Implement on first instance of issue on import within PG.
-    # Check date strings for length == 15 and contains "_" and remainder is numeric
-#            inner_ee_ais_datafile[(inner_ee_ais_datafile['time'].str.len != 15) | (inner_ee_ais_datafile['time'].str[8] != '_'), 'errorflag'] = 1
+    # Read the file whole or, with chunk_rows, in chunks of that many rows, each run through the same steps and 
+    # appended to the day files in turn.
+    coordinate_repairs = dict([(kind, 0) for kind in REPAIR_KINDS])
+    lines_read = 0
+    for inner_ee_ais_datafile in read_ee_chunks(indicated_filename, fieldnames, fieldtypes, chunk_rows):
 
-    # Copy the original data for use in packing. 
-    inner_ee_ais_datafile['orig_date'] = inner_ee_ais_datafile['time']
+        # Store the line number and a default errorflag in each of the records.
+        inner_ee_ais_datafile['lineno'] = np.arange(lines_read + 1, lines_read + len(inner_ee_ais_datafile) + 1)
+        lines_read += len(inner_ee_ais_datafile)
+        inner_ee_ais_datafile['unq_id_prefix'] = unq_ID_prefix
+        inner_ee_ais_datafile['errorflag'] = 0
 
+        # Determine if any poorly formatted dates exist, and print error messages. Implement on first instance of issue on import within PG.
+        # Check date strings for length == 15 and contains "_" and remainder is numeric
+        #            inner_ee_ais_datafile[(inner_ee_ais_datafile['time'].str.len != 15) | (inner_ee_ais_datafile['time'].str[8] != '_'), 'errorflag'] = 1
 
-    # Reformat the time values into proper time strings.
-    # inner_ee_ais_datafile['time'] = pd.to_datetime(inner_ee_ais_datafile['time'],format="%Y%m%d_%H%M%S").dt.strftime("%Y-%m-%d %H:%M:%S")
-    #Simpler, validation-less date calculation inner_ee_ais_datafile['time'] = inner_ee_ais_datafile['time'].apply(lambda x: "{}-{}-{} {}:{}:{}".format(x[0:4],x[4:6],x[6:8],x[9:11],x[11:13],x[13:15]))
-    inner_ee_ais_datafile['time'] = inner_ee_ais_datafile['time'].str[0:4] + "-" + inner_ee_ais_datafile['time'].str[4:6] + "-" + inner_ee_ais_datafile['time'].str[6:8] + " " + inner_ee_ais_datafile['time'].str[9:11] + ":" + inner_ee_ais_datafile['time'].str[11:13] + ":" + inner_ee_ais_datafile['time'].str[13:15]
+        # Copy the original data for use in packing. 
+        inner_ee_ais_datafile['orig_date'] = inner_ee_ais_datafile['time']
 
-    # Select a subset of message 1/2/3 data.
-    inner_ee_ais_m1_2_3 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'].isin([1,2,3])),m123usecols]
 
-    # Select a subset of message 5 data.
-    inner_ee_ais_m5 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'] == 5),m5usecols]
+        # Reformat the time values into proper time strings.
+        # inner_ee_ais_datafile['time'] = pd.to_datetime(inner_ee_ais_datafile['time'],format="%Y%m%d_%H%M%S").dt.strftime("%Y-%m-%d %H:%M:%S")
+        #Simpler, validation-less date calculation inner_ee_ais_datafile['time'] = inner_ee_ais_datafile['time'].apply(lambda x: "{}-{}-{} {}:{}:{}".format(x[0:4],x[4:6],x[6:8],x[9:11],x[11:13],x[13:15]))
+        inner_ee_ais_datafile['time'] = inner_ee_ais_datafile['time'].str[0:4] + "-" + inner_ee_ais_datafile['time'].str[4:6] + "-" + inner_ee_ais_datafile['time'].str[6:8] + " " + inner_ee_ais_datafile['time'].str[9:11] + ":" + inner_ee_ais_datafile['time'].str[11:13] + ":" + inner_ee_ais_datafile['time'].str[13:15]
 
-    # Select a subset of message 18 data.
-    inner_ee_ais_m18 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'] == 18),m18usecols]
+        # Select a subset of message 1/2/3 data.
+        inner_ee_ais_m1_2_3 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'].isin([1,2,3])),m123usecols]
+
+        # Select a subset of message 5 data.
+        inner_ee_ais_m5 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'] == 5),m5usecols]
+
+        # Select a subset of message 18 data.
+        inner_ee_ais_m18 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'] == 18),m18usecols]
     
-    # Select a subset of message 24 data.
-    inner_ee_ais_m24 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'] == 24),m24usecols]
+        # Select a subset of message 24 data.
+        inner_ee_ais_m24 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'] == 24),m24usecols]
     
-    # Select a subset of message 27 data.
-    inner_ee_ais_m27 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'] == 27),m27usecols]
+        # Select a subset of message 27 data.
+        inner_ee_ais_m27 = inner_ee_ais_datafile.loc[(inner_ee_ais_datafile['message_id'] == 27),m27usecols]
 
-    # Select a subset of all other message data.
-    inner_ee_ais_other = inner_ee_ais_datafile[(~inner_ee_ais_datafile['message_id'].isin([1,2,3,5,18,24,27]))]
+        # Select a subset of all other message data.
+        inner_ee_ais_other = inner_ee_ais_datafile[(~inner_ee_ais_datafile['message_id'].isin([1,2,3,5,18,24,27]))]
     
-    # Unload the parent dataframe.
-    inner_ee_ais_datafile = []
-    gc.collect()
+        # Unload the parent dataframe.
+        inner_ee_ais_datafile = []
+        gc.collect()
     
-    # Fix fractional exponents (artifact from eE processing). 
-    inner_ee_ais_m1_2_3['latitude'] = inner_ee_ais_m1_2_3['latitude'].apply(lambda row: fix_exponents(row))
-    inner_ee_ais_m1_2_3['longitude'] = inner_ee_ais_m1_2_3['longitude'].apply(lambda row: fix_exponents(row))
-    inner_ee_ais_m18['latitude'] = inner_ee_ais_m18['latitude'].apply(lambda row: fix_exponents(row))
-    inner_ee_ais_m18['longitude'] = inner_ee_ais_m18['longitude'].apply(lambda row: fix_exponents(row))
-    inner_ee_ais_m27['latitude'] = inner_ee_ais_m27['latitude'].apply(lambda row: fix_exponents(row))
-    inner_ee_ais_m27['longitude'] = inner_ee_ais_m27['longitude'].apply(lambda row: fix_exponents(row))
-
-# Print message for invalid coordinates
-
-    # Calculate rounded lat / lon for the M1/2/3 data 
-    inner_ee_ais_m1_2_3['round_lat'] = inner_ee_ais_m1_2_3['latitude'].apply(lambda row: round(convert_float(row)), 2)
-    inner_ee_ais_m1_2_3['round_lon'] = inner_ee_ais_m1_2_3['longitude'].apply(lambda row: round(convert_float(row)), 2)
-
-    inner_ee_ais_m18['float_lat'] = inner_ee_ais_m18['latitude'].apply(lambda row: convert_float(row))
-    inner_ee_ais_m18['float_lon'] = inner_ee_ais_m18['longitude'].apply(lambda row: convert_float(row))
-    inner_ee_ais_m27['float_lat'] = inner_ee_ais_m27['latitude'].apply(lambda row: convert_float(row))
-    inner_ee_ais_m27['float_lon'] = inner_ee_ais_m27['longitude'].apply(lambda row: convert_float(row))
-
-    # Add WKT fields for m1/2/3, m18 and m27 subsets where coordinates are valid.
-    inner_ee_ais_m1_2_3['WKT'] = "SRID=4326;POINT(" + inner_ee_ais_m1_2_3['longitude'] + " " + inner_ee_ais_m1_2_3['latitude'] + ")"
-    inner_ee_ais_m18['WKT'] = "SRID=4326;POINT(" + inner_ee_ais_m18['longitude'] + " " + inner_ee_ais_m18['latitude'] + ")"
-    inner_ee_ais_m27['WKT'] = "SRID=4326;POINT(" + inner_ee_ais_m27['longitude'] + " " + inner_ee_ais_m27['latitude'] + ")"
+        # Fix fractional exponents (artifact from eE processing), as whole columns, setting invalid coordinates to 
+        # empty strings (nulls) and flagging their rows, and counting each kind of repair.
+        for subset in (inner_ee_ais_m1_2_3, inner_ee_ais_m18, inner_ee_ais_m27):
+            for coordinate in ('latitude', 'longitude'):
+                (repaired, valid, counts) = repair_coordinates(subset[coordinate].values, '')
+                subset[coordinate] = repaired
+                subset['float_' + coordinate[:3]] = coordinate_floats(repaired, valid)
+                subset.loc[~valid, 'errorflag'] = 1
+                add_counts(coordinate_repairs, counts)
+
+        # Calculate rounded lat / lon for the M1/2/3 data (to 2 decimals, rounding halves away from zero as round() does)
+        inner_ee_ais_m1_2_3['round_lat'] = np.sign(inner_ee_ais_m1_2_3['float_lat']) * np.floor(np.abs(inner_ee_ais_m1_2_3['float_lat']) * 100 + 0.5) / 100
+        inner_ee_ais_m1_2_3['round_lon'] = np.sign(inner_ee_ais_m1_2_3['float_lon']) * np.floor(np.abs(inner_ee_ais_m1_2_3['float_lon']) * 100 + 0.5) / 100
+
+        # Add WKT fields for m1/2/3, m18 and m27 subsets where coordinates are valid.
+        inner_ee_ais_m1_2_3['WKT'] = "SRID=4326;POINT(" + inner_ee_ais_m1_2_3['longitude'] + " " + inner_ee_ais_m1_2_3['latitude'] + ")"
+        inner_ee_ais_m18['WKT'] = "SRID=4326;POINT(" + inner_ee_ais_m18['longitude'] + " " + inner_ee_ais_m18['latitude'] + ")"
+        inner_ee_ais_m27['WKT'] = "SRID=4326;POINT(" + inner_ee_ais_m27['longitude'] + " " + inner_ee_ais_m27['latitude'] + ")"
     
                 
-    # Filter out invalid WKT values and set to empty strings.
-    inner_ee_ais_m1_2_3.loc[(inner_ee_ais_m1_2_3.round_lon < -180) | (inner_ee_ais_m1_2_3.round_lon > 180) | (inner_ee_ais_m1_2_3.round_lat < -90) | (inner_ee_ais_m1_2_3.round_lat > 90), 'WKT']= ''
-    inner_ee_ais_m18.loc[(inner_ee_ais_m18.float_lon < -180) | (inner_ee_ais_m18.float_lon > 180) | (inner_ee_ais_m18.float_lat < -90) | (inner_ee_ais_m18.float_lat > 90), 'WKT']= ''
-    inner_ee_ais_m27.loc[(inner_ee_ais_m27.float_lon < -180) | (inner_ee_ais_m27.float_lon > 180) | (inner_ee_ais_m27.float_lat < -90) | (inner_ee_ais_m27.float_lat > 90), 'WKT']= ''
+        # Filter out invalid WKT values (out of range, or from invalid coordinates) and set to empty strings.
+        inner_ee_ais_m1_2_3.loc[(inner_ee_ais_m1_2_3.round_lon < -180) | (inner_ee_ais_m1_2_3.round_lon > 180) | (inner_ee_ais_m1_2_3.round_lat < -90) | (inner_ee_ais_m1_2_3.round_lat > 90) | inner_ee_ais_m1_2_3.round_lon.isnull() | inner_ee_ais_m1_2_3.round_lat.isnull(), 'WKT']= ''
+        inner_ee_ais_m18.loc[(inner_ee_ais_m18.float_lon < -180) | (inner_ee_ais_m18.float_lon > 180) | (inner_ee_ais_m18.float_lat < -90) | (inner_ee_ais_m18.float_lat > 90) | inner_ee_ais_m18.float_lon.isnull() | inner_ee_ais_m18.float_lat.isnull(), 'WKT']= ''
+        inner_ee_ais_m27.loc[(inner_ee_ais_m27.float_lon < -180) | (inner_ee_ais_m27.float_lon > 180) | (inner_ee_ais_m27.float_lat < -90) | (inner_ee_ais_m27.float_lat > 90) | inner_ee_ais_m27.float_lon.isnull() | inner_ee_ais_m27.float_lat.isnull(), 'WKT']= ''
     
-    # Add unq_id _prefix fields to all datasets.
-    inner_ee_ais_m1_2_3['unq_id_prefix'] = inner_ee_ais_m1_2_3['lineno'].apply(lambda row: unq_ID_prefix)
-    inner_ee_ais_m5['unq_id_prefix'] = inner_ee_ais_m5['lineno'].apply(lambda row: unq_ID_prefix)
-    inner_ee_ais_m18['unq_id_prefix'] = inner_ee_ais_m18['lineno'].apply(lambda row: unq_ID_prefix)
-    inner_ee_ais_m24['unq_id_prefix'] = inner_ee_ais_m24['lineno'].apply(lambda row: unq_ID_prefix)
-    inner_ee_ais_m27['unq_id_prefix'] = inner_ee_ais_m27['lineno'].apply(lambda row: unq_ID_prefix)
-    inner_ee_ais_other['unq_id_prefix'] = inner_ee_ais_other['lineno'].apply(lambda row: unq_ID_prefix)
-
-    # Sort M1/2/3 data on rounded lon, lat, and line number / received order.
-    inner_ee_ais_m1_2_3.sort_values(by=['round_lon','round_lat','lineno'], inplace=True)
-
-    # Create a packed row for records in the "other" record set.
-    inner_ee_ais_other['ais_msg_eecsv'] = inner_ee_ais_other.apply(lambda row: create_packed_other_rows(row['message_id'], row), axis=1)
+        # Sort M1/2/3 data on rounded lon, lat, and line number / received order (across all chunks, with chunk_rows).
+        if chunk_rows is None:
+            inner_ee_ais_m1_2_3.sort_values(by=['round_lon','round_lat','lineno'], inplace=True)
+
+        # Create a packed row for records in the "other" record set, per message type.
+        inner_ee_ais_other['ais_msg_eecsv'] = pack_other_rows(inner_ee_ais_other)
     
-    # Export to separate files by day and deallocate.
-    inner_ee_ais_m1_2_3.to_csv(indicated_out_filename_array[0] + '(' + day_of_month_suffix + ').txt', '|', '', mode="a", columns=columns_m123, header=False, index=False)
-    inner_ee_ais_m1_2_3 = []
-    gc.collect()
-
-    inner_ee_ais_m5.to_csv(indicated_out_filename_array[1] + '(' + day_of_month_suffix + ').txt', '|', '', mode="a", columns=columns_m5, header=False, index=False, quotechar="~")
-    inner_ee_ais_m5 = []
-    gc.collect()
-
-    inner_ee_ais_m18.to_csv(indicated_out_filename_array[2] + '(' + day_of_month_suffix + ').txt', '|', '', mode="a", columns=columns_m18, header=False, index=False)
-    inner_ee_ais_m18 = []
-    gc.collect()
+        # Export to separate files by day and deallocate.
+        if chunk_rows is None:
+            write_day_file(inner_ee_ais_m1_2_3, indicated_out_filename_array[0], day_of_month_suffix, columns_m123, out_format)
+        else:
+            m1_2_3_runs.add([inner_ee_ais_m1_2_3['lineno'].values, inner_ee_ais_m1_2_3['round_lat'].values, inner_ee_ais_m1_2_3['round_lon'].values], 
+                render_rows(inner_ee_ais_m1_2_3, columns_m123, out_format))
+        inner_ee_ais_m1_2_3 = []
+        gc.collect()
+
+        write_day_file(inner_ee_ais_m5, indicated_out_filename_array[1], day_of_month_suffix, columns_m5, out_format, quotechar="~")
+        inner_ee_ais_m5 = []
+        gc.collect()
+
+        write_day_file(inner_ee_ais_m18, indicated_out_filename_array[2], day_of_month_suffix, columns_m18, out_format)
+        inner_ee_ais_m18 = []
+        gc.collect()
     
-    inner_ee_ais_m24.to_csv(indicated_out_filename_array[3] + '(' + day_of_month_suffix + ').txt', '|', '', mode="a", columns=columns_m24, header=False, index=False, quotechar="~")
-    inner_ee_ais_m24 = []
-    gc.collect()
+        write_day_file(inner_ee_ais_m24, indicated_out_filename_array[3], day_of_month_suffix, columns_m24, out_format, quotechar="~")
+        inner_ee_ais_m24 = []
+        gc.collect()
     
-    inner_ee_ais_m27.to_csv(indicated_out_filename_array[4] + '(' + day_of_month_suffix + ').txt', '|', '', mode="a", columns=columns_m27, header=False, index=False)
-    inner_ee_ais_m27 = []
-    gc.collect()
+        write_day_file(inner_ee_ais_m27, indicated_out_filename_array[4], day_of_month_suffix, columns_m27, out_format)
+        inner_ee_ais_m27 = []
+        gc.collect()
     
-    inner_ee_ais_other.to_csv(indicated_out_filename_array[5] + '(' + day_of_month_suffix + ').txt', '\t', '\N', mode="a", columns=columns_other, header=False, index=False, quotechar="~")
-    inner_ee_ais_other = []
-    gc.collect()
+        write_day_file(inner_ee_ais_other, indicated_out_filename_array[5], day_of_month_suffix, columns_other, out_format, '\t', '\N', quotechar="~")
+        inner_ee_ais_other = []
+        gc.collect()
+
+    # Print counts of repaired and invalid coordinates.
+    for (kind, count) in sorted(coordinate_repairs.items()):
+        if count:
+            print("Coordinate repairs / parse errors (" + kind + "): " + str(count))
+
+    # Write the M1/2/3 rows read in chunks, in sorted order.
+    if chunk_rows is not None:
+        with open(indicated_out_filename_array[0] + '(' + day_of_month_suffix + ')' + ('.bin' if out_format == 'pgbinary' else '.txt'), 'ab') as out_file:
+            m1_2_3_runs.write(out_file)
     
 def main():
        
     # Usage string for the script.
-    USAGE_STRING = """Usage: cypara_sql_2018_split_eE_SAIS_for_PG_base_table.py numprocesses outputfilenameprefix inputfilename1 [inputfilename2 ...]
+    USAGE_STRING = """Usage: cypara_sql_2018_split_eE_SAIS_for_PG_base_table.py [--format=csv|pgbinary] [--chunk-rows=N] numprocesses outputfilenameprefix inputfilename1 [inputfilename2 ...]
     Validates 7 basic message types 1,2,3,5,18,24,27 from eE formatted 
     AIS data, generates a unique line ID. Outputs separate files for each of 
     the most populous / used types (1/2/3,5,18,24,27), plus one file with all 
@@ -232,7 +280,12 @@ def main():
     with the original line, all in a tab delimited output file. Presumes 
     files in the format 'exactEarth_historical_data_YYYY-MM-DD.csv' or 
     'exactEarth_historical_data_YYYYMMDD.csv'. Uses up to numprocesses processes
-    to perform calculation."""
+    to perform calculation. With --format=pgbinary, the files are written in 
+    Postgres' binary COPY format (.bin), typed as in copy_column_types of 
+    para_helpers.pyx, and loaded as such by the generated .sql script. With 
+    --chunk-rows, each input file is read and split in chunks of N rows, 
+    bounding the memory used per process whatever the size of the file, 
+    giving the same output."""
 
     # Establish the start time for processing
     t_filestart = time.time()
@@ -245,8 +298,35 @@ def main():
     columns_m27 = ['unq_id_prefix', 'lineno', 'errorflag', 'mmsi', 'message_id', 'repeat_indicator', 'time', 'millisecond', 'region', 'country', 'base_station', 'online_data', 'group_code', 'sequence_id', 'channel', 'data_length', 'navigational_status', 'sog', 'accuracy', 'longitude', 'latitude', 'cog', 'raim_flag', 'gnss_status', 'spare', 'WKT']
     columns_other = ['unq_id_prefix', 'lineno', 'errorflag', 'mmsi', 'time', 'message_id', 'ais_msg_eecsv']
 
+    # Read any options ahead of the positional arguments.
+    try:
+        (options, arguments) = getopt.getopt(sys.argv[1:], "", ["format=", "chunk-rows="])
+    except getopt.GetoptError as msg:
+        print("Error, " + str(msg) + "\n")
+        print(USAGE_STRING)
+        quit()
+
+    out_format = 'csv'
+    chunk_rows = None
+    for (switch, val) in options:
+        if switch == '--format':
+            if val not in ('csv', 'pgbinary'):
+                print("Error, --format must be csv or pgbinary.\n")
+                print(USAGE_STRING)
+                quit()
+            out_format = val
+        elif switch == '--chunk-rows':
+            try:
+                chunk_rows = int(val)
+            except ValueError:
+                chunk_rows = 0
+            if chunk_rows < 1:
+                print("Error, chunk rows must be a positive integer.\n")
+                print(USAGE_STRING)
+                quit()
+
     # If at least three arguments are not provided, display an usage message.
-    if (len(sys.argv) < 4):
+    if (len(arguments) < 3):
         print(USAGE_STRING)
         quit()
 
@@ -255,14 +335,14 @@ def main():
         
     # Retrieve the number of processes with which to calculate.
     try:
-        num_processes = int(sys.argv[1])
+        num_processes = int(arguments[0])
     except:
-        print("Error {}, is not a valid number of processes for calculation.",sys.argv[1])
+        print("Error {}, is not a valid number of processes for calculation.",arguments[0])
         print(USAGE_STRING)
         quit()   
 
     # retrieve the output filename prefix.
-    out_filename_prefix = sys.argv[2]
+    out_filename_prefix = arguments[1]
 
     # Build an output filename for the .sql file which will contain 
     # a sql commands to create the target tables and populate them. 
@@ -296,27 +376,32 @@ def main():
         quit()
 
     # Create a an SQL file to load the indicated files once they're finished.
-    write_sql_load_script(out_sql_load_filename, out_filename_prefix, out_filename_array)
+    write_sql_load_script(out_sql_load_filename, out_filename_prefix, out_filename_array, out_format)
 
     # Process each input file reference passed as input.
-    for in_filename in mygrouper(num_processes,sys.argv[3:]):
+    for in_filename in mygrouper(num_processes,arguments[2:]):
                     
 
         # Build a list of filenames w/ source prefix to parse.
         parse_list = []
         for nameval in in_filename:
-            parse_list.append([nameval, source_prefix, out_filename_array])
+            parse_list.append([nameval, source_prefix, out_filename_array, out_format, chunk_rows])
                     
         # Map the parser calls onto the pool of available workers.
         out_dfs = pool.map(parse_single_file_star, parse_list)
                 
 # Only if needed by PG: Replace \\ w \\\\ .replace("\\","\\\\"), reenable quoting.
         
-    # Aggregate multiple output files.
+    # Aggregate multiple output files, as a single binary COPY stream (header, the tuples of each day, trailer) 
+    # with --format=pgbinary.
+    out_suffix = '.bin' if out_format == 'pgbinary' else '.txt'
     for out_filename_prefix in out_filename_array:
         # Obtain target files in name-sorted order.
-        files_to_aggregate = sorted(glob(out_filename_prefix + "(*).txt"))
-        with open(out_filename_prefix + '.txt','wb') as wfd:
+        files_to_aggregate = sorted(glob(out_filename_prefix + "(*)" + out_suffix))
+        with open(out_filename_prefix + out_suffix,'wb') as wfd:
+
+            if out_format == 'pgbinary':
+                wfd.write(copy_header)
 
             for f in files_to_aggregate:
                 errprint('Aggregating: {}'.format(f))
@@ -325,6 +410,9 @@ def main():
                     
                 # Remove the aggregated file.
                 os.remove(f)
+
+            if out_format == 'pgbinary':
+                wfd.write(copy_trailer)
         
     # Print out the time to write outputs
     t_fileelapsed = time.time() - t_filestart
@@ -5,8 +5,14 @@
 import re
 from datetime import *
 import pandas as pd
+import numpy as np
 import time
 import math
+import os
+import mmap
+
+# Binary COPY encoding, from the parent directory (on the path of the calling script).
+from pgcopy_binary import BinaryCopyWriter
 
 # Stackoverflow sourced short f'n for testing whether / not string values are numeric, modified from 
 # source to account for multiple number types. 
@@ -30,44 +36,9 @@ cpdef int is_integer(str s):
     except ValueError:
         return -1
 
-cpdef float convert_float(str s):
-    
-    if (is_float(s) != 0): 
-    
-        if (s.endswith('E+1.0')):
-            print "Translating: " + s + " to: " + s[:-2]
-            return float(s[:-2])
-
-        elif (s.endswith('E+2.0')):
-            print "Translating: " + s + " to: " + s[:-2]
-            return float(s[:-2])
-
-        else: 
-            print "Coordinate parse error, aborting."
-            quit()
-
-    else:
-        return float(s)
-
-cpdef str fix_exponents(str s):
-    
-    if (is_float(s) != 0): 
-    
-        if (s.endswith('E+1.0')):
-            print "Translating: " + s + " to: " + s[:-2]
-            return s[:-2]
-
-        elif (s.endswith('E+2.0')):
-            print "Translating: " + s + " to: " + s[:-2]
-            return s[:-2]
+# Coordinates (with malformed exponents) are repaired as whole columns by repair_coordinates(), of 
+# coordinate_repair.py in the parent directory.
 
-        else: 
-            print "Coordinate parse error, aborting."
-            quit()
-
-    else:
-        return s
-   
 #def validate_date(str in_raw_date_string, parse_error_flag):
 #
 #    try:
@@ -104,12 +75,108 @@ def validate_filename_prefix(str in_filename_prefix):
 #    else:
 #       return "EPSG=4326;POINT(" + str(longitude) + " " + str(latitude) + ")" 
     
+# Postgres types of the exported columns for binary COPY output (--format=pgbinary), which must be those of the 
+# ee_ais_master_* tables. Columns not listed are text. Coordinates are written from their repaired float values, 
+# and WKT as a PostGIS point (ais_geom).
+copy_column_types = {'lineno': 'integer', 'errorflag': 'integer', 'mmsi': 'integer', 'message_id': 'integer', 
+    'time': 'timestamp', 'millisecond': 'integer', 'rot': 'double precision', 'sog': 'double precision', 
+    'cog': 'double precision', 'heading': 'double precision', 'longitude': 'double precision', 
+    'latitude': 'double precision', 'WKT': 'geometry'}
+
+# binary_copy_rows - Build the rows of the indicated columns of a message dataframe, for a binary COPY, 
+# converting whole columns to values of the column types (None for nulls) ahead of encoding.
+def binary_copy_rows(frame, columns, column_types):
+    
+    column_values = []
+    for (column, column_type) in zip(columns, column_types):
+        if column_type == 'geometry':
+            points = zip(frame['float_lon'].tolist(), frame['float_lat'].tolist())
+            values = [point if wkt else None for (point, wkt) in zip(points, (frame['WKT'] != '').tolist())]
+        elif column_type == 'timestamp':
+            # Times are in the form YYYY-MM-DD hh:mm:ss, converted to epoch seconds.
+            times = pd.to_datetime(frame[column], format="%Y-%m-%d %H:%M:%S", errors='coerce')
+            seconds = (times.values.astype('datetime64[us]').astype(np.int64) / 1e6).tolist()
+            values = [value if valid else None for (value, valid) in zip(seconds, times.notnull().tolist())]
+        else:
+            if column in ('longitude', 'latitude') and ('float_' + column[:3]) in frame:
+                series = frame['float_' + column[:3]]
+            else:
+                series = frame[column]
+            if column_type == 'text':
+                convert = str
+            elif column_type == 'double precision':
+                convert = float
+            else:
+                convert = int
+            values = [convert(value) if valid else None for (value, valid) in zip(series.tolist(), series.notnull().tolist())]
+        column_values.append(values)
+    return zip(*column_values)
+
+# write_binary_copy_rows - Append the indicated columns of a message dataframe to out_file as binary COPY 
+# tuples, without the header and trailer of the stream (written when the day files are aggregated).
+def write_binary_copy_rows(out_file, frame, columns):
+    
+    column_types = [copy_column_types.get(column, 'text') for column in columns]
+    writer = BinaryCopyWriter(out_file, column_types, header=False)
+    for row in binary_copy_rows(frame, columns, column_types):
+        writer.write_row(row)
+
+# RowList - A list collecting the rows written to it by a BinaryCopyWriter, one item per row.
+class RowList(list):
+    write = list.append
+
+# SortedRowRuns - Rows (bytes) added in runs, e.g. one per chunk of an input file, kept in a run file alongside 
+# only their sort keys, and written out in a single sorted order once all are added. Used to sort the M1/2/3 
+# output of a file read in chunks without holding its rows in memory.
+class SortedRowRuns:
+
+    def __init__(self, run_filename):
+        self.run_filename = run_filename
+        self.run_file = open(run_filename, 'wb')
+        self.keys = []
+        self.lengths = []
+
+    # Add rows with their keys, a list of arrays (the last the primary key, as for np.lexsort).
+    def add(self, keys, rows):
+        self.keys.append([np.asarray(key) for key in keys])
+        self.lengths.append(np.fromiter(map(len, rows), dtype=np.int64, count=len(rows)))
+        self.run_file.write(b"".join(rows))
+
+    # Write the rows of all runs to out_file in sorted order (NaN keys last, as by DataFrame.sort_values), 
+    # and remove the run file.
+    def write(self, out_file, block_rows=10000):
+        self.run_file.close()
+        lengths = np.concatenate(self.lengths) if self.lengths else np.zeros(0, dtype=np.int64)
+        try:
+            if len(lengths) == 0 or lengths.sum() == 0:
+                return
+            ends = np.cumsum(lengths)
+            starts = ends - lengths
+            order = np.lexsort([np.concatenate([run_keys[key] for run_keys in self.keys]) for key in range(len(self.keys[0]))])
+            with open(self.run_filename, 'rb') as run_file:
+                rows = mmap.mmap(run_file.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    for block in range(0, len(order), block_rows):
+                        index = order[block:block + block_rows]
+                        out_file.write(b"".join([rows[start:end] for (start, end) in zip(starts[index].tolist(), ends[index].tolist())]))
+                finally:
+                    rows.close()
+        finally:
+            os.remove(self.run_filename)
+
 # write_pgloader_load_script - Writes out a script, under the filename: out_sql_load_filename, which can be 
 # run by pgloader to create the template tables required to hold the parsed data, and then load and index them. 
 # The out_filename_prefix is presumed to be a string of the form ("ais_s_yyyymm"), and from which the month of 
 # the data will be extracted -- malformed prefixes will cause an error. The names of the output files are 
 # expected in out_filename_array, corresponding to message 1/2/3, 5, 18, 24, 27 and  all others (6 files, fixed order). 
-def write_sql_load_script(str out_sql_load_filename, str out_filename_prefix, out_filename_array):
+# With out_format 'pgbinary', the files are loaded as binary COPY streams (.bin) rather than as delimited text (.txt).
+def write_sql_load_script(str out_sql_load_filename, str out_filename_prefix, out_filename_array, str out_format='csv'):
+
+    # File suffix and \COPY options for each of the output files.
+    if out_format == 'pgbinary':
+        copy_sources = [".bin' (FORMAT binary)"] * 6
+    else:
+        copy_sources = [".txt' CSV delimiter '|'", ".txt' CSV delimiter '|' QUOTE '~'", ".txt' CSV delimiter '|'", ".txt' CSV delimiter '|' QUOTE '~'", ".txt' CSV delimiter '|'", ".txt' CSV DELIMITER E'\\t' ESCAPE '~' QUOTE '`'"]
 
     # Attempt to parse the month and year from the incoming filename prefix and determine the subsequent month.
     if  validate_filename_prefix(out_filename_prefix):
@@ -131,7 +198,7 @@ def write_sql_load_script(str out_sql_load_filename, str out_filename_prefix, ou
             out_sql_file.write(
             "drop table if exists " + out_filename_prefix + "_msg_1_2_3; "
             "create table " + out_filename_prefix + "_msg_1_2_3 partition of ee_ais_master_1_2_3 for values from ('{:04d}-{:02d}-01') to ('{:04d}-{:02d}-01');\n".format(prefyear, prefmonth, next_prefyear, next_prefmonth) + 
-            "\COPY " + out_filename_prefix + "_msg_1_2_3(unq_id_prefix,lineno,errorflag,mmsi,message_id,repeat_indicator,time,millisecond,region,country,base_station,online_data,group_code,sequence_id,channel,data_length,navigational_status,rot,sog,accuracy,longitude,latitude,cog,heading,maneuver,raim_flag,communication_state,utc_second,spare,ais_geom) from '" + out_filename_array[0] + ".txt' CSV delimiter '|'\n" +
+            "\COPY " + out_filename_prefix + "_msg_1_2_3(unq_id_prefix,lineno,errorflag,mmsi,message_id,repeat_indicator,time,millisecond,region,country,base_station,online_data,group_code,sequence_id,channel,data_length,navigational_status,rot,sog,accuracy,longitude,latitude,cog,heading,maneuver,raim_flag,communication_state,utc_second,spare,ais_geom) from '" + out_filename_array[0] + copy_sources[0] + "\n" +
             "create index on " + out_filename_prefix + "_msg_1_2_3(mmsi) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_1_2_3 using BRIN(time) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_1_2_3 using BRIN(unq_id_prefix,lineno) TABLESPACE index_tablespace;\n" +
@@ -144,7 +211,7 @@ def write_sql_load_script(str out_sql_load_filename, str out_filename_prefix, ou
             out_sql_file.write(
             "drop table if exists " + out_filename_prefix + "_msg_5;\n" +
             "create table " + out_filename_prefix + "_msg_5 partition of ee_ais_master_5 for values from ('{:04d}-{:02d}-01') to ('{:04d}-{:02d}-01');\n".format(prefyear, prefmonth, next_prefyear, next_prefmonth) + 
-            "\COPY " + out_filename_prefix + "_msg_5 from '" + out_filename_array[1] + ".txt' CSV delimiter '|' QUOTE '~'\n" +
+            "\COPY " + out_filename_prefix + "_msg_5 from '" + out_filename_array[1] + copy_sources[1] + "\n" +
             "create index on " + out_filename_prefix + "_msg_5(mmsi) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_5 using BRIN(time) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_5 using BRIN(unq_id_prefix,lineno) TABLESPACE index_tablespace;\n" +
@@ -155,7 +222,7 @@ def write_sql_load_script(str out_sql_load_filename, str out_filename_prefix, ou
             out_sql_file.write(
             "drop table if exists " + out_filename_prefix + "_msg_18;\n" +
             "create table " + out_filename_prefix + "_msg_18 partition of ee_ais_master_18 for values from ('{:04d}-{:02d}-01') to ('{:04d}-{:02d}-01');\n".format(prefyear, prefmonth, next_prefyear, next_prefmonth) + 
-            "\COPY " + out_filename_prefix + "_msg_18(unq_id_prefix,lineno,errorflag,mmsi,message_id,repeat_indicator,time,millisecond,region,country,base_station,online_data,group_code,sequence_id,channel,data_length,sog,accuracy,longitude,latitude,cog,heading,utc_second,unit_flag,display,dsc,band,msg22,mode,raim_flag,communication_flag,communication_state,spare,spare2,ais_geom) FROM '" + out_filename_array[2] + ".txt' CSV delimiter '|'\n" + 
+            "\COPY " + out_filename_prefix + "_msg_18(unq_id_prefix,lineno,errorflag,mmsi,message_id,repeat_indicator,time,millisecond,region,country,base_station,online_data,group_code,sequence_id,channel,data_length,sog,accuracy,longitude,latitude,cog,heading,utc_second,unit_flag,display,dsc,band,msg22,mode,raim_flag,communication_flag,communication_state,spare,spare2,ais_geom) FROM '" + out_filename_array[2] + copy_sources[2] + "\n" + 
             "create index on " + out_filename_prefix + "_msg_18(mmsi) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_18 using BRIN(time) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_18 using BRIN(unq_id_prefix,lineno) TABLESPACE index_tablespace;\n" +
@@ -168,7 +235,7 @@ def write_sql_load_script(str out_sql_load_filename, str out_filename_prefix, ou
             out_sql_file.write(
             "drop table if exists " + out_filename_prefix + "_msg_24;\n" +
             "create table " + out_filename_prefix + "_msg_24 partition of ee_ais_master_24 for values from ('{:04d}-{:02d}-01') to ('{:04d}-{:02d}-01');\n".format(prefyear, prefmonth, next_prefyear, next_prefmonth) + 
-            "\COPY " + out_filename_prefix + "_msg_24 FROM '" + out_filename_array[3] + ".txt' CSV delimiter '|' QUOTE '~'\n" +
+            "\COPY " + out_filename_prefix + "_msg_24 FROM '" + out_filename_array[3] + copy_sources[3] + "\n" +
             "create index on " + out_filename_prefix + "_msg_24(mmsi) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_24 using BRIN(time) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_24 using BRIN(unq_id_prefix,lineno) TABLESPACE index_tablespace;\n" +
@@ -179,7 +246,7 @@ def write_sql_load_script(str out_sql_load_filename, str out_filename_prefix, ou
             out_sql_file.write(
             "drop table if exists " + out_filename_prefix + "_msg_27;\n" +
             "create table " + out_filename_prefix + "_msg_27 partition of ee_ais_master_27 for values from ('{:04d}-{:02d}-01') to ('{:04d}-{:02d}-01');\n".format(prefyear, prefmonth, next_prefyear, next_prefmonth) + 
-            "\COPY " + out_filename_prefix + "_msg_27(unq_ID_prefix,lineno,errorflag,MMSI,Message_ID,Repeat_indicator,Time,Millisecond,Region,Country,Base_station,Online_data,Group_code,Sequence_ID,Channel,Data_length,Navigational_status,SOG,Accuracy,Longitude,Latitude,COG,RAIM_flag,GNSS_status,spare,ais_geom) FROM '" + out_filename_array[4] + ".txt' CSV delimiter '|'\n"
+            "\COPY " + out_filename_prefix + "_msg_27(unq_ID_prefix,lineno,errorflag,MMSI,Message_ID,Repeat_indicator,Time,Millisecond,Region,Country,Base_station,Online_data,Group_code,Sequence_ID,Channel,Data_length,Navigational_status,SOG,Accuracy,Longitude,Latitude,COG,RAIM_flag,GNSS_status,spare,ais_geom) FROM '" + out_filename_array[4] + copy_sources[4] + "\n"
             "create index on " + out_filename_prefix + "_msg_27(mmsi) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_27 using BRIN(time) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_27 using BRIN(unq_id_prefix,lineno) TABLESPACE index_tablespace;\n" +
@@ -192,7 +259,7 @@ def write_sql_load_script(str out_sql_load_filename, str out_filename_prefix, ou
             out_sql_file.write(            
             "drop table if exists " + out_filename_prefix + "_msg_other;\n" +
             "create table " + out_filename_prefix + "_msg_other partition of ee_ais_master_other for values from ('{:04d}-{:02d}-01') to ('{:04d}-{:02d}-01');\n".format(prefyear, prefmonth, next_prefyear, next_prefmonth) + 
-            "\COPY "  + out_filename_prefix + "_msg_other FROM '" + out_filename_array[5] + ".txt' CSV DELIMITER E'\\t' ESCAPE '~' QUOTE '`'\n"
+            "\COPY "  + out_filename_prefix + "_msg_other FROM '" + out_filename_array[5] + copy_sources[5] + "\n"
             "create index on " + out_filename_prefix + "_msg_other(mmsi) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_other using BRIN(datetime) TABLESPACE index_tablespace;\n" +
             "create index on " + out_filename_prefix + "_msg_other using BRIN(unq_id_prefix,lineno) TABLESPACE index_tablespace;\n" +
@@ -210,114 +277,97 @@ def write_sql_load_script(str out_sql_load_filename, str out_filename_prefix, ou
         quit()
 
 
-# create_packed_other_rows - A helper function to build a pipe delimited string, 
-# containing the fields corresponding to the message_id_value, from elements of 
-# the row_values input dataframe row.
-cpdef str create_packed_other_rows(int message_id_value, row_values):
-    cdef str packed_data
-
-    #4_11
-    if(message_id_value in (4, 11)):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['raim_flag']), str(row_values['communication_state']), str(row_values['utc_year']), str(row_values['utc_month']), str(row_values['utc_day']), str(row_values['utc_hour']), str(row_values['utc_minute']), str(row_values['utc_second']), str(row_values['fixing_device']), str(row_values['transmission_control']), str(row_values['spare'])])
-        
-    #6 
-    elif(message_id_value == 6):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['sequence']), str(row_values['destination_id']), str(row_values['retransmit_flag']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['spare'])])
-
-    #7_13
-    elif(message_id_value in (7, 13)):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['destination_id_1']), str(row_values['sequence_1']), str(row_values['destination_id_2']), str(row_values['sequence_2']), str(row_values['destination_id_3']), str(row_values['sequence_3']), str(row_values['destination_id_4']), str(row_values['sequence_4']), str(row_values['spare'])])
-        
-    #8 
-    elif(message_id_value == 8):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['spare'])])
-        
-    #9 
-    elif(message_id_value == 9):
-        
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['sog']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['cog']), str(row_values['raim_flag']), str(row_values['communication_flag']), str(row_values['communication_state']), str(row_values['utc_second']), str(row_values['altitude']), str(row_values['altitude_sensor']), str(row_values['data_terminal']), str(row_values['mode']), str(row_values['spare'])])
-
-    #10 
-    elif(message_id_value == 10):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['regional']), str(row_values['destination_id']), str(row_values['spare'])])
-
-    #12 
-    elif(message_id_value == 12):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['sequence']), str(row_values['destination_id']), str(row_values['retransmit_flag']), str(row_values['safety_text']), str(row_values['non-standard_bits']), str(row_values['spare'])])
-        
-    #14 
-    elif(message_id_value == 14):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['safety_text']), str(row_values['non-standard_bits']), str(row_values['name_extension']), str(row_values['spare']), str(row_values['spare2'])])
-
-    #15
-    elif(message_id_value == 15):
-        
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['destination_id_1']), str(row_values['destination_id_2']), str(row_values['message_id_1_1']), str(row_values['offset_1_1']), str(row_values['message_id_1_2']), str(row_values['offset_1_2']), str(row_values['message_id_2_1']), str(row_values['offset_2_1']), str(row_values['spare'])])
-        
-    #16
-    elif(message_id_value == 16):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['destination_id_a']), str(row_values['offset_a']), str(row_values['increment_a']), str(row_values['destination_id_b']), str(row_values['offsetb']), str(row_values['incrementb']), str(row_values['spare'])])
-
-    #17 
-    elif(message_id_value == 17):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['regional']), str(row_values['data']), str(row_values['data_msg_type']), str(row_values['station_id']), str(row_values['z_count']), str(row_values['num_data_words']), str(row_values['health']), str(row_values['spare'])])
-
-    #19
-    elif(message_id_value == 19):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['vessel_name']), str(row_values['ship_type']), str(row_values['dimension_to_bow']), str(row_values['dimension_to_stern']), str(row_values['dimension_to_port']), str(row_values['dimension_to_starboard']), str(row_values['sog']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['cog']), str(row_values['heading']), str(row_values['regional']), str(row_values['raim_flag']), str(row_values['communication_flag']), str(row_values['communication_state']), str(row_values['utc_second']), str(row_values['fixing_device']), str(row_values['data_terminal']), str(row_values['mode']), str(row_values['unit_flag']), str(row_values['display']), str(row_values['dsc']), str(row_values['band']), str(row_values['msg22']), str(row_values['spare']), str(row_values['spare2'])])
-        
-    #20
-    elif(message_id_value == 20):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['offset1']), str(row_values['num_slots1']), str(row_values['timeout1']), str(row_values['increment_1']), str(row_values['offset_2']), str(row_values['number_slots_2']), str(row_values['timeout_2']), str(row_values['increment_2']), str(row_values['offset_3']), str(row_values['number_slots_3']), str(row_values['timeout_3']), str(row_values['increment_3']), str(row_values['offset_4']), str(row_values['number_slots_4']), str(row_values['timeout_4']), str(row_values['increment_4']), str(row_values['spare'])])
-
-    #21 
-    elif(message_id_value == 21):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['dimension_to_bow']), str(row_values['dimension_to_stern']), str(row_values['dimension_to_port']), str(row_values['dimension_to_starboard']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['raim_flag']), str(row_values['utc_second']), str(row_values['fixing_device']), str(row_values['mode']), str(row_values['name_extension']), str(row_values['name_extension_padding']), str(row_values['aton_type']), str(row_values['aton_name']), str(row_values['off_position']), str(row_values['aton_status']), str(row_values['virtual_aton']), str(row_values['channel_a']), str(row_values['spare']), str(row_values['spare2'])])
-        
-    #22
-    elif(message_id_value == 22):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['channel_a']), str(row_values['channel_b']), str(row_values['tx_rx_mode']), str(row_values['power']), str(row_values['message_indicator']), str(row_values['channel_a_bandwidth']), str(row_values['channel_b_bandwidth']), str(row_values['transzone_size']), str(row_values['longitude_1']), str(row_values['latitude_1']), str(row_values['longitude_2']), str(row_values['latitude_2']), str(row_values['spare'])])
-        
-    #23
-    elif(message_id_value == 23):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['ship_type']), str(row_values['tx_rx_mode']), str(row_values['longitude_1']), str(row_values['latitude_1']), str(row_values['longitude_2']), str(row_values['latitude_2']), str(row_values['station_type']), str(row_values['report_interval']), str(row_values['quiet_time']), str(row_values['spare'])])
-
-    #25 
-    elif(message_id_value == 25):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['destination_id']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['destination_indicator']), str(row_values['binary_flag'])])
-        
-    #26 
-    elif(message_id_value == 26):
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['communication_flag']), str(row_values['communication_state']), str(row_values['destination_id']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['destination_indicator']), str(row_values['binary_flag'])])
-        
-    else:
-
-        print("Message type parse error.(" + row_values['unq_id_prefix'] + "_" + str(row_values['lineno']) + ": " + row_values['message_id'] + " parsed as:" + str(message_id_value) + ")\n")
-
-        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['vessel_name']), str(row_values['call_sign']), str(row_values['imo']), str(row_values['ship_type']), str(row_values['dimension_to_bow']), str(row_values['dimension_to_stern']), str(row_values['dimension_to_port']), str(row_values['dimension_to_starboard']), str(row_values['draught']), str(row_values['destination']), str(row_values['ais_version']), str(row_values['navigational_status']), str(row_values['rot']), str(row_values['sog']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['cog']), str(row_values['heading']), str(row_values['regional']), str(row_values['maneuver']), str(row_values['raim_flag']), str(row_values['communication_flag']), str(row_values['communication_state']), str(row_values['utc_year']), str(row_values['utc_month']), str(row_values['utc_day']), str(row_values['utc_hour']), str(row_values['utc_minute']), str(row_values['utc_second']), str(row_values['fixing_device']), str(row_values['transmission_control']), str(row_values['eta_month']), str(row_values['eta_day']), str(row_values['eta_hour']), str(row_values['eta_minute']), str(row_values['sequence']), str(row_values['destination_id']), str(row_values['retransmit_flag']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['destination_id_1']), str(row_values['sequence_1']), str(row_values['destination_id_2']), str(row_values['sequence_2']), str(row_values['destination_id_3']), str(row_values['sequence_3']), str(row_values['destination_id_4']), str(row_values['sequence_4']), str(row_values['altitude']), str(row_values['altitude_sensor']), str(row_values['data_terminal']), str(row_values['mode']), str(row_values['safety_text']), str(row_values['non-standard_bits']), str(row_values['name_extension']), str(row_values['name_extension_padding']), str(row_values['message_id_1_1']), str(row_values['offset_1_1']), str(row_values['message_id_1_2']), str(row_values['offset_1_2']), str(row_values['message_id_2_1']), str(row_values['offset_2_1']), str(row_values['destination_id_a']), str(row_values['offset_a']), str(row_values['increment_a']), str(row_values['destination_id_b']), str(row_values['offsetb']), str(row_values['incrementb']), str(row_values['data_msg_type']), str(row_values['station_id']), str(row_values['z_count']), str(row_values['num_data_words']), str(row_values['health']), str(row_values['unit_flag']), str(row_values['display']), str(row_values['dsc']), str(row_values['band']), str(row_values['msg22']), str(row_values['offset1']), str(row_values['num_slots1']), str(row_values['timeout1']), str(row_values['increment_1']), str(row_values['offset_2']), str(row_values['number_slots_2']), str(row_values['timeout_2']), str(row_values['increment_2']), str(row_values['offset_3']), str(row_values['number_slots_3']), str(row_values['timeout_3']), str(row_values['increment_3']), str(row_values['offset_4']), str(row_values['number_slots_4']), str(row_values['timeout_4']), str(row_values['increment_4']), str(row_values['aton_type']), str(row_values['aton_name']), str(row_values['off_position']), str(row_values['aton_status']), str(row_values['virtual_aton']), str(row_values['channel_a']), str(row_values['channel_b']), str(row_values['tx_rx_mode']), str(row_values['power']), str(row_values['message_indicator']), str(row_values['channel_a_bandwidth']), str(row_values['channel_b_bandwidth']), str(row_values['transzone_size']), str(row_values['longitude_1']), str(row_values['latitude_1']), str(row_values['longitude_2']), str(row_values['latitude_2']), str(row_values['station_type']), str(row_values['report_interval']), str(row_values['quiet_time']), str(row_values['part_number']), str(row_values['vendor_id']), str(row_values['mother_ship_mmsi']), str(row_values['destination_indicator']), str(row_values['binary_flag']), str(row_values['gnss_status']), str(row_values['spare']), str(row_values['spare2']), str(row_values['spare3']), str(row_values['spare4'])])
+# other_header_fields - The fields leading the packed row of every "other" message.
+other_header_fields = ['mmsi', 'message_id', 'repeat_indicator', 'orig_date', 'millisecond', 'region', 'country', 'base_station',
+    'online_data', 'group_code', 'sequence_id', 'channel', 'data_length']
+
+# other_message_fields - The fields following other_header_fields in the packed row of each "other" message type.
+other_message_fields = {
+    4: ['accuracy', 'longitude', 'latitude', 'raim_flag', 'communication_state', 'utc_year', 'utc_month', 'utc_day',
+        'utc_hour', 'utc_minute', 'utc_second', 'fixing_device', 'transmission_control', 'spare'],
+    6: ['sequence', 'destination_id', 'retransmit_flag', 'country_code', 'functional_id', 'data', 'spare'],
+    7: ['destination_id_1', 'sequence_1', 'destination_id_2', 'sequence_2', 'destination_id_3', 'sequence_3',
+        'destination_id_4', 'sequence_4', 'spare'],
+    8: ['country_code', 'functional_id', 'data', 'spare'],
+    9: ['sog', 'accuracy', 'longitude', 'latitude', 'cog', 'raim_flag', 'communication_flag', 'communication_state',
+        'utc_second', 'altitude', 'altitude_sensor', 'data_terminal', 'mode', 'spare'],
+    10: ['regional', 'destination_id', 'spare'],
+    12: ['sequence', 'destination_id', 'retransmit_flag', 'safety_text', 'non-standard_bits', 'spare'],
+    14: ['safety_text', 'non-standard_bits', 'name_extension', 'spare', 'spare2'],
+    15: ['destination_id_1', 'destination_id_2', 'message_id_1_1', 'offset_1_1', 'message_id_1_2', 'offset_1_2',
+        'message_id_2_1', 'offset_2_1', 'spare'],
+    16: ['destination_id_a', 'offset_a', 'increment_a', 'destination_id_b', 'offsetb', 'incrementb', 'spare'],
+    17: ['longitude', 'latitude', 'regional', 'data', 'data_msg_type', 'station_id', 'z_count', 'num_data_words',
+        'health', 'spare'],
+    19: ['vessel_name', 'ship_type', 'dimension_to_bow', 'dimension_to_stern', 'dimension_to_port',
+        'dimension_to_starboard', 'sog', 'accuracy', 'longitude', 'latitude', 'cog', 'heading', 'regional',
+        'raim_flag', 'communication_flag', 'communication_state', 'utc_second', 'fixing_device', 'data_terminal',
+        'mode', 'unit_flag', 'display', 'dsc', 'band', 'msg22', 'spare', 'spare2'],
+    20: ['offset1', 'num_slots1', 'timeout1', 'increment_1', 'offset_2', 'number_slots_2', 'timeout_2',
+        'increment_2', 'offset_3', 'number_slots_3', 'timeout_3', 'increment_3', 'offset_4', 'number_slots_4',
+        'timeout_4', 'increment_4', 'spare'],
+    21: ['dimension_to_bow', 'dimension_to_stern', 'dimension_to_port', 'dimension_to_starboard', 'accuracy',
+        'longitude', 'latitude', 'raim_flag', 'utc_second', 'fixing_device', 'mode', 'name_extension',
+        'name_extension_padding', 'aton_type', 'aton_name', 'off_position', 'aton_status', 'virtual_aton',
+        'channel_a', 'spare', 'spare2'],
+    22: ['channel_a', 'channel_b', 'tx_rx_mode', 'power', 'message_indicator', 'channel_a_bandwidth',
+        'channel_b_bandwidth', 'transzone_size', 'longitude_1', 'latitude_1', 'longitude_2', 'latitude_2', 'spare'],
+    23: ['ship_type', 'tx_rx_mode', 'longitude_1', 'latitude_1', 'longitude_2', 'latitude_2', 'station_type',
+        'report_interval', 'quiet_time', 'spare'],
+    25: ['destination_id', 'country_code', 'functional_id', 'data', 'destination_indicator', 'binary_flag'],
+    26: ['communication_flag', 'communication_state', 'destination_id', 'country_code', 'functional_id', 'data',
+        'destination_indicator', 'binary_flag'],
+    }
+other_message_fields[11] = other_message_fields[4]
+other_message_fields[13] = other_message_fields[7]
+
+# other_unknown_fields - The fields following other_header_fields for any other message type (a parse error).
+other_unknown_fields = ['vessel_name', 'call_sign', 'imo', 'ship_type', 'dimension_to_bow', 'dimension_to_stern', 'dimension_to_port',
+    'dimension_to_starboard', 'draught', 'destination', 'ais_version', 'navigational_status', 'rot', 'sog',
+    'accuracy', 'longitude', 'latitude', 'cog', 'heading', 'regional', 'maneuver', 'raim_flag',
+    'communication_flag', 'communication_state', 'utc_year', 'utc_month', 'utc_day', 'utc_hour', 'utc_minute',
+    'utc_second', 'fixing_device', 'transmission_control', 'eta_month', 'eta_day', 'eta_hour', 'eta_minute',
+    'sequence', 'destination_id', 'retransmit_flag', 'country_code', 'functional_id', 'data', 'destination_id_1',
+    'sequence_1', 'destination_id_2', 'sequence_2', 'destination_id_3', 'sequence_3', 'destination_id_4',
+    'sequence_4', 'altitude', 'altitude_sensor', 'data_terminal', 'mode', 'safety_text', 'non-standard_bits',
+    'name_extension', 'name_extension_padding', 'message_id_1_1', 'offset_1_1', 'message_id_1_2', 'offset_1_2',
+    'message_id_2_1', 'offset_2_1', 'destination_id_a', 'offset_a', 'increment_a', 'destination_id_b', 'offsetb',
+    'incrementb', 'data_msg_type', 'station_id', 'z_count', 'num_data_words', 'health', 'unit_flag', 'display',
+    'dsc', 'band', 'msg22', 'offset1', 'num_slots1', 'timeout1', 'increment_1', 'offset_2', 'number_slots_2',
+    'timeout_2', 'increment_2', 'offset_3', 'number_slots_3', 'timeout_3', 'increment_3', 'offset_4',
+    'number_slots_4', 'timeout_4', 'increment_4', 'aton_type', 'aton_name', 'off_position', 'aton_status',
+    'virtual_aton', 'channel_a', 'channel_b', 'tx_rx_mode', 'power', 'message_indicator', 'channel_a_bandwidth',
+    'channel_b_bandwidth', 'transzone_size', 'longitude_1', 'latitude_1', 'longitude_2', 'latitude_2',
+    'station_type', 'report_interval', 'quiet_time', 'part_number', 'vendor_id', 'mother_ship_mmsi',
+    'destination_indicator', 'binary_flag', 'gnss_status', 'spare', 'spare2', 'spare3', 'spare4']
+
+# pack_columns - Join the indicated columns of a message dataframe into a pipe delimited string per row, each 
+# value as given by str(), then blank the nan and None values (after the first field) as empty fields.
+def pack_columns(frame, columns):
+
+    values = [frame[column].astype(object).map(str) for column in columns]
+    packed = values[0].str.cat(values[1:], sep='|')
 
     # Replace all instances of |nan| and |None| with ||. Perform in two passes to handle adjacent values.
-    packed_data = packed_data.replace('|nan|','||').replace('|nan|','||')
-    if packed_data.endswith('|nan'):
-        packed_data = packed_data[:-3]
-    packed_data = packed_data.replace('|None|','||').replace('|None|','||')
-    if packed_data.endswith('|None'):
-        packed_data = packed_data[:-4]
-
-    return packed_data
+    packed = packed.str.replace('|nan|', '||', regex=False).str.replace('|nan|', '||', regex=False)
+    trailing = packed.str.endswith('|nan')
+    packed = packed.where(~trailing, packed.str[:-3])
+    packed = packed.str.replace('|None|', '||', regex=False).str.replace('|None|', '||', regex=False)
+    trailing = packed.str.endswith('|None')
+    packed = packed.where(~trailing, packed.str[:-4])
+    return packed
+
+# pack_other_rows - Build a pipe delimited string for each row of the dataframe of "other" messages, containing 
+# the fields corresponding to its message_id, joining whole columns for each message type present.
+def pack_other_rows(frame):
+
+    packed_rows = pd.Series('', index=frame.index, dtype=object)
+    for (message_id_value, message_frame) in frame.groupby('message_id', sort=False):
+        if message_id_value in other_message_fields:
+            fields = other_message_fields[message_id_value]
+        else:
+            for (unq_id_prefix, lineno) in zip(message_frame['unq_id_prefix'].tolist(), message_frame['lineno'].tolist()):
+                print("Message type parse error.(" + unq_id_prefix + "_" + str(lineno) + ": " + str(message_id_value) + ")\n")
+            fields = other_unknown_fields
+        packed_rows.loc[message_frame.index] = pack_columns(message_frame, other_header_fields + fields)
+    return packed_rows
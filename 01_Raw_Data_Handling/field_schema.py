@@ -0,0 +1,71 @@
+#!/usr/bin/python
+#
+# field_schema.py - The fields written for each message group by the scripts
+# splitting pre-parsed AIS lines (1_split_ONC_*, 1_split_tT_*, split_columnar.py
+# and 02_Segment_Development/0_split_*_pre_tracks.py), kept in one table so that
+# their column mappings cannot drift apart.
+#
+# Each schema gives the token indices of the (pipe-delimited) input line in
+# output order, None giving a null field, along with the delimiter, the null
+# value, whether each token is stripped and whether backslashes are escaped for
+# the Postgres \copy command. compile_extractor() turns a schema into a
+# function taking the tokens of a line and returning the output line, picking
+# the fields with a single operator.itemgetter() and a single join per line.
+
+from operator import itemgetter
+
+# Fields of PG_safe_line, as written by the splitting scripts for Postgres, in the order of the eE schema.
+SPLIT_FIELDS_1_2_3 = [3, 1, 2, 0] + [None] * 9 + [4, 5, 6, 7, 8, 9, 10, 11, 13, 14, 15, 12, None]
+SPLIT_FIELDS_5 = [3, 1, 2, 0] + [None] * 9 + [7, 6, 5, 8, 9, 10, 11, 12, 18, 19, 4, 13, None, 14, 15, 16, 17, None, 20, None, None, None]
+SPLIT_FIELDS_18 = [3, 1, 2, 0] + [None] * 15 + [5, 6, 7, 8, 9, 10, None, 19, None, 20, None, 11, None, None, 18, 13, 14, 15, 16, 17, 4, 12]
+
+# Schemas by message group name. Unspecified settings are taken from SCHEMA_DEFAULTS.
+FIELD_SCHEMAS = {
+    # PG_safe_line of the splitting scripts, pipe-delimited and escaped for \copy.
+    'split_1_2_3': {'fields': SPLIT_FIELDS_1_2_3, 'delimiter': '|', 'escape': True},
+    'split_5': {'fields': SPLIT_FIELDS_5, 'delimiter': '|', 'escape': True},
+    'split_18': {'fields': SPLIT_FIELDS_18, 'delimiter': '|', 'escape': True},
+    # Movement records (ext_timestamp,msgid,mmsi,nav_stat,sog,cog,tr_hdg,lat,lon,pos_acc) from the
+    # AIS_CSV field of eE records exported from Postgres.
+    'eE_tracks_1_2_3': {'fields': [3, 1, 0, 13, 15, 19, 20, 18, 17, 16], 'strip': True},
+    'eE_tracks_18_19': {'fields': [3, 1, 0, None, 19, 23, 24, 22, 21, 20, None], 'strip': True},
+    'eE_tracks_27': {'fields': [3, 1, 0, 13, 14, 18, None, 17, 16, 15, None], 'strip': True},
+    # Movement records from NM4 sourced lines, the first token being the reformatted date.
+    'NM4_tracks_1_2_3': {'fields': [0, 1, 3, 4, 6, 10, 11, 9, 8, 7]},
+    'NM4_tracks_18_19': {'fields': [0, 1, 3, None, 5, 9, 10, 8, 7, 6, None]},
+    }
+
+SCHEMA_DEFAULTS = {'delimiter': ',', 'null': '', 'strip': False, 'escape': False, 'terminator': "\n"}
+
+# Message group of each message type handled by the splitting scripts for Postgres.
+SPLIT_MESSAGE_GROUPS = {1: 'split_1_2_3', 2: 'split_1_2_3', 3: 'split_1_2_3', 5: 'split_5', 18: 'split_18'}
+
+def schema_setting(name, setting):
+    return FIELD_SCHEMAS[name].get(setting, SCHEMA_DEFAULTS.get(setting))
+
+def schema_fields(name):
+    "The token indices of the fields of a message group, None giving a null field."
+    return list(FIELD_SCHEMAS[name]['fields'])
+
+def compile_extractor(name):
+    "Return a function formatting the output line of a message group from the tokens (a list, left unchanged) of an input line."
+    fields = schema_fields(name)
+    delimiter = schema_setting(name, 'delimiter')
+    null = schema_setting(name, 'null')
+    terminator = schema_setting(name, 'terminator')
+    # Null fields are picked from the end of a copy of the tokens, with the null value appended.
+    pick = itemgetter(*[-1 if field is None else field for field in fields])
+    null_tail = [null]
+    if schema_setting(name, 'strip'):
+        getter = pick
+        pick = lambda tokens: map(str.strip, getter(tokens))
+    join = delimiter.join
+    if schema_setting(name, 'escape'):
+        def extract(tokens):
+            return (join(pick(tokens + null_tail)) + terminator).replace("\\", "\\\\")
+    else:
+        def extract(tokens):
+            return join(pick(tokens + null_tail)) + terminator
+    return extract
+
+# End
@@ -0,0 +1,2376 @@
+#!/usr/bin/env python
+#
+# A Python AIVDM/AIVDO decoder module, shared by the NM4 parsing scripts
+# (0_gpsd_eE_ais_NM4_parsing.py and 0_DMAS_TAIS_NM4_parsing.py) and
+# importable by other scripts. Handles NM4 lines prefixed by an exactEarth
+# tag block, a DMAS (ONC) or Taggart pre-parsed date, or no prefix at all;
+# the prefix format of an input may be given, or is otherwise detected from
+# its first line. Derived from the GPSD decoder as edited by CH (2015-08,
+# 2017-05, 2017-12); most edits are denoted with comments and tagged 'CH' +
+# the date in yyyymmdd format.
+#
+# This file is Copyright (c) 2010 by the GPSD project
+# BSD terms apply: see COPYING at tail of this script for details.
+#
+# This decoder works by defining a declarative pseudolanguage in which
+# to describe the process of extracting packed bitfields from an AIS
+# message, a set of tables which contain instructions in the pseudolanguage,
+# and a small amount of code for interpreting it.
+#
+# Known bugs:
+# * Doesn't join parts A and B of Type 24 together yet.
+# * Only handles the broadcast case of type 22.  The problem is that the
+#   addressed field is located *after* the variant parts. Grrrr... 
+# * Message type 26 is presently unsupported. It hasn't been observed
+#   in the wild yet as of Jan 2010; not a lot of point in trying util
+#   we have test data.  We'd need new machinery to constrain how many
+#   bits the data spec eats in order to recover the radio bits after it.
+# * No support for IMO236 and IMO289 special messages in types 6 and 8 yet.
+#
+# Decoding for 1-15, 18-21, and 24 have been tested against live data.
+# Decoding for 16-17, 22-23, and 25-27 have not.
+
+from glob import glob 
+
+# Here are the pseudoinstructions in the pseudolanguage.
+
+class bitfield:
+    "Object defining the interpretation of an AIS bitfield."
+    # The only un-obvious detail is the use of the oob (out-of-band)
+    # member.  This isn't used in data extraction, but rather to cut
+    # down on the number of custom formatting hooks.  With this we
+    # handle the case where the field should be reported as an integer
+    # or "n/a".
+    # The report member is cleared on copies of a bitfield placed in a
+    # decode plan (see compile_plan) when the field must still be decoded,
+    # e.g. to steer a dispatch, but was not asked for.
+    report = True
+    def __init__(self, name, width, dtype, oob, legend,
+                 validator=None, formatter=None, conditional=None):
+        self.name = name        # Fieldname, for internal use and JSON
+        self.width = width      # Bit width
+        self.type = dtype       # Data type: signed/unsigned/string/raw
+        self.oob = oob          # Out-of-band value to be shown as n/a
+        self.legend = legend        # Human-friendly description of field
+        self.validator = validator  # Validation checker
+        self.formatter = formatter  # Custom reporting hook.
+        self.conditional = conditional  # Evaluation guard for this field
+
+class spare:
+    "Describes spare bits,, not to be interpreted."
+    def __init__(self, width, conditional=None):
+        self.width = width
+        self.conditional = conditional  # Evaluation guard for this field
+
+class dispatch:
+    "Describes how to dispatch to a message type variant on a subfield value."
+    def __init__(self, fieldname, subtypes, compute=lambda x: x, conditional=None):
+        self.fieldname = fieldname  # Value of view to dispatch on
+        self.subtypes = subtypes    # Possible subtypes to dispatch to
+        self.compute = compute      # Pass value through this pre-dispatch
+        self.conditional = conditional  # Evaluation guard for this field
+
+class guard:
+    "Checks a decoded position against the region of a message filter."
+    def __init__(self, aisfilter, scale):
+        self.aisfilter = aisfilter  # Filter holding the region
+        self.scale = scale          # Raw lon/lat units per degree
+        self.conditional = None
+
+# Message-type-specific information begins here. There are four
+# different kinds of things in it: (1) string tables for expanding
+# enumerated-type codes, (2) hook functions, (3) instruction tables,
+# and (4) field group declarations.  This is the part that could, in
+# theory, be generated from a portable higher-level specification in
+# XML; only the hook functions are actually language-specific, and
+# your XML definition could in theory embed several different ones for
+# code generation in Python, Java, Perl, etc.
+
+cnb_status_legends = (
+    "Under way using engine",
+    "At anchor",
+    "Not under command",
+    "Restricted manoeuverability",
+    "Constrained by her draught",
+    "Moored",
+    "Aground",
+    "Engaged in fishing",
+    "Under way sailing",
+    "Reserved for HSC",
+    "Reserved for WIG",
+    "Reserved",
+    "Reserved",
+    "Reserved",
+    "Reserved",
+    "Not defined",
+    )
+
+def cnb_rot_format(n):
+    if n == -128:
+        return "n/a"
+    elif n == -127:
+        return "fastleft"
+    elif n == 127:
+        return "fastright"
+    else:
+        return str((n / 4.733) ** 2);
+
+def cnb_latlon_format(n):
+    return str(n / 600000.0)
+
+def cnb_speed_format(n):
+    if n == 1023:
+        return "n/a"
+    elif n == 1022:
+        return "fast"
+    else:
+        return str(n / 10.0);
+
+def cnb_course_format(n):
+    return str(n / 10.0);
+
+def cnb_second_format(n):
+    if n == 60:
+        return "n/a"
+    elif n == 61:
+        return "manual input"
+    elif n == 62:
+        return "dead reckoning"
+    elif n == 63:
+        return "inoperative"
+    else:
+        return str(n);
+
+# Common Navigation Block is the format for AIS types 1, 2, and 3
+cnb = (
+    bitfield("status",   4, 'unsigned', 0,         "Navigation Status",
+             formatter=cnb_status_legends),
+    bitfield("turn",     8, 'signed',   -128,      "Rate of Turn",
+             formatter=cnb_rot_format),       
+    bitfield("speed",   10, 'unsigned', 1023,      "Speed Over Ground",
+             formatter=cnb_speed_format),
+    bitfield("accuracy", 1, 'unsigned', None,      "Position Accuracy"),
+    bitfield("lon",     28, 'signed',   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",     27, 'signed',   0x3412140,  "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("course",  12, 'unsigned', 0xe10,      "Course Over Ground",
+             formatter=cnb_course_format),
+    bitfield("heading",  9, 'unsigned', 511,        "True Heading"),
+    bitfield("second",   6, 'unsigned', None,       "Time Stamp",
+             formatter=cnb_second_format),
+    bitfield("maneuver", 2, 'unsigned', None,       "Maneuver Indicator"),
+    spare(3),  
+    bitfield("raim",     1, 'unsigned', None,       "RAIM flag"),
+    bitfield("radio",   19, 'unsigned', None,       "Radio status"),
+)
+
+epfd_type_legends = (
+    "Undefined",
+    "GPS",
+    "GLONASS",
+    "Combined GPS/GLONASS",
+    "Loran-C",
+    "Chayka",
+    "Integrated navigation system",
+    "Surveyed",
+    "Galileo",
+    )
+
+type4 = (
+    bitfield("year",    14,  "unsigned", 0,         "Year"),
+    bitfield("month",    4,  "unsigned", 0,         "Month"),
+    bitfield("day",      5,  "unsigned", 0,         "Day"),
+    bitfield("hour",     5,  "unsigned", 24,        "Hour"),
+    bitfield("minute",   6,  "unsigned", 60,        "Minute"),
+    bitfield("second",   6,  "unsigned", 60,        "Second"),
+    bitfield("accuracy", 1,  "unsigned", None,      "Fix quality"),
+    bitfield("lon",     28,  "signed",   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",     27,  "signed",   0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("epfd",     4,  "unsigned", None,      "Type of EPFD",
+             validator=lambda n: n >= 0 and n <= 8 or n == 15,
+             formatter=epfd_type_legends),
+    spare(10),
+    bitfield("raim",     1,  "unsigned", None,      "RAIM flag "),
+    bitfield("radio",   19,  "unsigned", None,      "SOTDMA state"),
+    )
+
+ship_type_legends = (
+    "Not available",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Wing in ground (WIG) - all ships of this type",
+    "Wing in ground (WIG) - Hazardous category A",
+    "Wing in ground (WIG) - Hazardous category B",
+    "Wing in ground (WIG) - Hazardous category C",
+    "Wing in ground (WIG) - Hazardous category D",
+    "Wing in ground (WIG) - Reserved for future use",
+    "Wing in ground (WIG) - Reserved for future use",
+    "Wing in ground (WIG) - Reserved for future use",
+    "Wing in ground (WIG) - Reserved for future use",
+    "Wing in ground (WIG) - Reserved for future use",
+    "Fishing",
+    "Towing",
+    "Towing: length exceeds 200m or breadth exceeds 25m",
+    "Dredging or underwater ops",
+    "Diving ops",
+    "Military ops",
+    "Sailing",
+    "Pleasure Craft",
+    "Reserved",
+    "Reserved",
+    "High speed craft (HSC) - all ships of this type",
+    "High speed craft (HSC) - Hazardous category A",
+    "High speed craft (HSC) - Hazardous category B",
+    "High speed craft (HSC) - Hazardous category C",
+    "High speed craft (HSC) - Hazardous category D",
+    "High speed craft (HSC) - Reserved for future use",
+    "High speed craft (HSC) - Reserved for future use",
+    "High speed craft (HSC) - Reserved for future use",
+    "High speed craft (HSC) - Reserved for future use",
+    "High speed craft (HSC) - No additional information",
+    "Pilot Vessel",
+    "Search and Rescue vessel",
+    "Tug",
+    "Port Tender",
+    "Anti-pollution equipment",
+    "Law Enforcement",
+    "Spare - Local Vessel",
+    "Spare - Local Vessel",
+    "Medical Transport",
+    "Ship according to RR Resolution No. 18",
+    "Passenger - all ships of this type",
+    "Passenger - Hazardous category A",
+    "Passenger - Hazardous category B",
+    "Passenger - Hazardous category C",
+    "Passenger - Hazardous category D",
+    "Passenger - Reserved for future use",
+    "Passenger - Reserved for future use",
+    "Passenger - Reserved for future use",
+    "Passenger - Reserved for future use",
+    "Passenger - No additional information",
+    "Cargo - all ships of this type",
+    "Cargo - Hazardous category A",
+    "Cargo - Hazardous category B",
+    "Cargo - Hazardous category C",
+    "Cargo - Hazardous category D",
+    "Cargo - Reserved for future use",
+    "Cargo - Reserved for future use",
+    "Cargo - Reserved for future use",
+    "Cargo - Reserved for future use",
+    "Cargo - No additional information",
+    "Tanker - all ships of this type",
+    "Tanker - Hazardous category A",
+    "Tanker - Hazardous category B",
+    "Tanker - Hazardous category C",
+    "Tanker - Hazardous category D",
+    "Tanker - Reserved for future use",
+    "Tanker - Reserved for future use",
+    "Tanker - Reserved for future use",
+    "Tanker - Reserved for future use",
+    "Tanker - No additional information",
+    "Other Type - all ships of this type",
+    "Other Type - Hazardous category A",
+    "Other Type - Hazardous category B",
+    "Other Type - Hazardous category C",
+    "Other Type - Hazardous category D",
+    "Other Type - Reserved for future use",
+    "Other Type - Reserved for future use",
+    "Other Type - Reserved for future use",
+    "Other Type - Reserved for future use",
+    "Other Type - no additional information",
+)
+
+type5 = (
+    bitfield("ais_version",   2, 'unsigned', None, "AIS Version"),
+    bitfield("imo_id",       30, 'unsigned',    0, "IMO Identification Number"),
+    bitfield("callsign",     42, 'string',   None, "Call Sign"),              
+    bitfield("shipname",    120, 'string',   None, "Vessel Name"),
+    bitfield("shiptype",      8, 'unsigned', None, "Ship Type",
+             #validator=lambda n: n >= 0 and n <= 99,
+             formatter=ship_type_legends),
+    bitfield("to_bow",        9, 'unsigned',    0, "Dimension to Bow"),
+    bitfield("to_stern",      9, 'unsigned',    0, "Dimension to Stern"),
+    bitfield("to_port",       6, 'unsigned',    0, "Dimension to Port"),
+    bitfield("to_starbord",   6, 'unsigned',    0, "Dimension to Starboard"),
+    bitfield("epfd",          4, 'unsigned',    0, "Position Fix Type",
+             validator=lambda n: n >= 0 and n <= 8 or n == 15,
+             formatter=epfd_type_legends),
+    bitfield("month",         4, 'unsigned',    0, "ETA month"),
+    bitfield("day",           5, 'unsigned',    0, "ETA day"),
+    bitfield("hour",          5, 'unsigned',   24, "ETA hour"),
+    bitfield("minute",        6, 'unsigned',   60, "ETA minute"),
+    bitfield("draught",       8, 'unsigned',    0, "Draught",
+             formatter=lambda n: n/10.0),
+    bitfield("destination", 120, 'string',   None, "Destination"),
+    bitfield("dte",           1, 'unsigned', None, "DTE"),
+    spare(1),
+    )
+
+type6_dac_or_fid_unknown = (
+    bitfield("data",           920, 'raw',      None, "Data"),
+    )
+
+type6_dispatch = {}
+type6_dispatch[0] = type6_dac_or_fid_unknown
+
+# DAC 235 and 250 (UK, Rep. of Ireland)
+type6_dac235_dispatch = {}
+type6_dac235_dispatch[0] = type6_dac_or_fid_unknown
+
+type6_dac235_fid10 = (
+    bitfield("ana_int",        10, 'unsigned', None, "Supply voltage"),
+    bitfield("ana_ext1",       10, 'unsigned', None, "Analogue (Ext#1)"),
+    bitfield("ana_ext2",       10, 'unsigned', None, "Analogue (Ext#2)"),
+    bitfield("racon",           2, 'unsigned', None, "RACON status"),
+    bitfield("light",           2, 'unsigned', None, "Light status"),
+    bitfield("health",          1, 'unsigned', None, "Health"),
+    bitfield("stat_ext",        8, 'unsigned', None, "Status (ext)"),
+    bitfield("off_pos",         1, 'unsigned', None, "Position status"),
+)
+type6_dac235_dispatch[10] = type6_dac235_fid10
+
+type6_dac235 = (
+    dispatch("fid", type6_dac235_dispatch, lambda m: m if m in type6_dac235_dispatch else 0),
+    )
+type6_dispatch[235] = type6_dac235
+type6_dispatch[250] = type6_dac235
+
+type6 = (
+    bitfield("seqno",            2, 'unsigned', None, "Sequence Number"),
+    bitfield("dest_mmsi",       30, 'unsigned', None, "Destination MMSI"),
+    bitfield("retransmit",       1, 'unsigned', None, "Retransmit flag"),
+    spare(1),
+    bitfield("dac",             10, 'unsigned', 0,    "DAC"),
+    bitfield("fid",              6, 'unsigned', 0,    "Functional ID"),
+    dispatch("dac", type6_dispatch, lambda m: m if m in type6_dispatch else 0),
+    )
+
+type7 = (
+    spare(2),
+    bitfield("mmsi1",           30, 'unsigned', 0,    "MMSI number 1"),
+    spare(2),
+    bitfield("mmsi2",           30, 'unsigned', 0,    "MMSI number 2"),
+    spare(2),
+    bitfield("mmsi3",           30, 'unsigned', 0,    "MMSI number 3"),
+    spare(2),
+    bitfield("mmsi1",           30, 'unsigned', 0,    "MMSI number 4"),
+    spare(2),
+    )
+
+#
+# Type 8 have subtypes identified by DAC (Designated Area Code) and FID (Functional ID)
+#
+
+def type8_latlon_format(n):
+    return str(n / 60000.0)
+
+type8_dac_or_fid_unknown = (
+    bitfield("data",           952, 'raw',      None,  "Data"),
+    )
+
+type8_dispatch = {}
+type8_dispatch[0] = type8_dac_or_fid_unknown
+
+# DAC 1 (international)
+type8_dac1_dispatch = {}
+type8_dac1_dispatch[0] = type8_dac_or_fid_unknown
+
+# DAC 1, FID 11: IMO236 Met/Hydro message
+def type8_dac1_fid11_airtemp_format(n):
+    return str(n * 0.1 - 60)
+
+def type8_dac1_fid11_dewpoint_format(n):
+    return str(n * 0.1 - 20)
+
+def type8_dac1_fid11_pressure_format(n):
+    return str(n + 800)
+
+def type8_dac1_fid11_visibility_format(n):
+    return str(n * 0.1)
+
+def type8_dac1_fid11_waterlevel_format(n):
+    return str(n * 0.1 - 10)
+
+def type8_dac1_fid11_cspeed_format(n):
+    return str(n * 0.1)
+
+def type8_dac1_fid11_waveheight_format(n):
+    return str(n * 0.1)
+
+type8_dac1_fid11_seastate_legend = (
+    "Calm",
+    "Light air",
+    "Light breeze"
+    "Gentle breeze",
+    "Moderate breeze",
+    "Fresh breeze",
+    "Strong breeze",
+    "High wind",
+    "Gale",
+    "Strong gale",
+    "Storm",
+    "Violent storm",
+    "Hurricane force",
+    "Reserved",
+    "Reserved",
+    "Reserved"
+)
+
+def type8_dac1_fid11_watertemp_format(n):
+    return str(n * 0.1 - 10)
+
+type8_dac1_fid11_preciptype_legend = (
+    "Reserved",
+    "Rain",
+    "Thunderstorm",
+    "Freezing rain",
+    "Mixed/ice",
+    "Snow",
+    "Reserved",
+    "Reserved"
+)
+
+def type8_dac1_fid11_salinity_format(n):
+    return str(n * 0.1)
+
+type8_dac1_fid11_ice_legend = (
+    "Yes",
+    "No"
+    )
+
+type8_dac1_fid11 = (
+    bitfield("lat",          24,  "signed", 2**24-1, "Latitude",
+             formatter=type8_latlon_format),
+    bitfield("lon",          25,  "signed", 2**25-1, "Longitude",
+             formatter=type8_latlon_format),
+    bitfield("day",           5, 'unsigned',  0,    "ETA day"),
+    bitfield("hour",          5, 'unsigned', 24,    "ETA hour"),
+    bitfield("minute",        6, 'unsigned', 60,    "ETA minute"),
+    bitfield("wspeed",        7, 'unsigned', 127,   "Wind speed"),
+    bitfield("wgust",         7, 'unsigned', 127,   "Wind gust"),
+    bitfield("wdir",          9, 'unsigned', 511,   "Wind direction"),
+    bitfield("wgustdir",      9, 'unsigned', 511,   "Wind gust direction"),
+    bitfield("airtemp",      11, 'unsigned', 2047,  "Air temperature",
+             formatter=type8_dac1_fid11_airtemp_format),
+    bitfield("humidity",      7, 'unsigned', 127,   "Relative humidity"),
+    bitfield("dewpoint",     10, 'unsigned', 1023,  "Dew point",
+             formatter=type8_dac1_fid11_dewpoint_format),
+    bitfield("pressure",      9, 'unsigned', 511,   "Atmospheric pressure",
+             formatter=type8_dac1_fid11_pressure_format),
+    bitfield("pressuretend",  2, 'unsigned', 3,     "Atmospheric pressure tendency"),
+    bitfield("visibility",    8, 'unsigned', 255,   "Horizontal visibility",
+             formatter=type8_dac1_fid11_visibility_format),
+    bitfield("waterlevel",    9, 'unsigned', 511,    "Water level",
+             formatter=type8_dac1_fid11_waterlevel_format),
+    bitfield("leveltrend",    2, 'unsigned', 3,     "Water level trend"),
+    bitfield("cspeed",        8, 'unsigned', 255,   "Surface current speed",
+             formatter=type8_dac1_fid11_cspeed_format),
+    bitfield("cdir",          9, 'unsigned', 511,   "Surface current direction"),
+    bitfield("cspeed2",       8, 'unsigned', 255,   "Current speed #2",
+             formatter=type8_dac1_fid11_cspeed_format),
+    bitfield("cdir2",         9, 'unsigned', 511,   "Current direction #2"),
+    bitfield("cdepth2",       5, 'unsigned', 31,    "Current measuring level #2"),
+    bitfield("cspeed3",       8, 'unsigned', 255,   "Current speed #3",
+             formatter=type8_dac1_fid11_cspeed_format),
+    bitfield("cdir3",         9, 'unsigned', 511,   "Current direction #3"),
+    bitfield("cdepth3",       5, 'unsigned', 31,    "Current measuring level #3"),
+    bitfield("waveheight",    8, 'unsigned', 255,   "Significant wave height",
+             formatter=type8_dac1_fid11_waveheight_format),
+    bitfield("waveperiod",    6, 'unsigned', 63,    "Significant wave period"),
+    bitfield("wavedir",       9, 'unsigned', 511,   "Significant wave direction"),
+    bitfield("swellheight",   8, 'unsigned', 255,   "Swell height",
+             formatter=type8_dac1_fid11_waveheight_format),
+    bitfield("swellperiod",   6, 'unsigned', 63,    "Swell period"),
+    bitfield("swelldir",      9, 'unsigned', 511,   "Swell direction"),
+    bitfield("seastate",      4, 'unsigned', 15,    "Sea state",
+             formatter=type8_dac1_fid11_seastate_legend),
+    bitfield("watertemp",    10, 'unsigned', 1023,  "Water temperature",
+             formatter=type8_dac1_fid11_watertemp_format),
+    bitfield("preciptype",    3, 'unsigned', 7,     "Precipitation type",
+             formatter=type8_dac1_fid11_preciptype_legend),
+    bitfield("salinity",     9, 'unsigned', 511,    "Salinity",
+             formatter=type8_dac1_fid11_salinity_format),
+    bitfield("ice",          2, 'unsigned', 3,      "Ice?",
+             formatter=type8_dac1_fid11_ice_legend),
+    spare(6)
+    )
+type8_dac1_dispatch[11] = type8_dac1_fid11
+
+type8_dac1 = (
+    dispatch("fid", type8_dac1_dispatch, lambda m: m if m in type8_dac1_dispatch else 0),
+    )
+type8_dispatch[1] = type8_dac1
+
+type8 = (
+    spare(2),
+    bitfield("dac",            10,  'unsigned', 0,     "DAC"),
+    bitfield("fid",            6,   'unsigned', 0,     "Functional ID"),
+    dispatch("dac", type8_dispatch, lambda m: m if m in type8_dispatch else 0),
+    )
+
+def type9_alt_format(n):
+    if n == 4094:
+        return ">=4094"
+    else:
+        return str(n)
+
+def type9_speed_format(n):
+    if n == 1023:
+        return "n/a"
+    elif n == 1022:
+        return "fast"
+    else:
+        return str(n);
+
+type9 = (
+    bitfield("alt",         12, 'unsigned', 4095,      "Altitude",
+             formatter=type9_alt_format),
+    bitfield("speed",       10, 'unsigned', 1023,      "SOG",
+             formatter=type9_speed_format),
+    bitfield("accuracy",    1,  'unsigned', None,      "Position Accuracy"),
+    bitfield("lon",         28, 'signed',   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",         27, 'signed',   0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("course",      12, 'unsigned', 0xe10,     "Course Over Ground",
+             formatter=cnb_course_format),
+    bitfield("second",      6,  'unsigned', 60,        "Time Stamp",
+             formatter=cnb_second_format),
+    bitfield("regional",    8,  'unsigned', None,      "Regional reserved"),
+    bitfield("dte",         1,  'unsigned', None,      "DTE"),
+    spare(3),
+    bitfield("assigned",    1,  'unsigned', None,      "Assigned"),
+    bitfield("raim",        1,  'unsigned', None,      "RAIM flag"),
+    bitfield("radio",       19, 'unsigned', None,      "Radio status"),
+    )
+
+type10 = (
+    spare(2),
+    bitfield("dest_mmsi",       30, 'unsigned', None, "Destination MMSI"), 
+    spare(2),
+   )
+
+type12 = (
+    bitfield("seqno",            2, 'unsigned', None, "Sequence Number"),
+    bitfield("dest_mmsi",       30, 'unsigned', None, "Destination MMSI"),
+    bitfield("retransmit",       1, 'unsigned', None, "Retransmit flag"),
+    spare(1),
+    bitfield("text",           936, 'string',   None, "Text"),
+    )
+
+type14 = (
+    spare(2),
+    bitfield("text",           968, 'string',   None, "Text"),
+    )
+
+type15 = (
+    spare(2),
+    bitfield("mmsi1",     30, 'unsigned', 0, "First interrogated MMSI"),
+    bitfield("type1_1",   6,  'unsigned', 0, "First message type"),
+    bitfield("offset1_1", 12, 'unsigned', 0, "First slot offset"),
+    spare(2),
+    bitfield("type1_2",   6,  'unsigned', 0, "Second message type"),
+    bitfield("offset1_2", 12, 'unsigned', 0, "Second slot offset"),
+    spare(2),
+    bitfield("mmsi2",     30, 'unsigned', 0, "Second interrogated MMSI"),
+    bitfield("type2_1",   6,  'unsigned', 0, "Message type"),
+    bitfield("offset2_1", 12, 'unsifned', 0, "Slot offset"),
+    spare(2),
+    )
+
+type16 = (
+    spare(2),
+    bitfield("mmsi1",     30, 'unsigned', 0, "Interrogated MMSI 1"),
+    bitfield("offset1",   12, 'unsigned', 0, "First slot offset"),
+    bitfield("increment1",10, 'unsigned', 0, "First slot increment"),
+    bitfield("mmsi2",     30, 'unsigned', 0, "Interrogated MMSI 2"),
+    bitfield("offset2",   12, 'unsigned', 0, "Second slot offset"),
+    bitfield("increment2",10, 'unsigned', 0, "Second slot increment"),
+    spare(2),
+    )
+
+def short_latlon_format(n):
+    return str(n / 600.0)
+
+type17 = (
+    spare(2),
+    bitfield("lon",         18, 'signed',   0x1a838, "Longitude",
+             formatter=short_latlon_format),
+    bitfield("lat",         17, 'signed',   0xd548,  "Latitude",
+             formatter=short_latlon_format),
+    spare(5),
+    bitfield("data",      736,  'raw',      None,    "DGNSS data"),
+    )
+
+type18 = (
+    bitfield("reserved",    8,  'unsigned', None,      "Regional reserved"),
+    bitfield("speed",       10, 'unsigned', 1023,      "Speed Over Ground",
+             formatter=cnb_speed_format),
+    bitfield("accuracy",    1,  'unsigned', None,      "Position Accuracy"),
+    bitfield("lon",         28, 'signed',   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",         27, 'signed',   0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("course",      12, 'unsigned', 0xE10,     "Course Over Ground",
+             formatter=cnb_course_format),
+    bitfield("heading",     9,  'unsigned', 511,       "True Heading"),
+    bitfield("second",      6,  'unsigned', None,      "Time Stamp",
+             formatter=cnb_second_format),
+    bitfield("regional",    2,  'unsigned', None,      "Regional reserved"),
+    bitfield("cs",          1,  'unsigned', None,      "CS Unit"),
+    bitfield("display",     1,  'unsigned', None,      "Display flag"),
+    bitfield("dsc",         1,  'unsigned', None,      "DSC flag"),
+    bitfield("band",        1,  'unsigned', None,      "Band flag"),
+    bitfield("msg22",       1,  'unsigned', None,      "Message 22 flag"),
+    bitfield("assigned",    1,  'unsigned', None,      "Assigned"),
+    bitfield("raim",        1,  'unsigned', None,      "RAIM flag"),
+    bitfield("radio",       20, 'unsigned', None,      "Radio status"),
+    )
+
+type19 = (
+    bitfield("reserved",    8,  'unsigned', None,      "Regional reserved"),
+    bitfield("speed",       10, 'unsigned', 1023,      "Speed Over Ground",
+             formatter=cnb_speed_format),
+    bitfield("accuracy",    1,  'unsigned', None,      "Position Accuracy"),
+    bitfield("lon",         28, 'signed',   0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",         27, 'signed',   0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("course",      12, 'unsigned', 0xE10,     "Course Over Ground",
+             formatter=cnb_course_format),
+    bitfield("heading",     9,  'unsigned', 511,       "True Heading"),
+    bitfield("second",      6,  'unsigned', None,      "Time Stamp",
+             formatter=cnb_second_format),
+    bitfield("regional",    4,  'unsigned', None,      "Regional reserved"),
+    bitfield("shipname",  120,  'string',   None,      "Vessel Name"),
+    bitfield("shiptype",    8,  'unsigned', None,      "Ship Type",
+             #validator=lambda n: n >= 0 and n <= 99,
+             formatter=ship_type_legends),
+    bitfield("to_bow",      9,  'unsigned', 0,         "Dimension to Bow"),
+    bitfield("to_stern",    9,  'unsigned', 0,         "Dimension to Stern"),
+    bitfield("to_port",     6,  'unsigned', 0,         "Dimension to Port"),
+    bitfield("to_starbord", 6,  'unsigned', 0,         "Dimension to Starboard"),
+    bitfield("epfd",        4,  'unsigned', 0,         "Position Fix Type",
+             validator=lambda n: n >= 0 and n <= 8 or n == 15,
+             formatter=epfd_type_legends),
+    bitfield("assigned",    1,  'unsigned', None,      "Assigned"),
+    bitfield("raim",        1,  'unsigned', None,      "RAIM flag"),
+    bitfield("radio",       20, 'unsigned', None,      "Radio status"),
+    )
+
+type20 = (
+    spare(2),
+    bitfield("offset1",    12, 'unsigned', 0, "Offset number"),
+    bitfield("number1",     4, 'unsigned', 0, "Reserved slots"),
+    bitfield("timeout1",    3, 'unsigned', 0, "Time-out"),
+    bitfield("increment1", 11, 'unsigned', 0, "Increment"),
+    bitfield("offset2",    12, 'unsigned', 0, "Offset number 2"),
+    bitfield("number2",     4, 'unsigned', 0, "Reserved slots"),
+    bitfield("timeout2",    3, 'unsigned', 0, "Time-out"),
+    bitfield("increment2", 11, 'unsigned', 0, "Increment"),
+    bitfield("offset3",    12, 'unsigned', 0, "Offset number 3"),
+    bitfield("number3",     4, 'unsigned', 0, "Reserved slots"),
+    bitfield("timeout3",    3, 'unsigned', 0, "Time-out"),
+    bitfield("increment3", 11, 'unsigned', 0, "Increment"),
+    bitfield("offset4",    12, 'unsigned', 0, "Offset number 4"),
+    bitfield("number4",     4, 'unsigned', 0, "Reserved slots"),
+    bitfield("timeout4",    3, 'unsigned', 0, "Time-out"),
+    bitfield("increment4", 11, 'unsigned', 0, "Increment"),
+    )
+
+aide_type_legends = (
+    "Unspecified",
+    "Reference point",
+    "RACON",
+    "Fixed offshore structure",
+    "Spare, Reserved for future use.",
+    "Light, without sectors",
+    "Light, with sectors",
+    "Leading Light Front",
+    "Leading Light Rear",
+    "Beacon, Cardinal N",
+    "Beacon, Cardinal E",
+    "Beacon, Cardinal S",
+    "Beacon, Cardinal W",
+    "Beacon, Port hand",
+    "Beacon, Starboard hand",
+    "Beacon, Preferred Channel port hand",
+    "Beacon, Preferred Channel starboard hand",
+    "Beacon, Isolated danger",
+    "Beacon, Safe water",
+    "Beacon, Special mark",
+    "Cardinal Mark N",
+    "Cardinal Mark E",
+    "Cardinal Mark S",
+    "Cardinal Mark W",
+    "Port hand Mark",
+    "Starboard hand Mark",
+    "Preferred Channel Port hand",
+    "Preferred Channel Starboard hand",
+    "Isolated danger",
+    "Safe Water",
+    "Special Mark",
+    "Light Vessel / LANBY / Rigs",
+        )
+
+type21 = (
+    bitfield("aid_type",        5, 'unsigned',  0,         "Aid type",
+             formatter=aide_type_legends),
+    bitfield("name",          120, 'string',    None,      "Name"),
+    bitfield("accuracy",        1, 'unsigned',  0,         "Position Accuracy"),
+    bitfield("lon",            28, 'signed',    0x6791AC0, "Longitude",
+             formatter=cnb_latlon_format),
+    bitfield("lat",            27, 'signed',    0x3412140, "Latitude",
+             formatter=cnb_latlon_format),
+    bitfield("to_bow",          9, 'unsigned',  0,         "Dimension to Bow"),
+    bitfield("to_stern",        9, 'unsigned',  0,         "Dimension to Stern"),
+    bitfield("to_port",         6, 'unsigned',  0,         "Dimension to Port"),
+    bitfield("to_starboard",    6, 'unsigned',  0,         "Dimension to Starboard"),
+    bitfield("epfd",            4, 'unsigned',  0,         "Position Fix Type",
+             validator=lambda n: n >= 0 and n <= 8 or n == 15,
+             formatter=epfd_type_legends),
+    bitfield("second",          6, 'unsigned',  0,         "UTC Second"),
+    bitfield("off_position",    1, 'unsigned',  0,         "Off-Position Indicator"),
+    bitfield("regional",        8, 'unsigned',  0,         "Regional reserved"),
+    bitfield("raim",            1, 'unsigned',  0,         "RAIM flag"),
+    bitfield("virtual_aid",     1, 'unsigned',  0,         "Virtual-aid flag"),
+    bitfield("assigned",        1, 'unsigned',  0,         "Assigned-mode flag"),
+    spare(1),
+    bitfield("name",           88, 'string',    0,         "Name Extension"),
+    )
+
+type22 = (
+    spare(2),
+    bitfield("channel_a", 12, 'unsigned',  0,       "Channel A"),
+    bitfield("channel_b", 12, 'unsigned',  0,       "Channel B"),
+    bitfield("txrx",       4, 'unsigned',  0,       "Tx/Rx mode"),
+    bitfield("power",      1, 'unsigned',  0,       "Power"),
+    bitfield("ne_lon",    18, 'signed',    0x1a838, "NE Longitude",
+             formatter=short_latlon_format),
+    bitfield("ne_lat",    17, 'signed',    0xd548,  "NE Latitude",
+             formatter=short_latlon_format),
+    bitfield("sw_lon",    18, 'signed',    0x1a838, "SW Longitude",
+             formatter=short_latlon_format),
+    bitfield("sw_lat",    17, 'signed',    0xd548,  "SW Latitude",
+             formatter=short_latlon_format),
+    bitfield("addressed",  1, 'unsigned',  0,       "Addressed"),
+    bitfield("band_a",     1, 'unsigned',  0,       "Channel A Band"),
+    bitfield("band_a",     1, 'unsigned',  0,       "Channel A Band"),
+    bitfield("zonesize",   3, 'unsigned',  0,       "Zone size"),
+    spare(23),
+    )
+
+station_type_legends = (
+    "All types of mobiles",
+    "Reserved for future use",
+    "All types of Class B mobile stations",
+    "SAR airborne mobile station",
+    "Aid to Navigation station",
+    "Class B shipborne mobile station",
+    "Regional use and inland waterways",
+    "Regional use and inland waterways",
+    "Regional use and inland waterways",
+    "Regional use and inland waterways",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+    "Reserved for future use",
+        )
+
+type23 = (
+    spare(2),
+    bitfield("ne_lon",    18, 'signed',    0x1a838, "NE Longitude",
+             formatter=short_latlon_format),
+    bitfield("ne_lat",    17, 'signed',    0xd548,  "NE Latitude",
+             formatter=short_latlon_format),
+    bitfield("sw_lon",    18, 'signed',    0x1a838, "SW Longitude",
+             formatter=short_latlon_format),
+    bitfield("sw_lat",    17, 'signed',    0xd548,  "SW Latitude",
+             formatter=short_latlon_format),
+    bitfield("stationtype",4, 'unsigned',  0,       "Station Type",
+             validator=lambda n: n >= 0 and n <= 31,
+             formatter=station_type_legends),
+    bitfield("shiptype",   8, 'unsigned',  0,       "Ship Type",
+             #validator=lambda n: n >= 0 and n <= 99,
+             formatter=ship_type_legends),
+    spare(22),
+    bitfield("txrx",       2, 'unsigned',  0,       "Tx/Rx mode"),
+    bitfield("interval",   4, 'unsigned',  0,       "Reporting interval"),
+    bitfield("txrx",       4, 'unsigned',  0,       "Quiet time"),
+    )
+
+type24a = (
+    bitfield("shipname",    120, 'string',   None, "Vessel Name"),
+    spare(8),
+    )
+
+
+type24b1 = (
+    bitfield("callsign",     42, 'string',   None, "Call Sign"),              
+    bitfield("to_bow",        9, 'unsigned',    0, "Dimension to Bow"),
+    bitfield("to_stern",      9, 'unsigned',    0, "Dimension to Stern"),
+    bitfield("to_port",       6, 'unsigned',    0, "Dimension to Port"),
+    bitfield("to_starbord",   6, 'unsigned',    0, "Dimension to Starboard"),
+    spare(8),
+    )
+
+type24b2 = (
+    bitfield('mothership_mmsi', 30, 'unsigned',    0, "Mothership MMSI"),
+    spare(8),
+    )
+
+type24b = (
+    bitfield("shiptype",      8, 'unsigned', None, "Ship Type",
+             validator=lambda n: n >= 0 and n <= 99,
+             formatter=ship_type_legends),
+    bitfield("vendorid",     42, 'string',   None, "Vendor ID"),
+    # Replaced backticks w/ repr CH 20171224 dispatch("mmsi", {0:type24b1, 1:type24b2}, lambda m: 1 if `m`[:2]=='98' else 0),
+    dispatch("mmsi", {0:type24b1, 1:type24b2}, lambda m: 1 if repr(m)[:2]=='98' else 0),
+    )
+
+type24 = (
+    bitfield('partno', 2, 'unsigned', None, "Part Number"),
+    dispatch('partno', {0:type24a, 1:type24b}),
+    )
+
+type25 = (
+    bitfield("addressed",     1, 'unsigned',    None, "Addressing flag"),
+    bitfield("structured",    1, 'unsigned',    None, "Dimension to Bow"),
+    bitfield("dest_mmsi",    30, 'unsigned',       0, "Destinstion MMSI",
+             conditional=lambda i, v: v["addressed"]),
+    bitfield("app_id",       16, 'unsigned',       0, "Application ID",
+             conditional=lambda i, v: v["structured"]),
+    bitfield("data",          0, 'raw',         None, "Data"),
+    )
+
+# No type 26 handling yet,
+
+type27 = (
+    bitfield("accuracy", 1,  'unsigned', None,      "Position Accuracy"),
+    bitfield("raim",     1,  'unsigned', None,      "RAIM flag"),
+    bitfield("status",   4,  'unsigned', 0,         "Navigation Status",
+             formatter=cnb_status_legends),
+    bitfield("lon",      18, 'signed',   0x1a838,   "Longitude",
+             formatter=short_latlon_format),
+    bitfield("lat",      17, 'signed',   0xd548,    "Latitude",
+             formatter=short_latlon_format),
+    bitfield("speed",     6, 'unsigned', 63,        "Speed Over Ground",
+             formatter=cnb_speed_format),
+    bitfield("course",    9, 'unsigned', 511,       "Course Over Ground"),
+    bitfield("GNSS",      1, 'unsigned', None,      "GNSS flag"),
+    spare(1),  
+    )
+
+aivdm_decode = (
+    bitfield('msgtype',       6, 'unsigned',    0, "Message Type",
+        validator=lambda n: n > 0 and n <= 27),
+    bitfield('repeat',        2, 'unsigned', None, "Repeat Indicator"),
+    bitfield('mmsi',         30, 'unsigned',    0, "MMSI"),
+    # This is the master dispatch on AIS message type
+    dispatch('msgtype',      {0:None,    1:cnb,    2:cnb,     3:cnb,    4:type4,
+                              5:type5,   6:type6,  7:type7,   8:type8,  9:type9,
+                              10:type10, 11:type4, 12:type12, 13:type7, 14:type14,
+                              15:type15, 16:type16,17:type17, 18:type18,19:type19,
+                              20:type20, 21:type21,22:type22, 23:type23,24:type24,
+                              25:type25, 26:None,  27:type27}),
+    )
+
+# Length ranges.  We use this for integrity checking.
+# When a range is a tuple, it's (minimum, maximum).
+lengths = {
+    1:  168,
+    2:  168,
+    3:  168,
+    4:  168,
+    5:  424,
+    6:  (88, 1008),
+    7:  (72, 168),
+    8:  (56, 1008),
+    9:  168,
+    10: 72,
+    11: 168,
+    12: (72, 1008),
+    13: (72, 168),
+    14: (40, 1008),
+    15: (88, 168),
+    16: (96, 144),
+    17: (80, 816),
+    18: 168,
+    19: 312,
+    20: (72, 160),
+    21: (272, 360),
+    22: 168,
+    23: 160,
+    24: (160, 168),
+    25: 168,
+    26: (60, 1004),
+    27: 96,
+    }
+
+field_groups = (
+    # This one occurs in message type 4
+    (3, ["year", "month", "day", "hour", "minute", "second"],
+     "time", "Timestamp",
+     lambda y, m, d, h, n, s: "%02d-%02d-%02dT%02d:%02d:%02dZ" % (y, m, d, h, n, s)),
+    # This one is in message 5
+    (13, ["month", "day", "hour", "minute", "second"],
+     "eta", "Estimated Time of Arrival",
+     lambda m, d, h, n, s: "%02d-%02dT%02d:%02d:%02dZ" % (m, d, h, n, s)),
+)
+
+# Message-type-specific information ends here.
+#
+# Next, the execution machinery for the pseudolanguage. There isn't much of
+# this: the whole point of the design is to embody most of the information
+# about the AIS format in the pseudoinstruction tables.
+
+from array import array
+
+BITS_PER_BYTE = 8
+
+class BitVector:
+    "Fast bit-vector class based on Python built-in array type."
+    def __init__(self, data=None, length=None):
+        self.bits = array('B')
+        self.bitlen = 0
+        if data is not None:
+            self.bits.extend(data)
+            if length is None:
+                self.bitlen = len(data) * 8
+            else:
+                self.bitlen = length
+    def extend_to(self, length):
+        "Extend vector to given bitlength."
+        if length > self.bitlen:
+            # Changed / to // for Python3 integer division CH 20171204 self.bits.extend([0]*((length - self.bitlen +7 )/8))
+            self.bits.extend([0]*((length - self.bitlen +7 )//8))
+            self.bitlen = length
+    def from_sixbit(self, data, pad=0):
+        "Initialize bit vector from AIVDM-style six-bit armoring."
+        self.bits.extend([0] * len(data))
+        for ch in data:
+            ch = ord(ch) - 48
+            if ch > 40:
+                ch -= 8
+            for i in (5, 4, 3, 2, 1, 0):
+                if (ch >> i) & 0x01:
+                    # Changed / to // for Python3 integer division CH 20171204 self.bits[self.bitlen/8] |= (1 << (7 - self.bitlen % 8))
+                    self.bits[self.bitlen//8] |= (1 << (7 - self.bitlen % 8))
+                self.bitlen += 1
+        self.bitlen -= pad
+    def ubits(self, start, width):
+        "Extract a (zero-origin) bitfield from the buffer as an unsigned int."
+        fld = 0
+        # Changed / to // for Python3 integer division CH 20171204 for i in range(start/BITS_PER_BYTE, (start + width + BITS_PER_BYTE - 1) / BITS_PER_BYTE):
+        for i in range(start//BITS_PER_BYTE, (start + width + BITS_PER_BYTE - 1) // BITS_PER_BYTE):
+            fld <<= BITS_PER_BYTE
+            fld |= self.bits[i]
+        end = (start + width) % BITS_PER_BYTE
+        if end != 0:
+            fld >>= (BITS_PER_BYTE - end)
+        fld &= ~(-1 << width)
+        return fld
+    def sbits(self, start, width):
+        "Extract a (zero-origin) bitfield from the buffer as a signed int."
+        fld = self.ubits(start, width);
+        if fld & (1 << (width-1)):
+            fld = -(2 ** width - fld)
+        return fld
+    def __len__(self):
+        return self.bitlen
+    def __repr__(self):
+        "Used for dumping binary data."
+        return str(self.bitlen) + ":" + "".join(map(lambda d: "%02x" % d, self.bits[:(self.bitlen + 7)//8]))
+
+
+# Exceptions no longer need be imported for python3 CH20171204 import sys, exceptions, re
+import sys, os, re, copy, calendar, time, heapq, multiprocessing, base64, zlib, mmap, collections
+from contextlib import contextmanager
+from pgcopy_binary import BinaryCopyBatch
+
+# NumPy is only needed for the columnar interfaces (decode_files() and
+# friends), and pandas only for their DataFrame output. Both are imported
+# on first use, keeping startup of the command line decoders fast.
+numpy = None
+
+def import_numpy():
+    "Import NumPy for the columnar interfaces, on first use."
+    global numpy
+    import numpy
+
+# Exceptions no longer separate class for Python3 CH20171204 class AISUnpackingException(exceptions.Exception):
+class AISUnpackingException(Exception):
+    def __init__(self, lc, fieldname, value):
+        self.lc = lc
+        self.fieldname = fieldname
+        self.value = value
+    def __repr__(self):
+        return "%d: validation on fieldname %s failed (value %s)" % (self.lc, self.fieldname, self.value)
+
+class AISFilteredException(Exception):
+    "Raised when a message is rejected by a filter part way through decoding."
+    def __init__(self, lc, criterion):
+        self.lc = lc
+        self.criterion = criterion
+    def __repr__(self):
+        return "%d: message rejected by %s filter" % (self.lc, self.criterion)
+
+# Six-bit string fields are decoded whole rather than a character at a
+# time. Base64 also encodes six bits per character, so the bits of the
+# field are packed into bytes and base64 encoded, and the result is
+# mapped onto the AIS six-bit alphabet with a single translate.
+sixbit_alphabet = "@ABCDEFGHIJKLMNOPQRSTUVWXYZ[\\]^- !\"#$%&'()*+,-./0123456789:;<=>?"
+base64_alphabet = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/"
+sixbit_table = str.maketrans(base64_alphabet, sixbit_alphabet)
+
+# Names, callsigns and destinations repeat across a great many messages,
+# so decoded strings are cached by their raw bits and interned, letting
+# every copy held by the registry or the columnar outputs share storage.
+# The cache is simply emptied when it reaches sixbit_cache_size entries.
+sixbit_cache = {}
+sixbit_cache_size = 65536
+
+def sixbit_string(data, offset, width):
+    "Decode a six-bit string field, truncated at the first @ and right-stripped."
+    # Variable-length strings, as in messages 12 and 14, may run off the
+    # end of the data; only the characters actually present are decoded.
+    nchars = min(width//6, (len(data.bits)*8 - offset)//6)
+    if nchars <= 0:
+        return ''
+    raw = data.ubits(offset, 6*nchars)
+    key = (nchars, raw)
+    value = sixbit_cache.get(key)
+    if value is None:
+        pad = -6*nchars % 24
+        packed = (raw << pad).to_bytes((6*nchars + pad)//8, 'big')
+        value = base64.b64encode(packed).decode('ascii')[:nchars].translate(sixbit_table)
+        end = value.find('@')
+        if end >= 0:
+            value = value[:end]
+        value = sys.intern(value.rstrip())
+        if len(sixbit_cache) >= sixbit_cache_size:
+            sixbit_cache.clear()
+        sixbit_cache[key] = value
+    return value
+
+def aivdm_unpack(lc, data, offset, values, instructions):
+    "Unpack fields from data according to instructions."
+    cooked = []
+    for inst in instructions:
+        if offset >= len(data):
+            break
+        elif inst.conditional is not None and not inst.conditional(inst,values):
+            continue
+        elif isinstance(inst, spare):
+            offset += inst.width
+        elif isinstance(inst, dispatch):
+            i = inst.compute(values[inst.fieldname])
+            # This is the recursion that lets us handle variant types
+            cooked += aivdm_unpack(lc, data, offset, values, inst.subtypes[i])
+        elif isinstance(inst, guard):
+            (lon, lat) = (values["lon"] / inst.scale, values["lat"] / inst.scale)
+            # A position given as not available (lon 181 / lat 91) is no
+            # position, and the message is kept.
+            if lon != 181 and lat != 91 and not inst.aisfilter.position_ok(lon, lat):
+                raise AISFilteredException(lc, "position")
+        elif isinstance(inst, bitfield):
+            if inst.type == 'unsigned':
+                value = data.ubits(offset, inst.width)
+            elif inst.type == 'signed':
+                value = data.sbits(offset, inst.width)
+            elif inst.type == 'string':
+                value = sixbit_string(data, offset, inst.width)
+            elif inst.type == 'raw':
+                # Note: Doesn't rely on the length.
+                value = BitVector(data.bits[offset//8:], len(data)-offset)
+            values[inst.name] = value
+            if inst.validator and not inst.validator(value):
+                raise AISUnpackingException(lc, inst.name, value)
+            offset += inst.width
+            # An important thing about the unpacked representation this
+            # generates is that it carries forward the meta-information from
+            # the field type definition.  This stuff is then available for
+            # use by report-generating code.
+            if inst.report:
+                cooked.append([inst, value])
+    return cooked
+
+# Field projection. A decode plan is a copy of the instruction tables in
+# which every bitfield that was not asked for is replaced by a spare, so
+# aivdm_unpack() steps over it without extracting or formatting anything.
+# Runs of spares are merged and trailing spares are dropped, so decoding of
+# a message stops as soon as the last requested field has been read.
+
+# Alternate names accepted for some fields when requesting a projection.
+field_aliases = {
+    "sog": "speed",
+    "cog": "course",
+    }
+
+def table_fieldnames(instructions, bitfields, dispatched):
+    "Collect the bitfield names, and the names dispatched on, in an instruction table."
+    for inst in instructions:
+        if isinstance(inst, dispatch):
+            dispatched.add(inst.fieldname)
+            for sub in inst.subtypes.values():
+                if sub is not None:
+                    table_fieldnames(sub, bitfields, dispatched)
+        elif isinstance(inst, bitfield):
+            bitfields.add(inst.name)
+
+# Raw lon/lat units per degree for each of the position formatters, used
+# to place a position guard in a decode plan.
+latlon_scales = {
+    cnb_latlon_format: 600000.0,
+    short_latlon_format: 600.0,
+    type8_latlon_format: 60000.0,
+    }
+
+def compile_plan(instructions, wanted, needed, compiled, aisfilter=None):
+    "Compile an instruction table into a plan decoding only the wanted and needed fields."
+    if id(instructions) in compiled:
+        return compiled[id(instructions)]
+    # Conditionals can't be inspected for the fields they look at, so in a
+    # table that has any, every field is decoded for them.
+    if [inst for inst in instructions if inst.conditional is not None]:
+        needed = needed | set([inst.name for inst in instructions if isinstance(inst, bitfield)])
+    # Positions in this table are checked against the filter region as
+    # soon as both the lon and lat fields have been decoded.
+    positions = [inst for inst in instructions if isinstance(inst, bitfield) and inst.name in ("lon", "lat")]
+    if aisfilter is None or aisfilter.bbox is None or len(positions) != 2:
+        positions = []
+    plan = []
+    for inst in instructions:
+        if isinstance(inst, dispatch):
+            subtypes = {}
+            for (value, sub) in inst.subtypes.items():
+                if sub is not None:
+                    sub = compile_plan(sub, wanted, needed, compiled, aisfilter)
+                subtypes[value] = sub
+            plan.append(dispatch(inst.fieldname, subtypes, inst.compute, inst.conditional))
+        elif isinstance(inst, bitfield) and inst.name in wanted:
+            plan.append(inst)
+        elif isinstance(inst, bitfield) and inst.name in needed:
+            hidden = copy.copy(inst)
+            hidden.report = False
+            plan.append(hidden)
+        elif plan and isinstance(plan[-1], spare) and plan[-1].conditional is None and inst.conditional is None:
+            plan[-1] = spare(plan[-1].width + inst.width)
+        else:
+            plan.append(spare(inst.width, inst.conditional))
+        if positions and inst is positions[-1]:
+            plan.append(guard(aisfilter, latlon_scales[inst.formatter]))
+    while plan and isinstance(plan[-1], spare):
+        plan.pop()
+    compiled[id(instructions)] = tuple(plan)
+    return compiled[id(instructions)]
+
+# Decode plans already compiled, by requested field set and filter.
+decode_plans = {}
+
+def decode_plan(fields=None, aisfilter=None, keep=()):
+    "Return the decode plan reporting only the named fields (all fields if None)."
+    if fields is None and (aisfilter is None or aisfilter.bbox is None):
+        return aivdm_decode
+    known = set()
+    dispatched = set()
+    table_fieldnames(aivdm_decode, known, dispatched)
+    if fields is None:
+        fields = known
+    plan_key = (frozenset(fields), aisfilter, frozenset(keep))
+    if plan_key not in decode_plans:
+        wanted = set([field_aliases.get(name, name) for name in fields])
+        unknown = wanted - known
+        if unknown:
+            raise ValueError("unknown field name(s): " + ",".join(sorted(unknown)))
+        # The message type is always reported, as it identifies the layout
+        # of the remaining fields.
+        wanted.add('msgtype')
+        # Fields kept for consumers (e.g. the vessel registry) are
+        # decoded but not reported.
+        needed = set(dispatched) | set(keep)
+        if aisfilter is not None and aisfilter.bbox is not None:
+            needed.update(("lon", "lat"))
+        decode_plans[plan_key] = compile_plan(aivdm_decode, wanted, needed, {}, aisfilter)
+    return decode_plans[plan_key]
+
+class AISFilter:
+    "Receive time, MMSI, region and sampling criteria applied to messages while decoding."
+    def __init__(self, window=None, mmsi_allow=None, mmsi_deny=None, bbox=None, polygon=None, sample=None, sample_by='mmsi'):
+        self.window = window            # (start, end) epoch seconds, end excluded
+        self.mmsi_allow = mmsi_allow    # Set of MMSIs to keep, or None for all
+        self.mmsi_deny = mmsi_deny      # Set of MMSIs to drop, or None
+        self.sample = sample            # Keep 1 in sample MMSIs / sentences, or None for all
+        self.sample_by = sample_by      # 'mmsi' or 'sentence'
+        self.polygon = polygon          # List of (lon, lat) vertices, or None
+        # A polygon is first screened against its own bounding box.
+        if bbox is None and polygon:
+            bbox = (min([p[0] for p in polygon]), min([p[1] for p in polygon]),
+                    max([p[0] for p in polygon]), max([p[1] for p in polygon]))
+        self.bbox = bbox                # (west, south, east, north), or None
+
+    def time_ok(self, timestamp):
+        "Is a receive time (epoch seconds, or None if unknown) inside the window?"
+        if self.window is None:
+            return True
+        return timestamp is not None and self.window[0] <= timestamp < self.window[1]
+
+    def mmsi_ok(self, mmsi):
+        "Is an MMSI allowed through the filter?"
+        if self.mmsi_allow is not None and mmsi not in self.mmsi_allow:
+            return False
+        if self.sample is not None and self.sample_by == 'mmsi' and not self.sampled(str(mmsi).encode('ascii')):
+            return False
+        return self.mmsi_deny is None or mmsi not in self.mmsi_deny
+
+    def sampled(self, key):
+        "Is a key (bytes) in the sample? A CRC rather than hash() keeps the sample the same from run to run."
+        return zlib.crc32(key) % self.sample == 0
+
+    def payload_ok(self, bits):
+        "Is a message payload (BitVector) allowed through the filter, when sampling by sentence?"
+        if self.sample is None or self.sample_by != 'sentence':
+            return True
+        # Sampling on the payload alone keeps or drops every copy of a
+        # sentence together, whichever receiver or time it came with.
+        return self.sampled(bits.bits.tobytes())
+
+    def position_ok(self, lon, lat):
+        "Is a position (decimal degrees) within the filter region?"
+        (west, south, east, north) = self.bbox
+        if not (west <= lon <= east and south <= lat <= north):
+            return False
+        if not self.polygon:
+            return True
+        # Ray casting point in polygon test.
+        inside = False
+        j = len(self.polygon) - 1
+        for i in range(len(self.polygon)):
+            (xi, yi) = self.polygon[i]
+            (xj, yj) = self.polygon[j]
+            if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+        return inside
+
+def window_time(text):
+    "Convert a time window bound, as epoch seconds or YYYYmmddTHHMMSS (UTC), to epoch seconds."
+    text = text.strip()
+    if text.isdigit():
+        return int(text)
+    return calendar.timegm(time.strptime(text, "%Y%m%dT%H%M%S"))
+
+def parse_time_slice(text):
+    "Convert a time slice, START..END with each bound as for window_time(), to (start, end) epoch seconds."
+    bounds = text.split("..")
+    if len(bounds) != 2:
+        raise ValueError("time slice must be given as START..END")
+    return tuple([window_time(bound) for bound in bounds])
+
+def read_mmsi_list(filename):
+    "Read a set of MMSIs, one per line, from a file (blank lines and # comments are ignored)."
+    mmsis = set()
+    with open(filename, 'r') as mmsi_file:
+        for line in mmsi_file:
+            line = line.split("#")[0].strip()
+            if line:
+                mmsis.add(int(line))
+    return mmsis
+
+def read_polygon(filename):
+    "Read polygon vertices, one lon,lat pair per line, from a file (blank lines and # comments are ignored)."
+    polygon = []
+    with open(filename, 'r') as polygon_file:
+        for line in polygon_file:
+            line = line.split("#")[0].strip()
+            if line:
+                (lon, lat) = line.replace(",", " ").split()
+                polygon.append((float(lon), float(lat)))
+    if len(polygon) < 3:
+        raise ValueError("polygon in " + filename + " has fewer than 3 vertices")
+    return polygon
+
+def registry_time(timestamp):
+    "Format a registry first / last seen time (epoch seconds, or None if unknown)."
+    if timestamp is None:
+        return ""
+    return time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(timestamp))
+
+class VesselRegistry:
+    "Latest static and voyage data per MMSI, gathered from types 5, 19 and 24 while decoding."
+    msgtypes = (5, 19, 24)
+    fieldnames = ("shipname", "callsign", "imo_id", "shiptype", "to_bow", "to_stern",
+                  "to_port", "to_starbord", "draught", "destination")
+
+    def __init__(self, filename=None, checkpoint=0):
+        self.filename = filename        # Table written at checkpoints and at the end
+        self.checkpoint = checkpoint    # Static messages between checkpoints, 0 for none
+        self.vessels = {}
+        self.updates = 0
+
+    def update(self, values, date):
+        "Merge the static fields of a decoded message, received with the given prefix, into the registry."
+        if values.get('msgtype') not in self.msgtypes:
+            return
+        seen = prefix_timestamp(date)
+        vessel = self.vessels.get(values['mmsi'])
+        if vessel is None:
+            vessel = {'first_seen': seen, 'last_seen': seen, 'changes': 0}
+            self.vessels[values['mmsi']] = vessel
+        # Types 19 and 24 each carry only part of the static data, so only
+        # the fields present (and not blank) in this message are merged.
+        changed = False
+        for name in self.fieldnames:
+            value = values.get(name)
+            if value is None or value == "":
+                continue
+            if name in vessel and vessel[name] != value:
+                changed = True
+            vessel[name] = value
+        if changed:
+            vessel['changes'] += 1
+        if seen is not None:
+            if vessel['first_seen'] is None or seen < vessel['first_seen']:
+                vessel['first_seen'] = seen
+            if vessel['last_seen'] is None or seen > vessel['last_seen']:
+                vessel['last_seen'] = seen
+        self.updates += 1
+        if self.checkpoint and self.filename and self.updates % self.checkpoint == 0:
+            self.write()
+
+    def write(self, filename=None):
+        "Write the registry as a pipe-delimited table, one row per MMSI."
+        if filename is None:
+            filename = self.filename
+        # Write to a temporary file and rename, so that readers of a
+        # checkpoint never see a partial table.
+        with open(filename + ".tmp", 'w') as registry_file:
+            registry_file.write("|".join(("mmsi",) + self.fieldnames + ("first_seen", "last_seen", "changes")) + "\n")
+            for mmsi in sorted(self.vessels):
+                vessel = self.vessels[mmsi]
+                registry_file.write("|".join([str(mmsi)] + [str(vessel.get(name, "")) for name in self.fieldnames] +
+                    [registry_time(vessel['first_seen']), registry_time(vessel['last_seen']), str(vessel['changes'])]) + "\n")
+        os.replace(filename + ".tmp", filename)
+
+class PositionBuckets:
+    "Position reports gathered while decoding, partitioned by MMSI into csv bucket files laid out as track generation input."
+    msgtypes = (1, 2, 3, 18, 19)
+    fieldnames = ("status", "speed", "course", "heading", "lat", "lon")
+    columns = ("time", "message_id", "mmsi", "navigational_status", "sog", "cog", "heading", "latitude", "longitude")
+
+    def __init__(self, directory, buckets=16):
+        if buckets < 1:
+            raise ValueError("bucket count must be at least 1")
+        self.directory = directory
+        self.buckets = buckets
+        self.bucket_files = []
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        for bucket in range(buckets):
+            bucket_file = open(os.path.join(directory, "positions_%03d.csv" % bucket), 'w')
+            bucket_file.write(",".join(self.columns) + "\n")
+            self.bucket_files.append(bucket_file)
+
+    def update(self, values, date):
+        "Write a decoded message, received with the given prefix, to the bucket of its MMSI if it is a position report."
+        if values.get('msgtype') not in self.msgtypes:
+            return
+        # Reports without a receive time cannot be placed in a track.
+        received = prefix_timestamp(date)
+        if received is None:
+            return
+        # Each message is written as it is decoded, so every vessel lands
+        # in exactly one bucket, in the order of the input. Class B
+        # reports carry no navigational status.
+        row = [registry_time(received), values['msgtype'], values['mmsi'], values.get('status', ""),
+               values['speed'] / 10.0, values['course'] / 10.0, values['heading'],
+               values['lat'] / 600000.0, values['lon'] / 600000.0]
+        self.bucket_files[values['mmsi'] % self.buckets].write(",".join(map(str, row)) + "\n")
+
+    def close(self):
+        for bucket_file in self.bucket_files:
+            bucket_file.close()
+
+class OutputFilePool:
+    "Output files opened for append on demand, with at most max_open open at once (the least recently used closed first)."
+    def __init__(self, max_open=64):
+        if max_open < 1:
+            raise ValueError("open file count must be at least 1")
+        self.max_open = max_open
+        self.files = collections.OrderedDict()
+
+    def get(self, filename):
+        "Return the open file for a name, opening it (and its directory) if need be."
+        out_file = self.files.get(filename)
+        if out_file is not None:
+            self.files.move_to_end(filename)
+            return out_file
+        if len(self.files) >= self.max_open:
+            (oldest, oldest_file) = self.files.popitem(last=False)
+            oldest_file.close()
+        directory = os.path.dirname(filename)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        out_file = open(filename, 'a')
+        self.files[filename] = out_file
+        return out_file
+
+    def close(self):
+        for out_file in self.files.values():
+            out_file.close()
+        self.files.clear()
+
+# Names of the time partitions (UTC day or hour) of receive times, by
+# partition and period, as the same few are asked for over and over.
+partition_formats = {'day': (86400, "%Y-%m-%d"), 'hour': (3600, "%Y-%m-%dT%H")}
+partition_names = {}
+
+def partition_name(timestamp, partition):
+    "Name the UTC day or hour partition of a receive time (epoch seconds), or 'unknown' if there is none."
+    if timestamp is None:
+        return "unknown"
+    (seconds, name_format) = partition_formats[partition]
+    key = (partition, timestamp // seconds)
+    name = partition_names.get(key)
+    if name is None:
+        name = time.strftime(name_format, time.gmtime(key[1] * seconds))
+        partition_names[key] = name
+    return name
+
+def make_filter(window=None, mmsi_allow=None, mmsi_deny=None, bbox=None, polygon=None, sample=None, sample_by='mmsi', time_slice=None):
+    "Build an AISFilter from command line argument text (and any parsed time slice), or return None if no criteria are given."
+    if window is None and mmsi_allow is None and mmsi_deny is None and bbox is None and polygon is None and sample is None and time_slice is None:
+        return None
+    if window is not None:
+        window = tuple([window_time(bound) for bound in window.split(",")])
+        if len(window) != 2:
+            raise ValueError("time window must be given as start,end")
+    # The time slice selects the region of each input read; its bounds are
+    # also applied exactly, as a window, within that region.
+    if time_slice is not None:
+        if window is None:
+            window = time_slice
+        else:
+            window = (max(window[0], time_slice[0]), min(window[1], time_slice[1]))
+    if sample is not None:
+        (numerator, denominator) = sample.split("/") if "/" in sample else ("1", sample)
+        if numerator.strip() != "1" or not denominator.strip().isdigit() or int(denominator) < 1:
+            raise ValueError("sample must be given as 1/N")
+        sample = int(denominator)
+        if sample_by not in ('mmsi', 'sentence'):
+            raise ValueError("sample must be by mmsi or sentence")
+    if mmsi_allow is not None:
+        mmsi_allow = read_mmsi_list(mmsi_allow)
+    if mmsi_deny is not None:
+        mmsi_deny = read_mmsi_list(mmsi_deny)
+    if bbox is not None:
+        bbox = tuple([float(edge) for edge in bbox.split(",")])
+        if len(bbox) != 4:
+            raise ValueError("bounding box must be given as west,south,east,north")
+    if polygon is not None:
+        polygon = read_polygon(polygon)
+    return AISFilter(window, mmsi_allow, mmsi_deny, bbox, polygon, sample, sample_by)
+
+# Line prefix formats. Each NM4 line may carry a receive prefix ahead of
+# the sentence: an exactEarth tag block, or a date as written by DMAS (ONC)
+# and the Taggart pre-parser.
+
+class PrefixFormat:
+    "Describes how to split the receive prefix from an NM4 line, and read its receive time."
+    def __init__(self, name, split, timestamp):
+        self.name = name            # Format name, as given on command lines
+        self.split = split          # Line -> (prefix, remainder of line)
+        self.timestamp = timestamp  # Prefix -> epoch seconds, or None
+
+def split_ee_prefix(line):
+    "Split an eE tag block prefix, up to its closing backslash, from a line."
+    dateloc = line.find("\\", line.find("\\")+1)
+    return (line[0:dateloc], line[dateloc+1:])
+
+def ee_prefix_timestamp(prefix):
+    "Return the receive time (epoch seconds) noted in an eE tag block prefix, or None."
+    match = re.search(r"[\\,]c:([0-9]+)", prefix)
+    if match is None:
+        return None
+    return int(match.group(1))
+
+def split_dmas_prefix(line):
+    "Split a date prefix, up to the first space, from a line."
+    dateloc = line.find(" ")
+    return (line[0:dateloc], line[dateloc+1:])
+
+def dmas_prefix_timestamp(prefix):
+    "Return the receive time (epoch seconds) of a YYYYmmddTHHMMSS.fffZ date prefix, or None."
+    try:
+        return calendar.timegm((int(prefix[0:4]), int(prefix[4:6]), int(prefix[6:8]),
+                                int(prefix[9:11]), int(prefix[11:13]), int(prefix[13:15])))
+    except ValueError:
+        return None
+
+def split_no_prefix(line):
+    "Lines without a prefix are passed through whole."
+    return ("", line)
+
+def no_prefix_timestamp(prefix):
+    return None
+
+prefix_formats = {
+    "eE": PrefixFormat("eE", split_ee_prefix, ee_prefix_timestamp),
+    "DMAS": PrefixFormat("DMAS", split_dmas_prefix, dmas_prefix_timestamp),
+    # The Taggart pre-parser writes the same date prefix as DMAS.
+    "Taggart": PrefixFormat("Taggart", split_dmas_prefix, dmas_prefix_timestamp),
+    "none": PrefixFormat("none", split_no_prefix, no_prefix_timestamp),
+    }
+
+def detect_prefix_format(line):
+    "Detect the prefix format of an NM4 line (or of a prefix alone)."
+    if line.startswith("\\"):
+        return prefix_formats["eE"]
+    if line[0:8].isdigit() and line[8:9] == "T":
+        return prefix_formats["DMAS"]
+    return prefix_formats["none"]
+
+def prefix_timestamp(prefix):
+    "Return the receive time (epoch seconds) noted in a prefix of any format, or None."
+    return detect_prefix_format(prefix).timestamp(prefix)
+
+# Skiperr referenced in body, but not provided explicitly by prototype, fixed. CH 20150826
+def packet_scanner(source,skiperr=False,aisfilter=None,prefix_format=None):
+    "Get a span of AIVDM packets with contiguous fragment numbers."
+    payloads = {'A':'', 'B':''}
+    raw = ''
+    well_formed = False
+    lc = 0
+    date = ""
+    # The prefix format, if not given, is detected from the first line.
+    prefix = None
+    if prefix_format is not None:
+        prefix = prefix_formats[prefix_format]
+    while True:
+        lc += 1;
+        line = source.readline()
+        if not line:
+            return
+            
+        # Parse the eE AIS prefix / date separately from the remainder of the incoming line, 
+        # conserve the prefix / date extracted. CH 20151104
+        if prefix is None:
+            if not line.strip():
+                continue
+            prefix = detect_prefix_format(line)
+        (line_prefix, line) = prefix.split(line)
+        if (date == ""):
+            date = line_prefix
+            # DEBUG -- Print located prefix
+            # print "Date and prefix located: " + date
+            # sys.stderr.write("Date and prefix located: " + date)
+
+        raw_line = line
+        raw += line
+        
+        line = line.strip()
+        # Strip off USCG metadata 
+        line = re.sub(r"(?<=\*[0-9A-F][0-9A-F]),.*", "", line)
+        # Compute CRC-16 checksum
+        packet = line[1:-3] # Strip leading !, trailing * and CRC
+        csum = 0
+        for c in packet:
+            csum ^= ord(c)
+        csum = "%02X" % csum
+        # Ignore comments
+        if not line.startswith("!"):
+            continue
+        # Assemble fragments from single- and multi-line payloads
+        fields = line.split(",")
+        ### - Begin modification for handling of improper number of records on line. CH 20150827
+        # Check the number of split fields, if it is less than 7, the line is badly formed. CH 20150827
+        if(len(fields) < 7):
+            if skiperr:
+                sys.stderr.write("%d: malformed line, incorrect token count: %s\n" % (lc, line.strip()))
+                well_formed = False
+            else:
+                raise AISUnpackingException(lc, "checksum", crc)
+        else:
+            try:
+                expect = fields[1]
+                fragment = fields[2]
+                channel = fields[4]
+                if fragment == '1':
+                    payloads[channel] = ''
+                    # A message starts here: any partial message before it
+                    # is thrown away, so its prefix and lines are not kept.
+                    date = line_prefix
+                    raw = raw_line
+                    # Messages received outside of the filter time window
+                    # are dropped, judged on the prefix of their first
+                    # fragment (continuation lines may have no receive time).
+                    well_formed = aisfilter is None or aisfilter.time_ok(prefix.timestamp(line_prefix))
+
+                payloads[channel] += fields[5]
+                try:
+                    # This works because a mangled pad literal means
+                    # a malformed packet that will be caught by the CRC check. 
+                    pad = int(fields[6].split('*')[0])
+                except ValueError:
+                    pad = 0
+                crc = fields[6].split('*')[1].strip()
+            #Added KeyError to handle cases where invalid (usually null) channel indicators are noted. CH 20150827
+            except KeyError:
+                sys.stderr.write("%d: malformed line (channel indicator): %s\n" % (lc, line.strip()))
+                well_formed = False
+            except IndexError:
+                if skiperr:
+                    sys.stderr.write("%d: malformed line: %s\n" % (lc, line.strip()))
+                    well_formed = False
+                else:
+                    raise AISUnpackingException(lc, "checksum", crc)
+            if csum != crc:
+                if skiperr:
+                    # Replaced backticks w/ repr CH 20171224 sys.stderr.write("%d: bad checksum %s, expecting %s: %s\n" % (lc, `crc`, csum, line.strip()))
+                    sys.stderr.write("%d: bad checksum %s, expecting %s: %s\n" % (lc, repr(crc), csum, line.strip()))
+                    well_formed = False
+                else:
+                    raise AISUnpackingException(lc, "checksum", crc)
+        ### - End modification for improper number of records on line. CH 20150827
+        if fragment < expect:
+            continue
+        # Throw away a complete message that is malformed (or filtered out),
+        # along with its prefix and lines.
+        if not well_formed:
+            date = ""
+            raw = ''
+            continue
+        # Render assembled payload to packed bytes
+        bits = BitVector()
+        bits.from_sixbit(payloads[channel], pad)
+        
+        # Added the start date for the packet (ONC data format) to the yield.
+        #yield (lc, raw, bits)
+        yield (lc, raw, bits, date)
+        date = ""
+        raw = ''
+        
+def postprocess(cooked):
+    "Postprocess cooked fields from a message."
+    # Handle type 21 name extension, found by name as a decode plan may have
+    # projected away the fields between the name and its extension.
+    if cooked[0][1] == 21:
+        names = [i for (i, (inst, value)) in enumerate(cooked) if inst.name == "name"]
+        if len(names) > 1:
+            cooked[names[0]][1] += cooked[names[1]][1]
+            cooked.pop(names[1])
+    return cooked
+
+def parse_ais_messages(source, scaled=False, skiperr=False, verbose=0, fields=None, aisfilter=None, consumers=(), prefix_format=None):
+    "Generator code - read forever from source stream, parsing AIS messages."
+    values = {}
+    # Consumers (e.g. VesselRegistry) are handed the raw values of each
+    # well formed message, so their fields are always decoded.
+    keep = ('mmsi',)
+    for consumer in consumers:
+        keep += consumer.fieldnames
+    instructions = decode_plan(fields, aisfilter, keep)
+    # Fixed packet_scanner call to provide skiperr value. CH 20150826
+    for (lc, raw, bits, date) in packet_scanner(source,skiperr,aisfilter,prefix_format):
+        # Check the MMSI (bits 8-37) against the filter ahead of unpacking.
+        if aisfilter is not None and bits.bitlen >= 38 and not aisfilter.mmsi_ok(bits.ubits(8, 30)):
+            continue
+        if aisfilter is not None and not aisfilter.payload_ok(bits):
+            continue
+        values = {}
+        values['length'] = bits.bitlen
+        # Without the following magic, we'd have a subtle problem near
+        # certain variable-length messages: DSV reports would
+        # sometimes have fewer fields than expected, because the
+        # unpacker would never generate cooked tuples for the omitted
+        # part of the message.  Presently a known issue for types 15
+        # and 16 only.  (Would never affect variable-length messages in
+        # which the last field type is 'string' or 'raw').
+        bits.extend_to(168)
+        # Magic recursive unpacking operation
+        try:
+            cooked = aivdm_unpack(lc, bits, 0, values, instructions)
+            # We now have a list of tuples containing unpacked fields
+            # Collect some field groups into ISO8601 format
+            for (offset, template, label, legend, formatter) in field_groups:
+                segment = cooked[offset:offset+len(template)]
+                if map(lambda x: x[0], segment) == template:
+                    group = formatter(*map(lambda x: x[1], segment))
+                    group = (label, group, 'string', legend, None)
+                    cooked = cooked[:offset]+[group]+cooked[offset+len(template):]
+            # Apply the postprocessor stage
+            cooked = postprocess(cooked)
+            # Now apply custom formatting hooks.
+            if scaled:
+                for (i, (inst, value)) in enumerate(cooked):
+                    if value == inst.oob:
+                        cooked[i][1] = "n/a"
+                    elif inst.formatter:
+                        if type(inst.formatter) == type(()):
+                            # Assumes 0 is the legend for the "undefined" value 
+                            if value >= len(inst.formatter):
+                                value = 0
+                            cooked[i][1] = inst.formatter[value]
+                        elif type(formatter) == type(lambda x: x):
+                            cooked[i][1] = inst.formatter(value)
+            expected = lengths.get(values['msgtype'], None)
+            # Check length; has to be done after so we have the type field 
+            bogon = False
+            if expected is not None:
+                if type(expected) == type(0):
+                    expected_range = (expected, expected)
+                else:
+                    expected_range = expected
+                actual = values['length']
+                if not (actual >= expected_range[0] and actual <= expected_range[1]):
+                    bogon = True
+                    if skiperr:
+                        sys.stderr.write("%d: type %d expected %s bits but saw %s: %s\n" % (lc, values['msgtype'], expected, actual, raw.strip().split()))
+                    else:
+                        raise AISUnpackingException(lc, "length", actual)
+            if not bogon:
+                for consumer in consumers:
+                    consumer.update(values, date)
+            # We're done, hand back a decoding
+            values = {}                    
+            yield (raw, cooked, bogon, date)
+            raw = ''
+        except KeyboardInterrupt:
+            raise KeyboardInterrupt
+        except GeneratorExit:
+            raise GeneratorExit
+        except AISFilteredException:
+            values = {}
+            continue
+        # Altered exception assignment for Python3 compatibility CH 20171224 except AISUnpackingException, e:
+        except AISUnpackingException as e:
+            if skiperr:
+                # Replaced backticks w/ repr CH 20171224 sys.stderr.write("%s: %s\n" % (`e`, raw.strip().split()))
+                sys.stderr.write("%s: %s\n" % (repr(e), raw.strip().split()))
+                continue
+            else:
+                raise
+        except:
+            (exc_type, exc_value, exc_traceback) = sys.exc_info()
+            sys.stderr.write("%d: Unknown exception: %s\n" % (lc, raw.strip().split()))
+            if skiperr:
+                continue
+            else:
+                # Adjust re-raise to python3 compatible syntax CH 20171204 raise exc_type, exc_value, exc_traceback
+                raise exc_value
+                
+def merge_by_time(sources, scaled=False, skiperr=False, verbose=0, fields=None, aisfilter=None, consumers=(), prefix_format=None):
+    "Generator code - merge the messages parsed from several sources, each in receive time order, into receive time order."
+    # A heap holds the next message of each source, keyed on its receive
+    # time (the last known time of the source if its prefix has none) and
+    # then the source order, so only one message per source is in memory.
+    pending = []
+    for (index, source) in enumerate(sources):
+        messages = parse_ais_messages(source, scaled, skiperr, verbose, fields, aisfilter, consumers, prefix_format)
+        for message in messages:
+            timestamp = prefix_timestamp(message[3])
+            heapq.heappush(pending, (0 if timestamp is None else timestamp, index, message, messages))
+            break
+    while pending:
+        (last_timestamp, index, message, messages) = heapq.heappop(pending)
+        yield message
+        for message in messages:
+            timestamp = prefix_timestamp(message[3])
+            heapq.heappush(pending, (last_timestamp if timestamp is None else timestamp, index, message, messages))
+            break
+
+# Time slices. NM4 files are in receive time order, so the region of a
+# file holding a slice of time is found by a binary search over its byte
+# offsets (memory mapped), reading the receive time of the line at each,
+# and only that region is then read.
+
+def line_time(mapped, offset, prefix):
+    "Find the first line starting at or after a byte offset that has a receive time: (time, line start), or (None, end of file)."
+    if offset > 0:
+        offset = mapped.find(b"\n", offset - 1) + 1
+        if offset == 0:
+            return (None, len(mapped))
+    while offset < len(mapped):
+        end = mapped.find(b"\n", offset)
+        if end < 0:
+            end = len(mapped)
+        line = mapped[offset:end].decode('utf-8', 'replace')
+        if line.strip():
+            timestamp = prefix.timestamp(prefix.split(line)[0])
+            if timestamp is not None:
+                return (timestamp, offset)
+        offset = end + 1
+    return (None, len(mapped))
+
+def slice_offset(mapped, timestamp, prefix):
+    "Byte offset of the first line received at or after a time (epoch seconds), by binary search."
+    lo = 0
+    hi = len(mapped)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        (line_timestamp, line_start) = line_time(mapped, mid, prefix)
+        if line_timestamp is not None and line_timestamp < timestamp:
+            # Every offset up to the start of this line leads to it.
+            lo = line_start + 1
+        else:
+            hi = mid
+    return line_time(mapped, lo, prefix)[1]
+
+class FileRegion:
+    "Reads the lines of a byte range of a file, as text, through readline()."
+    def __init__(self, filename, start, end):
+        self.source = open(filename, 'rb')
+        self.source.seek(start)
+        self.remaining = end - start
+
+    def readline(self):
+        if self.remaining <= 0:
+            return ''
+        line = self.source.readline()
+        self.remaining -= len(line)
+        if line.endswith(b"\r\n"):
+            line = line[:-2] + b"\n"
+        return line.decode('utf-8', 'replace')
+
+    def close(self):
+        self.source.close()
+
+def open_slice(filename, time_slice, prefix_format=None):
+    "Open the region of an NM4 file (in receive time order) holding a time slice (start, end), in epoch seconds."
+    with open(filename, 'rb') as curr_file:
+        size = os.fstat(curr_file.fileno()).st_size
+        if size == 0:
+            return FileRegion(filename, 0, 0)
+        mapped = mmap.mmap(curr_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if prefix_format is not None:
+                prefix = prefix_formats[prefix_format]
+            else:
+                newline = mapped.find(b"\n")
+                prefix = detect_prefix_format(mapped[:newline if newline >= 0 else size].decode('utf-8', 'replace'))
+            # Without receive times, the whole file is read (and filtered).
+            if prefix.name == 'none':
+                return FileRegion(filename, 0, size)
+            start = slice_offset(mapped, time_slice[0], prefix)
+            end = slice_offset(mapped, time_slice[1], prefix)
+        finally:
+            mapped.close()
+    return FileRegion(filename, start, max(start, end))
+
+@contextmanager
+def open_messages(filenames, merge=False, scaled=False, skiperr=False, verbose=0, fields=None, aisfilter=None, consumers=(), prefix_format=None, time_slice=None, opener=None):
+    "Open NM4 files, giving the messages parsed from each in turn, or merged by receive time; only the region of each holding a time slice is read if one is given. An opener, if given, opens each file as a readline() source in place of open()."
+    sources = []
+    try:
+        for filename in filenames:
+            if opener is not None:
+                sources.append(opener(filename))
+            elif time_slice is not None:
+                sources.append(open_slice(filename, time_slice, prefix_format))
+            else:
+                sources.append(open(filename, 'r'))
+        if merge:
+            yield merge_by_time(sources, scaled, skiperr, verbose, fields, aisfilter, consumers, prefix_format)
+        else:
+            yield (message for source in sources for message in parse_ais_messages(source, scaled, skiperr, verbose, fields, aisfilter, consumers, prefix_format))
+    finally:
+        for source in sources:
+            source.close()
+
+# Columnar decoding. decode_files() decodes NM4 files in process, for use by
+# other scripts, into one table per message group with a column per field.
+# Records are written straight into preallocated chunks of a NumPy
+# structured array, rather than being accumulated as Python lists.
+
+# Factor and offset, by formatter, converting raw numeric fields to scaled
+# values for decode_files(scaled=True). Unavailable values keep their
+# scaled sentinel (e.g. latitude 91), as in the database tables.
+numeric_scales = {
+    cnb_latlon_format: (1 / 600000.0, 0),
+    cnb_speed_format: (0.1, 0),
+    cnb_course_format: (0.1, 0),
+    short_latlon_format: (1 / 600.0, 0),
+    type8_latlon_format: (1 / 60000.0, 0),
+    type8_dac1_fid11_airtemp_format: (0.1, -60),
+    type8_dac1_fid11_dewpoint_format: (0.1, -20),
+    type8_dac1_fid11_pressure_format: (1, 800),
+    type8_dac1_fid11_visibility_format: (0.1, 0),
+    type8_dac1_fid11_waterlevel_format: (0.1, -10),
+    type8_dac1_fid11_cspeed_format: (0.1, 0),
+    type8_dac1_fid11_waveheight_format: (0.1, 0),
+    type8_dac1_fid11_watertemp_format: (0.1, -10),
+    type8_dac1_fid11_salinity_format: (0.1, 0),
+    }
+
+def table_columns(instructions, columns):
+    "Collect the bitfields of an instruction table and all of its variants, by name in order of first appearance."
+    for inst in instructions:
+        if isinstance(inst, dispatch):
+            for sub in inst.subtypes.values():
+                if sub is not None:
+                    table_columns(sub, columns)
+        elif isinstance(inst, bitfield):
+            columns.setdefault(inst.name, []).append(inst)
+    return columns
+
+def field_dtype(insts, scaled=False):
+    "Return the NumPy dtype for a column holding the named bitfield(s) of a message group."
+    inst = insts[0]
+    if scaled and inst.formatter in numeric_scales:
+        return 'f8'
+    if inst.type == 'string':
+        # Strings may be extended over several fields, as in type 21.
+        return 'U%d' % max(1, sum([i.width for i in insts if i.type == 'string']) // 6)
+    if inst.type == 'raw':
+        return 'O'
+    for (size, width) in ((1, 8), (2, 16), (4, 32), (8, 64)):
+        if inst.width <= width:
+            break
+    if inst.type == 'signed':
+        return 'i%d' % size
+    return 'u%d' % size
+
+class RecordBuffer:
+    "Typed records accumulated in preallocated, fixed size NumPy chunks."
+    def __init__(self, dtype, chunk_size=65536):
+        import_numpy()
+        self.dtype = dtype
+        self.chunk_size = chunk_size
+        self.chunks = []
+        self.chunk = numpy.zeros(chunk_size, dtype=dtype)
+        self.count = 0
+    def append(self, record):
+        if self.count == self.chunk_size:
+            self.chunks.append(self.chunk)
+            self.chunk = numpy.zeros(self.chunk_size, dtype=self.dtype)
+            self.count = 0
+        self.chunk[self.count] = record
+        self.count += 1
+    def array(self):
+        "Return all of the records appended as a single structured array."
+        return numpy.concatenate(self.chunks + [self.chunk[:self.count]])
+
+def decode_file_tables(filename, types=None, fields=None, scaled=False, aisfilter=None, chunk_size=65536, prefix_format=None):
+    "Decode an NM4 file into a structured array per message group, keyed as by map_similar_message_ids()."
+    import_numpy()
+    wanted = None
+    if fields is not None:
+        wanted = set([field_aliases.get(name, name) for name in fields]) | set(['msgtype'])
+    master = aivdm_decode[-1]
+    # Per group: the buffer, and the name, missing value and scaling of
+    # each field column. Every group also has a receive time column.
+    groups = {}
+    with open(filename, 'r') as curr_file:
+        for (raw, parsed, bogon, date) in parse_ais_messages(curr_file, False, True, 0, fields, aisfilter, (), prefix_format):
+            msgtype = parsed[0][1]
+            if bogon or (types and msgtype not in types):
+                continue
+            group = map_similar_message_ids(msgtype)
+            if group not in groups:
+                columns = table_columns(aivdm_decode[:-1], {})
+                for grouped_type in range(1, 28):
+                    if map_similar_message_ids(grouped_type) == group and master.subtypes.get(grouped_type) is not None:
+                        table_columns(master.subtypes[grouped_type], columns)
+                layout = []
+                dtype = [('time', 'M8[s]')]
+                for (name, insts) in columns.items():
+                    if wanted is not None and name not in wanted:
+                        continue
+                    column_dtype = field_dtype(insts, scaled)
+                    missing = {'f8': numpy.nan, 'O': None}.get(column_dtype, 0)
+                    if column_dtype[0] == 'U':
+                        missing = ""
+                    scale = None
+                    if column_dtype == 'f8':
+                        scale = numeric_scales[insts[0].formatter]
+                    layout.append((name, missing, scale))
+                    dtype.append((name, column_dtype))
+                groups[group] = (RecordBuffer(numpy.dtype(dtype), chunk_size), layout)
+            (buffer, layout) = groups[group]
+            row = dict([(inst.name, value) for (inst, value) in parsed])
+            timestamp = prefix_timestamp(date)
+            record = [numpy.datetime64('NaT') if timestamp is None else numpy.datetime64(timestamp, 's')]
+            for (name, missing, scale) in layout:
+                value = row.get(name, missing)
+                if scale is not None and value is not missing:
+                    value = value * scale[0] + scale[1]
+                record.append(value)
+            buffer.append(tuple(record))
+    tables = {}
+    for (group, (buffer, layout)) in groups.items():
+        tables[group] = buffer.array()
+    return tables
+
+def decode_file_tables_star(args):
+    "Pool helper, unpacking the arguments of decode_file_tables()."
+    return decode_file_tables(*args)
+
+def decode_files(paths, types=None, fields=None, scaled=False, as_frame=False, aisfilter=None, chunk_size=65536, prefix_format=None, processes=1):
+    "Decode NM4 files into a structured array (or DataFrame) per message group, keyed as by map_similar_message_ids()."
+    import_numpy()
+    filenames = []
+    for path in paths:
+        filenames.extend(glob(path))
+    # Files are decoded independently, over a process pool if requested
+    # (each detecting its own prefix format unless one is given), then
+    # their tables concatenated per group in file order.
+    file_args = [(filename, types, fields, scaled, aisfilter, chunk_size, prefix_format) for filename in filenames]
+    if processes > 1 and len(filenames) > 1:
+        pool = multiprocessing.Pool(processes)
+        try:
+            file_tables = pool.map(decode_file_tables_star, file_args)
+        finally:
+            pool.close()
+            pool.join()
+    else:
+        file_tables = [decode_file_tables_star(args) for args in file_args]
+    tables = {}
+    for decoded in file_tables:
+        for (group, table) in decoded.items():
+            tables.setdefault(group, []).append(table)
+    for group in tables:
+        tables[group] = numpy.concatenate(tables[group])
+    if as_frame:
+        import pandas
+        for group in tables:
+            tables[group] = pandas.DataFrame(tables[group])
+    return tables
+
+
+# Type 8 DAC 1 / FID 11 (IMO236) meteorological and hydrographic reports,
+# extracted as a time series with one typed column per report field.
+met_hydro_fields = tuple([inst for inst in type8_dac1_fid11 if isinstance(inst, bitfield) and inst.name not in ("lat", "lon", "day", "hour", "minute")])
+
+def met_hydro_time(received, day, hour, minute):
+    "Build the observation time (epoch seconds) of a met/hydro report from its day, hour and minute and its receive time, or None."
+    if received is None or day < 1 or day > 31 or hour > 23 or minute > 59:
+        return None
+    (year, month, received_day) = time.gmtime(received)[0:3]
+    # A report from late in a month may be received early in the next.
+    if day > received_day:
+        month -= 1
+        if month == 0:
+            (year, month) = (year - 1, 12)
+    # A day the month doesn't have would be carried into the next month by timegm.
+    if day > calendar.monthrange(year, month)[1]:
+        return None
+    return calendar.timegm((year, month, day, hour, minute, 0))
+
+class MetHydroTable:
+    "Met/hydro reports gathered while decoding, written as a pipe-delimited table or kept as a structured array."
+    fieldnames = ("lat", "lon", "day", "hour", "minute") + tuple([inst.name for inst in met_hydro_fields])
+    columns = ("observed", "received", "mmsi", "lon", "lat") + tuple([inst.name for inst in met_hydro_fields])
+
+    def __init__(self, filename=None, chunk_size=65536):
+        self.out_file = None
+        self.records = None
+        if filename is not None:
+            self.out_file = open(filename, 'w')
+            self.out_file.write("|".join(self.columns) + "\n")
+        else:
+            import_numpy()
+            dtype = [("observed", 'M8[s]'), ("received", 'M8[s]'), ("mmsi", 'u4'), ("lon", 'f8'), ("lat", 'f8')]
+            dtype += [(inst.name, 'f8') for inst in met_hydro_fields]
+            self.records = RecordBuffer(numpy.dtype(dtype), chunk_size)
+
+    def update(self, values, date):
+        "Add a decoded message, received with the given prefix, if it is a met/hydro report."
+        if values.get('msgtype') != 8 or values.get('dac') != 1 or values.get('fid') != 11:
+            return
+        received = prefix_timestamp(date)
+        observed = met_hydro_time(received, values['day'], values['hour'], values['minute'])
+        # Values are scaled to units, with unavailable ones left empty.
+        row = [values['mmsi'], values['lon'] / 60000.0, values['lat'] / 60000.0]
+        for inst in met_hydro_fields:
+            value = values[inst.name]
+            if value == inst.oob:
+                value = None
+            elif inst.formatter in numeric_scales:
+                (factor, offset) = numeric_scales[inst.formatter]
+                value = round(value * factor + offset, 6)
+            row.append(value)
+        if self.out_file is not None:
+            self.out_file.write("|".join([registry_time(observed), registry_time(received)] +
+                ["" if value is None else str(value) for value in row]) + "\n")
+        else:
+            self.records.append(tuple([numpy.datetime64('NaT') if t is None else numpy.datetime64(t, 's') for t in (observed, received)] +
+                [numpy.nan if value is None else value for value in row]))
+
+    def array(self):
+        "Return the reports gathered as a structured array (when not written to file)."
+        return self.records.array()
+
+    def close(self):
+        if self.out_file is not None:
+            self.out_file.close()
+
+def decode_met_hydro(paths, aisfilter=None, as_frame=False, prefix_format=None):
+    "Decode the met/hydro reports in NM4 files into a structured array (or DataFrame) time series."
+    table = MetHydroTable()
+    for path in paths:
+        for filename in glob(path):
+            with open(filename, 'r') as curr_file:
+                for message in parse_ais_messages(curr_file, False, True, 0, ['msgtype'], aisfilter, [table], prefix_format):
+                    pass
+    if as_frame:
+        import pandas
+        return pandas.DataFrame(table.array())
+    return table.array()
+
+# Position reports of Class A (types 1, 2 and 3), Class B (18 and 19) and
+# long-range broadcasts (27) differ in layout and in scale, so they are
+# normalized into a single table, with unavailable values left empty.
+position_types = (1, 2, 3, 18, 19, 27)
+position_fields = dict([(msgtype, table_columns(aivdm_decode[-1].subtypes[msgtype], {})) for msgtype in position_types])
+
+# Type 27 reports whole knots and degrees, where the others report tenths.
+position_motion_scales = {1: 0.1, 2: 0.1, 3: 0.1, 18: 0.1, 19: 0.1, 27: 1.0}
+
+def position_record(values, received):
+    "Normalize the values of a decoded position report to (mmsi, epoch, msgtype, lon, lat, sog, cog, heading, status, accuracy)."
+    msgtype = values['msgtype']
+    fields = position_fields[msgtype]
+    normalized = {}
+    for name in ("lon", "lat", "speed", "course", "heading", "status", "accuracy"):
+        if name not in fields:
+            normalized[name] = None
+            continue
+        inst = fields[name][0]
+        value = values[name]
+        # The oob of the status fields is a valid status (0), not a
+        # missing value, so it is not applied to them.
+        if name not in ("status", "accuracy") and value == inst.oob:
+            value = None
+        elif name in ("lon", "lat"):
+            value = value * numeric_scales[inst.formatter][0]
+        elif name in ("speed", "course"):
+            value = round(value * position_motion_scales[msgtype], 1)
+        normalized[name] = value
+    return (values['mmsi'], received, msgtype, normalized['lon'], normalized['lat'], normalized['speed'],
+            normalized['course'], normalized['heading'], normalized['status'], normalized['accuracy'])
+
+class PositionTable:
+    "Position reports of types 1, 2, 3, 18, 19 and 27 gathered while decoding, written as a pipe-delimited table or kept as a structured array."
+    fieldnames = ("lon", "lat", "speed", "course", "heading", "status", "accuracy")
+    columns = ("mmsi", "epoch", "msgtype", "lon", "lat", "sog", "cog", "heading", "status", "accuracy")
+
+    def __init__(self, filename=None, chunk_size=65536):
+        self.out_file = None
+        self.records = None
+        if filename is not None:
+            self.out_file = open(filename, 'w')
+            self.out_file.write("|".join(self.columns) + "\n")
+        else:
+            import_numpy()
+            dtype = [("mmsi", 'u4'), ("epoch", 'M8[s]'), ("msgtype", 'u1'), ("lon", 'f8'), ("lat", 'f8'), ("sog", 'f8'),
+                     ("cog", 'f8'), ("heading", 'f8'), ("status", 'f8'), ("accuracy", 'u1')]
+            self.records = RecordBuffer(numpy.dtype(dtype), chunk_size)
+
+    def update(self, values, date):
+        "Add a decoded message, received with the given prefix, if it is a position report."
+        if values.get('msgtype') not in position_fields:
+            return
+        record = position_record(values, prefix_timestamp(date))
+        if self.out_file is not None:
+            self.out_file.write("|".join(["" if value is None else str(value) for value in record]) + "\n")
+        else:
+            epoch = numpy.datetime64('NaT') if record[1] is None else numpy.datetime64(record[1], 's')
+            self.records.append(tuple([record[0], epoch] + [numpy.nan if value is None else value for value in record[2:]]))
+
+    def array(self):
+        "Return the reports gathered as a structured array (when not written to file)."
+        return self.records.array()
+
+    def close(self):
+        if self.out_file is not None:
+            self.out_file.close()
+
+def decode_positions(paths, aisfilter=None, as_frame=False, prefix_format=None):
+    "Decode the position reports in NM4 files, in a single pass, into one normalized structured array (or DataFrame)."
+    table = PositionTable()
+    for path in paths:
+        for filename in glob(path):
+            with open(filename, 'r') as curr_file:
+                for message in parse_ais_messages(curr_file, False, True, 0, ['msgtype'], aisfilter, [table], prefix_format):
+                    pass
+    if as_frame:
+        import pandas
+        return pandas.DataFrame(table.array())
+    return table.array()
+
+def read_pgpass_connect_string(filename):
+    "Build a Postgres connect string from the first line (host:port:dbname:user:password) of a pgpass style file."
+    with open(filename, 'r') as connect_file:
+        tokens = connect_file.readline().strip().split(':')
+    if len(tokens) != 5:
+        raise ValueError("connect string file " + filename + " must hold host:port:dbname:user:password")
+    return "host={} port={} dbname={} user={} password={}".format(*tokens)
+
+def pg_column_type(insts, scaled=False):
+    "Return the Postgres type for a column holding the named bitfield(s) of a message group."
+    kinds = set([inst.type for inst in insts])
+    if kinds == set(['raw']):
+        return 'bytea'
+    # Scaled values may be legends or "n/a", so are all kept as text.
+    if scaled or kinds - set(['signed', 'unsigned']):
+        return 'text'
+    # Unsigned fields need one more bit to hold as a signed type.
+    bits = max([inst.width + (inst.type == 'unsigned') for inst in insts])
+    if bits <= 16:
+        return 'smallint'
+    if bits <= 32:
+        return 'integer'
+    return 'bigint'
+
+class PGCopySink:
+    "Decoded messages streamed into Postgres by binary COPY, one table per message type (or group), over a persistent connection."
+    def __init__(self, connect_string, table_prefix, map_similar=False, scaled=False, fields=None, batch_rows=10000):
+        try:
+            import psycopg2
+        except ImportError:
+            raise IOError("psycopg2 is required to write to Postgres")
+        try:
+            self.connection = psycopg2.connect(connect_string)
+        except psycopg2.Error as msg:
+            raise IOError("unable to connect to Postgres: " + str(msg).strip())
+        self.cursor = self.connection.cursor()
+        self.table_prefix = table_prefix
+        self.map_similar = map_similar
+        self.scaled = scaled
+        self.wanted = None
+        if fields is not None:
+            self.wanted = set([field_aliases.get(name, name) for name in fields]) | set(['msgtype'])
+        self.batch_rows = batch_rows
+        self.tables = {}
+
+    def table(self, msgtype):
+        "Return the batch and field columns of the table for a message type, creating the table if need be."
+        if self.map_similar:
+            token = map_similar_message_ids(msgtype)
+        else:
+            token = str(msgtype)
+        if token not in self.tables:
+            # Each table holds every field of the types written to it, as
+            # with the columnar tables, led by the raw receive prefix.
+            master = aivdm_decode[-1]
+            columns = table_columns(aivdm_decode[:-1], {})
+            for grouped_type in range(1, 28):
+                if master.subtypes.get(grouped_type) is None:
+                    continue
+                if grouped_type == msgtype or (self.map_similar and map_similar_message_ids(grouped_type) == token):
+                    table_columns(master.subtypes[grouped_type], columns)
+            names = [name for name in columns if self.wanted is None or name in self.wanted]
+            column_types = ['text'] + [pg_column_type(columns[name], self.scaled) for name in names]
+            table = self.table_prefix + "msg" + token
+            self.cursor.execute("CREATE TABLE IF NOT EXISTS " + table + " (" +
+                ", ".join(['"' + name + '" ' + column_type for (name, column_type) in zip(['date'] + names, column_types)]) + ")")
+            self.tables[token] = (BinaryCopyBatch(table, ['date'] + names, column_types, self.batch_rows), names)
+        return self.tables[token]
+
+    def write(self, parsed, date):
+        "Add a decoded message, as reported, received with the given prefix."
+        (batch, names) = self.table(parsed[0][1])
+        row = {}
+        for (inst, value) in parsed:
+            if isinstance(value, BitVector):
+                value = value.bits[:(value.bitlen + 7)//8].tobytes()
+            row[inst.name] = value
+        batch.append(self.cursor, [date] + [row.get(name) for name in names])
+
+    def commit(self):
+        "Send the rows held for every table and commit them, ending the transaction."
+        for (batch, names) in self.tables.values():
+            batch.flush(self.cursor)
+        self.connection.commit()
+
+    def rollback(self):
+        for (batch, names) in self.tables.values():
+            batch.discard()
+        self.connection.rollback()
+        # Tables created within the transaction are gone with it.
+        self.tables = {}
+
+    def close(self):
+        self.cursor.close()
+        self.connection.close()
+
+### map_similar_message_ids - Map message ids for messages sharing schemas to 
+# token giving a single output file.
+def map_similar_message_ids(inmessage):
+    
+    if(inmessage in (1,2,3)):
+        return "1_2_3"
+    elif(inmessage in (4,11)):
+        return "4_11"
+    elif(inmessage in (7,13)):
+        return "7_13"
+    else:
+        return str(inmessage)
+### end map_like_messages
+
+# End
+
+"""
+COPYING:
+
+COPYRIGHTS
+
+Compilation copyright is held by the GPSD project.  All rights reserved.
+
+GPSD project copyrights are assigned to the project lead, currently
+Eric S. Raymond. Other portions of the GPSD code are Copyright (c)
+1997, 1998, 1999, 2000, 2001, 2002 by Remco Treffkorn, and others
+Copyright (c) 2005 by Eric S. Raymond.  For other copyrights, see
+individual files.
+
+            BSD LICENSE
+
+Redistribution and use in source and binary forms, with or without
+modification, are permitted provided that the following conditions
+are met:<P>
+
+Redistributions of source code must retain the above copyright
+notice, this list of conditions and the following disclaimer.<P>
+
+Redistributions in binary form must reproduce the above copyright
+notice, this list of conditions and the following disclaimer in the
+documentation and/or other materials provided with the distribution.<P>
+
+Neither name of the GPSD project nor the names of its contributors
+may be used to endorse or promote products derived from this software
+without specific prior written permission.
+
+THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+``AS IS'' AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+A PARTICULAR PURPOSE ARE DISCLAIMED.  IN NO EVENT SHALL THE REGENTS OR
+CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL,
+EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO,
+PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR
+PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF
+LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING
+NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+"""
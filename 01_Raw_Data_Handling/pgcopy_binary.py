@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+#
+# Encoding of rows in the PostgreSQL binary COPY format, as read by
+# COPY ... FROM STDIN (FORMAT binary) or \COPY ... FROM 'file' (FORMAT binary).
+# Shared by the scripts in this directory that load AIS data into Postgres,
+# so that values are sent in their binary form rather than written out as text
+# and parsed back by the server. Only the types used for AIS data are covered.
+#
+# A binary COPY stream is a header, then one tuple per row (a 16 bit field
+# count, then per field a 32 bit length and the value, with a length of -1
+# for NULL), then a 16 bit trailer of -1. All integers are big-endian.
+#
+# Lines already written in the text COPY format (tab delimited, \N for NULL,
+# backslashes escaped), as by the scripts splitting terrestrial AIS data, can
+# be converted on their way to a file by BinaryCopyTextSink, given the types of
+# their columns, so that the same code writes either format.
+
+import struct, calendar, datetime, io, re
+
+copy_header = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+copy_trailer = struct.pack("!h", -1)
+
+# Postgres timestamps count microseconds from 2000-01-01 00:00:00.
+pg_epoch = calendar.timegm((2000, 1, 1, 0, 0, 0))
+pg_epoch_datetime = datetime.datetime(2000, 1, 1)
+
+field_count = struct.Struct("!h")
+null_field = struct.pack("!i", -1)
+
+def fixed_encoder(fmt):
+    "Return an encoder for a fixed width value packed with the given struct format."
+    packer = struct.Struct("!i" + fmt)
+    size = packer.size - 4
+    def encode(value):
+        return packer.pack(size, value)
+    return encode
+
+def encode_text(value):
+    if isinstance(value, bytes):
+        data = value
+    else:
+        data = str(value).encode('utf-8')
+    return struct.pack("!i", len(data)) + data
+
+def encode_bytea(value):
+    data = bytes(value)
+    return struct.pack("!i", len(data)) + data
+
+encode_timestamp_micros = fixed_encoder("q")
+
+def encode_timestamp(value):
+    "Encode a timestamp (without time zone) given as epoch seconds or a naive (UTC) datetime."
+    if isinstance(value, datetime.datetime):
+        delta = value - pg_epoch_datetime
+        return encode_timestamp_micros((delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds)
+    return encode_timestamp_micros(int(round((value - pg_epoch) * 1000000)))
+
+# A point, with an SRID, in (little-endian) EWKB, as received by PostGIS.
+ewkb_point = struct.Struct("<BIIdd")
+ewkb_point_length = struct.pack("!i", ewkb_point.size)
+
+def encode_point(value):
+    "Encode a (longitude, latitude) pair as a PostGIS geometry, an EWKB point in WGS 84 (SRID 4326)."
+    (longitude, latitude) = value
+    return ewkb_point_length + ewkb_point.pack(1, 0x20000001, 4326, longitude, latitude)
+
+# Encoders by Postgres column type.
+type_encoders = {
+    'boolean': fixed_encoder("?"),
+    'smallint': fixed_encoder("h"),
+    'integer': fixed_encoder("i"),
+    'bigint': fixed_encoder("q"),
+    'real': fixed_encoder("f"),
+    'double precision': fixed_encoder("d"),
+    'text': encode_text,
+    'bytea': encode_bytea,
+    'timestamp': encode_timestamp,
+    'geometry': encode_point,
+    }
+
+text_escape_pattern = re.compile(r"\\(.)")
+text_escapes = {'b': "\b", 'f': "\f", 'n': "\n", 'r': "\r", 't': "\t", 'v': "\v"}
+
+def decode_text(field):
+    "Decode a text COPY field (with backslash escapes) to its value."
+    if "\\" not in field:
+        return field
+    return text_escape_pattern.sub(lambda escape: text_escapes.get(escape.group(1), escape.group(1)), field)
+
+def decode_timestamp(field):
+    "Decode a text COPY timestamp (YYYY-MM-DD hh:mm:ss[.ffffff]) to epoch seconds."
+    seconds = calendar.timegm((int(field[0:4]), int(field[5:7]), int(field[8:10]), int(field[11:13]), int(field[14:16]), int(field[17:19])))
+    if len(field) > 19:
+        seconds += float("0" + field[19:])
+    return seconds
+
+# Decoders of text COPY fields, by Postgres column type.
+text_decoders = {
+    'boolean': lambda field: field.lower() in ('t', 'true', 'y', 'yes', 'on', '1'),
+    'smallint': int,
+    'integer': int,
+    'bigint': int,
+    'real': float,
+    'double precision': float,
+    'text': decode_text,
+    'timestamp': decode_timestamp,
+    }
+
+# Column types of the lines written by the scripts splitting terrestrial AIS data
+# (unique ID, MMSI, longitude, latitude, date, message type, parse error flag, line).
+split_line_column_types = ['text', 'integer', 'double precision', 'double precision', 'timestamp', 'integer', 'integer', 'text']
+
+class BinaryCopyWriter:
+    "Writes rows of the given Postgres column types to a file-like object as a binary COPY stream."
+    def __init__(self, out_file, column_types, header=True):
+        self.out_file = out_file
+        self.encoders = [type_encoders[column_type] for column_type in column_types]
+        self.count = field_count.pack(len(column_types))
+        self.rows = 0
+        if header:
+            out_file.write(copy_header)
+
+    def write_row(self, values):
+        "Write a row of values, in column order, with None for NULL."
+        fields = [self.count]
+        for (encode, value) in zip(self.encoders, values):
+            if value is None:
+                fields.append(null_field)
+            else:
+                fields.append(encode(value))
+        self.out_file.write(b"".join(fields))
+        self.rows += 1
+
+    def close(self):
+        "Finish the stream (the file itself is left open)."
+        self.out_file.write(copy_trailer)
+
+class BinaryCopyTextSink:
+    "A file-like sink converting the text COPY lines written to it into rows of the given column types, written to a binary file as a binary COPY stream."
+    def __init__(self, out_file, column_types):
+        self.out_file = out_file
+        self.writer = BinaryCopyWriter(out_file, column_types)
+        self.decoders = [text_decoders[column_type] for column_type in column_types]
+        self.partial = ""
+
+    def write(self, text):
+        "Add text, converting each complete line."
+        lines = (self.partial + text).split("\n")
+        self.partial = lines.pop()
+        for line in lines:
+            self.write_line(line)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def write_line(self, line):
+        fields = line.split("\t")
+        if len(fields) != len(self.decoders):
+            raise ValueError("expected " + str(len(self.decoders)) + " fields, not " + str(len(fields)) + ", in line: " + line)
+        self.writer.write_row([None if field == "\\N" else decode(field) for (decode, field) in zip(self.decoders, fields)])
+
+    def close(self):
+        "Convert any partial last line, finish the stream and close the file."
+        try:
+            if self.partial:
+                self.write_line(self.partial)
+                self.partial = ""
+            self.writer.close()
+        finally:
+            self.out_file.close()
+
+class BinaryCopyBatch:
+    "Rows for one table held in memory, and sent with COPY ... FROM STDIN (FORMAT binary) when the batch fills."
+    def __init__(self, table, columns, column_types, batch_rows=10000):
+        self.statement = "COPY " + table + " (" + ", ".join(['"' + column + '"' for column in columns]) + ") FROM STDIN (FORMAT binary)"
+        self.column_types = column_types
+        self.batch_rows = batch_rows
+        self.sent = 0
+        self.start()
+
+    def start(self):
+        self.buffer = io.BytesIO()
+        self.writer = BinaryCopyWriter(self.buffer, self.column_types)
+
+    def discard(self):
+        "Drop any rows held but not yet sent."
+        self.start()
+
+    def append(self, cursor, values):
+        "Add a row, sending the batch over the cursor if it is then full."
+        self.writer.write_row(values)
+        if self.writer.rows >= self.batch_rows:
+            self.flush(cursor)
+
+    def flush(self, cursor):
+        "Send any rows held over the cursor (psycopg2), within its current transaction."
+        if self.writer.rows == 0:
+            return
+        self.writer.close()
+        self.buffer.seek(0)
+        cursor.copy_expert(self.statement, self.buffer)
+        self.sent += self.writer.rows
+        self.start()
+
+# End
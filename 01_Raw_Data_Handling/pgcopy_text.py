@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+#
+# Streaming of tab delimited lines, in the text format read by the Postgres
+# COPY command (with \N for NULL, and backslashes escaped), into a table by
+# COPY ... FROM STDIN, rather than writing them to a file to be \COPY'd later.
+# Used by the scripts splitting terrestrial AIS data (--pg), which write their
+# output lines to a PGTextCopySink as they would to a file.
+#
+# Lines are sent in batches, each in its own transaction over a single
+# connection. A batch that fails (holding a line the table will not accept) is
+# rolled back and retried in halves, down to single lines, and any line that
+# still fails is kept, whole, in a reject table (the table name + "_reject",
+# created if need be) along with the error. A load is so never stopped by a
+# bad line, and the rejects can be examined (and fixed up) afterwards.
+
+import io
+
+def escape_text(value):
+    "Escape a value for a field of a text COPY line."
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+class PGTextCopySink:
+    "A file-like sink streaming the lines written to it into a Postgres table by COPY, in batched transactions."
+    def __init__(self, connect_string, table, batch_rows=10000):
+        try:
+            import psycopg2
+        except ImportError:
+            raise IOError("psycopg2 is required to write to Postgres")
+        self.error_class = psycopg2.Error
+        try:
+            self.connection = psycopg2.connect(connect_string)
+        except psycopg2.Error as msg:
+            raise IOError("unable to connect to Postgres: " + str(msg).strip())
+        self.cursor = self.connection.cursor()
+        self.table = table
+        self.reject_table = table + "_reject"
+        self.reject_created = False
+        self.batch_rows = batch_rows
+        self.pending = []
+        self.pending_lines = 0
+        self.sent = 0
+        self.rejected = 0
+        self.retried = 0
+
+    def write(self, text):
+        "Add text, holding lines until a batch is full."
+        self.pending.append(text)
+        self.pending_lines += text.count("\n")
+        if self.pending_lines >= self.batch_rows:
+            self.flush()
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self, final=False):
+        "Send the complete lines held (and, if final, any partial last line) in batches."
+        lines = "".join(self.pending).split("\n")
+        partial = lines.pop()
+        self.pending = [partial] if partial else []
+        self.pending_lines = 0
+        if final and partial:
+            self.pending = []
+            lines.append(partial)
+        for start in range(0, len(lines), self.batch_rows):
+            self.send(lines[start:start + self.batch_rows])
+
+    def send(self, lines):
+        "COPY a batch of lines into the table in its own transaction, retrying the halves of a batch that fails."
+        try:
+            self.cursor.copy_expert("COPY " + self.table + " FROM STDIN", io.StringIO("\n".join(lines) + "\n"))
+            self.connection.commit()
+            self.sent += len(lines)
+        except self.error_class as msg:
+            self.connection.rollback()
+            if len(lines) == 1:
+                self.reject(lines, str(msg).strip())
+            else:
+                self.retried += 1
+                middle = len(lines) // 2
+                self.send(lines[:middle])
+                self.send(lines[middle:])
+
+    def reject(self, lines, error):
+        "Keep lines the table would not accept in the reject table, with the error, in their own transaction."
+        try:
+            if not self.reject_created:
+                self.cursor.execute("CREATE TABLE IF NOT EXISTS " + self.reject_table + " (line text, error text)")
+                self.reject_created = True
+            rows = "".join([escape_text(line) + "\t" + escape_text(error) + "\n" for line in lines])
+            self.cursor.copy_expert("COPY " + self.reject_table + " (line, error) FROM STDIN", io.StringIO(rows))
+            self.connection.commit()
+        except self.error_class as msg:
+            self.connection.rollback()
+            raise IOError("unable to keep a rejected batch in " + self.reject_table + ": " + str(msg).strip())
+        self.rejected += len(lines)
+
+    def close(self):
+        "Send any lines held, and close the connection."
+        try:
+            self.flush(True)
+        finally:
+            self.cursor.close()
+            self.connection.close()
+
+# End
@@ -0,0 +1,647 @@
+#!/usr/bin/python
+#
+# split_columnar.py - Chunked, columnar splitting of pre-parsed terrestrial
+# AIS lines, as used by the --columnar mode of
+# 1_split_ONC_AIS_for_PG_base_table_w_parsing.py. A chunk of input is read as
+# bytes, its lines and their tokens are located and the basic fields (message
+# type, coordinates, date and MMSI) validated as whole arrays, and the output
+# lines are assembled from the bytes of the input, giving exactly the output of
+# the line by line loop of the script.
+#
+# NumPy finds the newlines and pipes of a chunk, and running counts of the
+# digits, dots and out of place bytes (controls, non-ASCII and backslashes)
+# give the make-up of any token from its two ends, without a Python call per
+# line. A line whose basic fields are plain (a message type and MMSI of digits,
+# decimal coordinates and a date of digits, or of the wrong length) with no
+# leading or trailing spaces, backslashes or non-ASCII bytes is written from
+# the table alone: each output line is a list of pieces (tokens of the input,
+# the line counter, the reformatted date and the fixed separators), gathered
+# into the output with a single index over all of them. Any other line, rare
+# in practice, is decoded and split as in the loop, its coordinates repaired by
+# repair_coordinates(), and formatted with str.format(). Parse errors are
+# counted by kind, rather than printed one line each.
+#
+# TaggartSplitter does the same for the loop of
+# 1_split_tT_AIS_for_PG_base_table_w_parsing.py, which handles fewer message
+# types (with the same fields) and stops at any other. With -p, either script
+# splits its input files over a pool of processes (split_files_parallel()), in
+# line aligned byte chunks. A first pass summarizes each chunk, so that the
+# line counter (and the message type carried over) at the start of each chunk
+# is known as from a serial run, and the chunks are then split in parallel and
+# their output concatenated in order.
+
+from itertools import islice
+import io, os, shutil, locale, multiprocessing
+import numpy as np
+from coordinate_repair import repair_coordinates
+from field_schema import SPLIT_MESSAGE_GROUPS, schema_fields
+
+# Message types handled, and those among them carrying coordinates.
+ONC_MESSAGE_TYPES = (1, 2, 3, 5, 18, 27)
+ONC_POSITIONAL_MESSAGE_TYPES = (1, 2, 3, 18)
+
+# Fields of the pipe-delimited PG_safe_line output for each message type, as token indices of the input
+# line, None giving an empty field (the schemas of field_schema.py, shared with the loops).
+ONC_LINE_FIELDS = dict([(msg_type, schema_fields(group)) for (msg_type, group) in SPLIT_MESSAGE_GROUPS.items()])
+
+# Minimum number of tokens for a complete line of each message type.
+ONC_MIN_TOKENS = {1: 16, 2: 16, 3: 16, 5: 21, 18: 21}
+
+# The Taggart (tT) loop handles types 1, 2, 3 and 5 only, with the fields of the ONC loop.
+TAGGART_MESSAGE_TYPES = (1, 2, 3, 5)
+TAGGART_POSITIONAL_MESSAGE_TYPES = (1, 2, 3)
+TAGGART_LINE_FIELDS = dict([(msg_type, ONC_LINE_FIELDS[msg_type]) for msg_type in TAGGART_MESSAGE_TYPES])
+TAGGART_MIN_TOKENS = dict([(msg_type, ONC_MIN_TOKENS[msg_type]) for msg_type in TAGGART_MESSAGE_TYPES])
+
+NULL = r"\N"
+
+# The input is decoded as open() would, for the lines written through str.format().
+ENCODING = locale.getpreferredencoding(False)
+
+# Dates (YYYYMMDDThhmmss.000Z) are reformatted for Postgres (YYYY-MM-DD hh:mm:ss) by rearranging their characters,
+# DATE_CHARACTERS giving the index in the date of each character of the result (the separators being filled in).
+DATE_CHARACTERS = [0, 1, 2, 3, 0, 4, 5, 0, 6, 7, 0, 9, 10, 0, 11, 12, 0, 13, 14]
+DATE_SEPARATORS = {4: "-", 7: "-", 10: " ", 13: ":", 16: ":"}
+DATE_DIGITS = list(range(0, 8)) + list(range(9, 15))
+
+# Lines are split only as far as the last token used (the 21st), and the token counts compared.
+MAX_SPLIT = 21
+
+# Longest message type or MMSI of digits taken from the table (always within the range of is_integer() in the loop).
+MAX_DIGITS = 9
+
+# Longest coordinate taken from the table.
+MAX_DECIMAL = 24
+
+# Output lines are gathered this many at a time, bounding the size of the gather index.
+GATHER_LINES = 8192
+
+NEWLINE, PIPE, BACKSLASH, SPACE, DOT, MINUS, ZERO, NINE = b"\n|\\ .-09"
+
+# Largest (approximate) size of the byte chunks split over a pool of processes, each given about 4 chunks of smaller inputs.
+CHUNK_BYTES = 32 * 1024 * 1024
+CHUNKS_PER_PROCESS = 4
+
+def scalar_integer(s):
+    "int(), within the range accepted by is_integer() in the loop, or None."
+    try:
+        value = int(s)
+    except ValueError:
+        return None
+    return value if abs(value) < 2147483648 else None
+
+def scalar_msg_type(s):
+    "int(), or None; values beyond the exact range of a float are given as -1 (never a message type)."
+    try:
+        value = int(s)
+    except ValueError:
+        return None
+    return value if abs(value) < 2 ** 53 else -1
+
+def line_format(unq_ID_prefix, fields):
+    "The str.format() template of an output line: the ID counter, the 6 basic fields, then the tokens of PG_safe_line."
+    prefix = unq_ID_prefix.replace("{", "{{").replace("}", "}}")
+    line_fields = ["" if field is None else "{" + str(field + 7) + "}" for field in fields]
+    return prefix + "{0}\t{1}\t{2}\t{3}\t{4}\t{5}\t{6}\t" + "|".join(line_fields) + "\n"
+
+def decimal_strings(values):
+    "The decimal digits of non-negative integers, as one byte array, with the offset and length of each."
+    lengths = np.ones(len(values), dtype=np.int64)
+    power = 10
+    while len(values) and power <= values.max():
+        lengths += values >= power
+        power *= 10
+    offsets = np.cumsum(lengths) - lengths
+    digits = np.zeros(int(lengths.sum()), dtype=np.uint8)
+    remaining = values.copy()
+    for place in range(int(lengths.max()) if len(values) else 0):
+        (index,) = np.nonzero(lengths > place)
+        digits[offsets[index] + lengths[index] - 1 - place] = ZERO + remaining[index] % 10
+        remaining //= 10
+    return (digits, offsets, lengths)
+
+class LineTable:
+    "The lines of a chunk of input bytes and the extent of their tokens, with those lines that must be split as in the loop."
+
+    def __init__(self, data, positional_types):
+        # Newlines are read as open() reads them.
+        if b"\r" in data:
+            data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+        self.data = data
+        buf = self.buf = np.frombuffer(data, dtype=np.uint8)
+        ends = np.flatnonzero(buf == NEWLINE)
+        if len(buf) and buf[-1] != NEWLINE:
+            ends = np.append(ends, len(buf))
+        starts = np.zeros(len(ends), dtype=np.int64)
+        starts[1:] = ends[:-1] + 1
+        self.count = count = len(ends)
+
+        # Lines of printable ASCII only, other than backslashes, and without leading or trailing spaces.
+        out_of_place = np.flatnonzero(((buf < SPACE) & (buf != NEWLINE)) | (buf > 126) | (buf == BACKSLASH))
+        plain = ends > starts
+        plain[np.searchsorted(ends, out_of_place)] = False
+        (index,) = np.nonzero(plain)
+        plain[index] = (buf[starts[index]] != SPACE) & (buf[ends[index] - 1] != SPACE)
+
+        # The start and end of tokens 0 to 20 of each line, where present (token k being present for k <= pipe_counts).
+        pipes = np.flatnonzero(buf == PIPE)
+        first_pipe = np.searchsorted(pipes, starts)
+        self.pipe_counts = pipe_counts = np.searchsorted(pipes, ends) - first_pipe
+        if len(pipes):
+            following = pipes[np.minimum(first_pipe[:, None] + np.arange(MAX_SPLIT), len(pipes) - 1)]
+        else:
+            following = np.zeros((count, MAX_SPLIT), dtype=np.int64)
+        self.token_starts = np.empty((count, MAX_SPLIT), dtype=np.int64)
+        self.token_starts[:, 0] = starts
+        self.token_starts[:, 1:] = following[:, :-1] + 1
+        self.token_ends = np.where(np.arange(MAX_SPLIT) < pipe_counts[:, None], following, ends[:, None])
+        self.token_counts = np.minimum(pipe_counts, MAX_SPLIT) + 1
+        self.starts = starts
+        self.ends = ends
+
+        # Message types of digits, to a value.
+        self.msg_types = np.full(count, np.nan)
+        plain &= pipe_counts >= 3
+        plain &= self.digit_token(1)
+        (index,) = np.nonzero(plain)
+        self.msg_types[index] = self.token_values(1, index)
+
+        # Decimal coordinates, for lines of positional types with tokens for them.
+        coordinates = plain & np.isin(self.msg_types, positional_types) & (self.token_counts >= 10)
+        (index,) = np.nonzero(coordinates)
+        plain[index] = self.decimal_token(8, index) & self.decimal_token(9, index)
+
+        # Dates of digits where the loop takes them as integers (those of other lengths being parse errors).
+        (index,) = np.nonzero(plain & (self.token_length(0) == 20))
+        characters = buf[self.token_starts[index, 0][:, None] + DATE_DIGITS]
+        plain[index] = ((characters >= ZERO) & (characters <= NINE)).all(axis=1)
+
+        # MMSIs of digits.
+        plain &= self.digit_token(3)
+        self.plain = plain
+
+        # The other lines are decoded, stripped and split as in the loop.
+        self.stripped = {}
+        self.rows = {}
+        for index in np.nonzero(~plain)[0].tolist():
+            stripped = data[starts[index]:ends[index]].decode(ENCODING).strip()
+            row = stripped.split("|", MAX_SPLIT)
+            self.stripped[index] = stripped
+            self.rows[index] = row
+            self.token_counts[index] = len(row)
+            self.msg_types[index] = np.nan
+            if len(row) > 1:
+                value = scalar_msg_type(row[1])
+                if value is not None:
+                    self.msg_types[index] = value
+
+    def token_length(self, token):
+        "The lengths of a token of every line."
+        return self.token_ends[:, token] - self.token_starts[:, token]
+
+    def token_characters(self, token, index, width):
+        "The first width bytes of a token of the lines given by index, with a mask of those within the token, and its length."
+        starts = self.token_starts[index, token]
+        lengths = self.token_ends[index, token] - starts
+        characters = self.buf[np.minimum(starts[:, None] + np.arange(width), len(self.buf) - 1)]
+        return (characters, np.arange(width) < lengths[:, None], lengths)
+
+    def digit_token(self, token):
+        "Mask of the lines whose token is present and 1 to MAX_DIGITS digits."
+        (characters, inside, lengths) = self.token_characters(token, slice(None), MAX_DIGITS)
+        digits = (characters >= ZERO) & (characters <= NINE)
+        return (self.pipe_counts >= token) & (lengths >= 1) & (lengths <= MAX_DIGITS) & (digits | ~inside).all(axis=1)
+
+    def decimal_token(self, token, index):
+        "Mask of the lines (given by index) whose token reads as a float: digits with at most one dot, after an optional minus."
+        (characters, inside, lengths) = self.token_characters(token, index, MAX_DECIMAL)
+        digits = (characters >= ZERO) & (characters <= NINE) & inside
+        dots = (characters == DOT) & inside
+        allowed = digits | dots | ~inside
+        allowed[:, 0] |= characters[:, 0] == MINUS
+        return (lengths <= MAX_DECIMAL) & allowed.all(axis=1) & digits.any(axis=1) & (dots.sum(axis=1) <= 1)
+
+    def token_values(self, token, index):
+        "The values of tokens of digits, for the lines given by index."
+        starts = self.token_starts[index, token]
+        lengths = self.token_ends[index, token] - starts
+        values = np.zeros(len(index), dtype=np.int64)
+        for place in range(MAX_DIGITS):
+            (more,) = np.nonzero(lengths > place)
+            values[more] = values[more] * 10 + (self.buf[starts[more] + place] - ZERO)
+        return values
+
+    def line(self, index):
+        "A line, stripped, as the loop reads it."
+        if index in self.stripped:
+            return self.stripped[index]
+        return self.data[self.starts[index]:self.ends[index]].decode(ENCODING)
+
+    def row(self, index):
+        "The tokens of a line, as the loop splits it."
+        if index in self.rows:
+            return self.rows[index]
+        return self.line(index).split("|", MAX_SPLIT)
+
+class ONCSplitter:
+    "Splits chunks of pre-parsed ONC AIS lines, carrying the line counter (and the last message type) from chunk to chunk."
+    MESSAGE_TYPES = ONC_MESSAGE_TYPES
+    POSITIONAL_MESSAGE_TYPES = ONC_POSITIONAL_MESSAGE_TYPES
+    LINE_FIELDS = ONC_LINE_FIELDS
+    MIN_TOKENS = ONC_MIN_TOKENS
+    # Whether a line of a type not handled stops the split, rather than being skipped.
+    UNHANDLED_FATAL = False
+
+    def __init__(self, unq_ID_prefix, line_counter=0):
+        self.unq_ID_prefix = unq_ID_prefix
+        self.line_counter = line_counter
+        # The loop keeps the last message type parsed as an integer for lines whose type does not parse.
+        self.last_msg_type = np.nan
+        self.counts = dict([(kind, 0) for kind in ("msg_type", "longitude", "latitude", "exponent_fraction", "date", "mmsi", "tokens", "unhandled")])
+        self.error = None
+        self.formats = dict([(msg_type, line_format(unq_ID_prefix, fields)) for (msg_type, fields) in self.LINE_FIELDS.items()])
+        self.short_format = unq_ID_prefix.replace("{", "{{").replace("}", "}}") + "{0}\t\\N\t\\N\t\\N\t\\N\t\\N\t1\t{1}\n"
+
+    @classmethod
+    def complete_lines(cls, effective, token_counts):
+        "Masks of the lines of handled message types, and of those among them with enough tokens to be complete."
+        handled = np.isin(effective, list(cls.LINE_FIELDS.keys()))
+        minimum = np.zeros(len(effective), dtype=int)
+        for (msg_type, tokens) in cls.MIN_TOKENS.items():
+            minimum[effective == msg_type] = tokens
+        return (handled, handled & (token_counts >= minimum))
+
+    @classmethod
+    def summarize(cls, data):
+        "First pass over a chunk of input bytes: the token counts of the lines ahead of the first message type parsed, the number of complete lines from there on, and the last message type parsed (or NaN)."
+        table = LineTable(data, cls.POSITIONAL_MESSAGE_TYPES)
+        (token_counts, msg_types) = (table.token_counts, table.msg_types)
+        type_parsed = ~np.isnan(msg_types)
+        if not type_parsed.any():
+            return (token_counts.tolist(), 0, np.nan)
+        first = int(type_parsed.argmax())
+        last_parsed = np.maximum.accumulate(np.where(type_parsed, np.arange(table.count), -1))
+        complete = cls.complete_lines(msg_types[last_parsed[first:]], token_counts[first:])[1]
+        return (token_counts[:first].tolist(), int(complete.sum()), float(msg_types[type_parsed][-1]))
+
+    @classmethod
+    def resolve(cls, summary, last_msg_type):
+        "The number of complete lines of a summary, following the given message type, and the message type carried on."
+        (leading, complete_count, summary_msg_type) = summary
+        if leading:
+            complete_count += int(cls.complete_lines(np.full(len(leading), last_msg_type), np.array(leading))[1].sum())
+        if not np.isnan(summary_msg_type):
+            last_msg_type = summary_msg_type
+        return (complete_count, last_msg_type)
+
+    @classmethod
+    def merge(cls, summary, following):
+        "The summary of two consecutive runs of lines."
+        if summary is None:
+            return following
+        (leading, complete_count, summary_msg_type) = summary
+        if np.isnan(summary_msg_type):
+            return (leading + following[0], following[1], following[2])
+        (following_count, last_msg_type) = cls.resolve(following, summary_msg_type)
+        return (leading, complete_count + following_count, last_msg_type)
+
+    def stop_at(self, table, fatal):
+        "Note the first line the loop would fail on, returning its index (or None)."
+        if not fatal.any():
+            return None
+        stop = int(fatal.argmax())
+        self.error = table.line(stop)
+        return stop
+
+    def split(self, data):
+        "Split a chunk of input (bytes, of whole lines), returning the output text. Sets error (and stops) at a line the loop cannot process."
+        table = LineTable(data, self.POSITIONAL_MESSAGE_TYPES)
+
+        # Every line needs tokens up to the MMSI (the fourth).
+        token_counts = table.token_counts
+        stop = self.stop_at(table, token_counts < 4)
+        count = table.count if stop is None else stop
+        if count == 0:
+            return ""
+        token_counts = token_counts[:count]
+
+        # Message type, the last integer value standing in for any that does not parse.
+        msg_types = table.msg_types[:count]
+        type_parsed = ~np.isnan(msg_types)
+        last_parsed = np.maximum.accumulate(np.where(type_parsed, np.arange(count), -1))
+        effective = np.where(last_parsed >= 0, msg_types[np.maximum(last_parsed, 0)], self.last_msg_type)
+        positional = np.isin(effective, self.POSITIONAL_MESSAGE_TYPES)
+
+        # Only lines of the handled types are written; the rest are skipped (or stop the split). Lines short of
+        # tokens for their type are written whole, taking the next counter value without using it.
+        (handled, complete) = self.complete_lines(effective, token_counts)
+
+        # Stop ahead of any line with no message type yet to stand in for one that does not parse, or
+        # too few tokens for its coordinates.
+        fatal = np.isnan(effective) | (positional & (token_counts < 10))
+        if self.UNHANDLED_FATAL:
+            fatal |= ~handled
+        stop = self.stop_at(table, fatal)
+        if stop is not None:
+            count = stop
+            if count == 0:
+                return ""
+            (token_counts, msg_types, type_parsed, effective, positional, handled, complete) = (
+                token_counts[:count], msg_types[:count], type_parsed[:count], effective[:count], positional[:count], handled[:count], complete[:count])
+        if type_parsed.any():
+            self.last_msg_type = msg_types[type_parsed][-1]
+        msg_type_error = ~(type_parsed & np.isin(msg_types, self.MESSAGE_TYPES))
+        short = handled & ~complete
+        counters = np.cumsum(complete) - complete + self.line_counter
+        self.line_counter += int(complete.sum())
+        self.counts["msg_type"] += int(msg_type_error.sum())
+        self.counts["unhandled"] += int((~handled).sum())
+        self.counts["tokens"] += int(short.sum())
+
+        # Complete lines of the table, with the lines the loop would have taken the date of as null.
+        plain = table.plain[:count]
+        (plain_index,) = np.nonzero(complete & plain)
+        date_ok = table.token_length(0)[plain_index] == 20
+        self.counts["date"] += int((~date_ok).sum())
+
+        # Every other line written is formatted from its tokens.
+        (formatted_index,) = np.nonzero(complete & ~plain)
+        formatted = self.format_rows(table, formatted_index, counters[formatted_index], effective[formatted_index], msg_type_error[formatted_index])
+        for index in np.nonzero(short)[0]:
+            formatted[index] = self.short_format.format(counters[index], table.line(index).replace("\\", "\\\\"))
+        return self.gather(table, handled, plain_index, counters[plain_index], effective[plain_index], date_ok, formatted)
+
+    def format_rows(self, table, index, counters, msg_types, msg_type_error):
+        "Format the complete lines given by index from their tokens, as the loop does, returning the output lines by index."
+        rows = [table.row(line) for line in index.tolist()]
+        count = len(rows)
+        positional = np.isin(msg_types, self.POSITIONAL_MESSAGE_TYPES)
+
+        # Coordinates, for positional types, repairing malformed exponents.
+        longitude = np.full(count, NULL, dtype=object)
+        latitude = np.full(count, NULL, dtype=object)
+        coordinate_error = np.zeros(count, dtype=bool)
+        (coordinate_index,) = np.nonzero(positional)
+        for (token, values, kind) in ((8, longitude, "longitude"), (9, latitude, "latitude")):
+            (coordinates, valid, counts) = repair_coordinates([rows[row][token] for row in coordinate_index], NULL)
+            self.counts[kind] += counts["invalid"]
+            self.counts["exponent_fraction"] += counts["exponent_fraction"]
+            values[coordinate_index] = coordinates
+            coordinate_error[coordinate_index] |= ~valid
+
+        formatted = {}
+        for row in range(count):
+            tokens = rows[row]
+            parse_error = bool(msg_type_error[row] or coordinate_error[row])
+
+            # Dates of 20 characters whose date and time parts are integers, reformatted for Postgres.
+            date = tokens[0]
+            if len(date) == 20 and scalar_integer(date[0:8]) is not None and scalar_integer(date[9:15]) is not None:
+                parsed_date = date[0:4] + "-" + date[4:6] + "-" + date[6:8] + " " + date[9:11] + ":" + date[11:13] + ":" + date[13:15]
+            else:
+                parsed_date = NULL
+                parse_error = True
+                self.counts["date"] += 1
+
+            mmsi = tokens[3]
+            if scalar_integer(mmsi) is None:
+                mmsi = NULL
+                parse_error = True
+                self.counts["mmsi"] += 1
+
+            # The original line's tokens, escaped for \copy where any hold a backslash.
+            line = table.line(index[row])
+            if "\\" in line:
+                tokens = line.replace("\\", "\\\\").split("|", MAX_SPLIT)
+            msg_type = NULL if msg_type_error[row] else rows[row][1]
+            formatted[index[row]] = self.formats[msg_types[row]].format(counters[row], mmsi, longitude[row], latitude[row], parsed_date, msg_type, int(parse_error), *tokens)
+        return formatted
+
+    def gather(self, table, handled, index, counters, msg_types, date_ok, formatted):
+        "Assemble the output text of the handled lines: those of the table given by index from their pieces, and the formatted lines (by line index) as they are."
+        buf = table.buf
+
+        # Every piece is taken from one source: the input, then the fixed text, the counters, the dates and the formatted lines.
+        fixed = {}
+        layouts = {}
+        for msg_type in np.unique(msg_types).tolist():
+            layouts[msg_type] = self.line_layout(msg_type)
+            for (kind, value) in layouts[msg_type]:
+                if kind == "fixed":
+                    fixed.setdefault(value, None)
+        for text in (NULL.encode(ENCODING), b"0", b"1"):
+            fixed.setdefault(text, None)
+        offset = len(buf)
+        for text in fixed:
+            fixed[text] = offset
+            offset += len(text)
+        fixed_bytes = np.frombuffer(b"".join(fixed), dtype=np.uint8)
+
+        (counter_digits, counter_starts, counter_lengths) = decimal_strings(counters.astype(np.int64))
+        counter_starts += offset
+        offset += len(counter_digits)
+
+        dates = buf[table.token_starts[index, 0][:, None] + DATE_CHARACTERS]
+        for (position, separator) in DATE_SEPARATORS.items():
+            dates[:, position] = ord(separator)
+        date_starts = np.where(date_ok, offset + 19 * np.arange(len(index)), fixed[NULL.encode(ENCODING)])
+        date_lengths = np.where(date_ok, 19, len(NULL))
+        flag_starts = np.where(date_ok, fixed[b"0"], fixed[b"1"])
+        offset += dates.size
+
+        formatted_index = np.array(sorted(formatted), dtype=np.int64)
+        formatted_bytes = [formatted[line].encode(ENCODING) for line in formatted_index.tolist()]
+        formatted_lengths = np.array([len(line) for line in formatted_bytes], dtype=np.int64)
+        formatted_starts = offset + np.cumsum(formatted_lengths) - formatted_lengths
+        source = np.concatenate((buf, fixed_bytes, counter_digits, dates.ravel(), np.frombuffer(b"".join(formatted_bytes), dtype=np.uint8)))
+
+        # The position of each line among those of the table, or among the formatted lines.
+        count = len(handled)
+        plain_position = np.full(count, -1)
+        plain_position[index] = np.arange(len(index))
+        formatted_position = np.full(count, -1)
+        formatted_position[formatted_index] = np.arange(len(formatted_index))
+        width = max([len(layout) for layout in layouts.values()] + [1])
+
+        # Gather the pieces into the output, GATHER_LINES lines at a time, as a table of (start, length) of the pieces
+        # of each line in line order, lines of fewer pieces (or none, for lines not handled) padded with empty ones.
+        out_text = []
+        for block in range(0, count, GATHER_LINES):
+            block_lines = np.arange(block, min(block + GATHER_LINES, count))
+            piece_starts = np.zeros((len(block_lines), width), dtype=np.int64)
+            piece_lengths = np.zeros((len(block_lines), width), dtype=np.int64)
+            rows = plain_position[block_lines]
+            for (msg_type, layout) in layouts.items():
+                (in_block,) = np.nonzero(rows >= 0)
+                in_block = in_block[msg_types[rows[in_block]] == msg_type]
+                positions = rows[in_block]
+                lines = block_lines[in_block]
+                for (column, (kind, value)) in enumerate(layout):
+                    if kind == "fixed":
+                        piece_starts[in_block, column] = fixed[value]
+                        piece_lengths[in_block, column] = len(value)
+                    elif kind == "token":
+                        piece_starts[in_block, column] = table.token_starts[lines, value[0]]
+                        piece_lengths[in_block, column] = table.token_ends[lines, value[1]] - table.token_starts[lines, value[0]]
+                    elif kind == "counter":
+                        piece_starts[in_block, column] = counter_starts[positions]
+                        piece_lengths[in_block, column] = counter_lengths[positions]
+                    elif kind == "date":
+                        piece_starts[in_block, column] = date_starts[positions]
+                        piece_lengths[in_block, column] = date_lengths[positions]
+                    elif kind == "flag":
+                        piece_starts[in_block, column] = flag_starts[positions]
+                        piece_lengths[in_block, column] = 1
+            (in_block,) = np.nonzero(formatted_position[block_lines] >= 0)
+            positions = formatted_position[block_lines[in_block]]
+            piece_starts[in_block, 0] = formatted_starts[positions]
+            piece_lengths[in_block, 0] = formatted_lengths[positions]
+            starts = piece_starts.ravel()
+            lengths = piece_lengths.ravel()
+            total = int(lengths.sum())
+            if total:
+                offsets = np.cumsum(lengths) - lengths
+                out_text.append(source[np.repeat(starts - offsets, lengths) + np.arange(total)].tobytes().decode(ENCODING))
+        return "".join(out_text)
+
+    def line_layout(self, msg_type):
+        "The pieces of an output line of a message type from the table, as (kind, value) pairs, tokens given as a span (first, last)."
+        tab = "\t"
+        pieces = [("fixed", self.unq_ID_prefix), ("counter", None), ("fixed", tab), ("token", 3), ("fixed", tab)]
+        if msg_type in self.POSITIONAL_MESSAGE_TYPES:
+            pieces += [("token", 8), ("fixed", tab), ("token", 9)]
+        else:
+            pieces.append(("fixed", NULL + tab + NULL))
+        pieces += [("fixed", tab), ("date", None), ("fixed", tab), ("token", 1), ("fixed", tab), ("flag", None), ("fixed", tab)]
+        for (position, field) in enumerate(self.LINE_FIELDS[msg_type]):
+            if position:
+                pieces.append(("fixed", "|"))
+            if field is not None:
+                pieces.append(("token", field))
+        pieces.append(("fixed", "\n"))
+
+        # Consecutive tokens of the input, joined by a pipe, are taken as one span of it, from the first to the last.
+        layout = []
+        for (kind, value) in pieces:
+            if kind == "token":
+                value = (value, value)
+                if len(layout) > 1 and layout[-1] == ("fixed", "|") and layout[-2][0] == "token" and layout[-2][1][1] + 1 == value[0]:
+                    layout.pop()
+                    value = (layout.pop()[1][0], value[1])
+            if kind == "fixed" and layout and layout[-1][0] == "fixed":
+                layout[-1] = ("fixed", layout[-1][1] + value)
+            else:
+                layout.append((kind, value))
+        return [(kind, value.encode(ENCODING) if kind == "fixed" else value) for (kind, value) in layout if value != ""]
+
+class TaggartSplitter(ONCSplitter):
+    "Splits chunks of pre-parsed Taggart (tT) AIS lines, stopping at any message type not handled."
+    MESSAGE_TYPES = TAGGART_MESSAGE_TYPES
+    POSITIONAL_MESSAGE_TYPES = TAGGART_POSITIONAL_MESSAGE_TYPES
+    LINE_FIELDS = TAGGART_LINE_FIELDS
+    MIN_TOKENS = TAGGART_MIN_TOKENS
+    UNHANDLED_FATAL = True
+
+def split_records(in_records, out_records, splitter, chunk_lines=100000):
+    "Split an open (binary) input of pre-parsed AIS lines to an open output file, chunk by chunk, until done or the splitter stops."
+    while splitter.error is None:
+        data = b"".join(islice(in_records, chunk_lines))
+        if not data:
+            break
+        out_records.write(splitter.split(data))
+    return splitter
+
+def split_files(in_filenames, out_records, unq_ID_prefix, chunk_lines=100000, splitter_class=ONCSplitter):
+    "Split input files of pre-parsed AIS lines one after another, as a single input, to an open output file, chunk by chunk. Returns the splitter, with its counts."
+    splitter = splitter_class(unq_ID_prefix)
+    for in_filename in in_filenames:
+        with open(in_filename, 'rb') as in_records:
+            split_records(in_records, out_records, splitter, chunk_lines)
+    return splitter
+
+def line_chunks(in_filename, chunk_bytes=CHUNK_BYTES):
+    "The (start, end) byte offsets of chunks of a file of about chunk_bytes each, ending after a newline."
+    size = os.path.getsize(in_filename)
+    chunks = []
+    start = 0
+    with open(in_filename, 'rb') as in_file:
+        while start < size:
+            in_file.seek(start + chunk_bytes)
+            in_file.readline()
+            end = min(in_file.tell(), size)
+            chunks.append((start, end))
+            start = end
+    return chunks
+
+
+def chunk_records(in_filename, start, end):
+    "The lines of a chunk of a file, as bytes."
+    with open(in_filename, 'rb') as in_file:
+        in_file.seek(start)
+        data = in_file.read(end - start)
+    return io.BytesIO(data)
+
+def summarize_chunk(in_args):
+    "Pool worker, summarizing a chunk of a file in the first pass."
+    (splitter_class, in_filename, start, end, chunk_lines) = in_args
+    in_records = chunk_records(in_filename, start, end)
+    summary = None
+    while True:
+        data = b"".join(islice(in_records, chunk_lines))
+        if not data:
+            break
+        summary = splitter_class.merge(summary, splitter_class.summarize(data))
+    return summary
+def split_chunk(in_args):
+    "Pool worker, splitting a chunk of a file to a part file from the given line counter and message type."
+    (splitter_class, unq_ID_prefix, in_filename, start, end, line_counter, last_msg_type, part_filename, chunk_lines) = in_args
+    splitter = splitter_class(unq_ID_prefix, line_counter)
+    splitter.last_msg_type = last_msg_type
+    with open(part_filename, 'w') as part_file:
+        split_records(chunk_records(in_filename, start, end), part_file, splitter, chunk_lines)
+    return (splitter.counts, splitter.error, splitter.line_counter)
+
+def split_files_parallel(in_filenames, out_records, part_prefix, unq_ID_prefix, processes, splitter_class=ONCSplitter, chunk_lines=100000, chunk_bytes=None):
+    """Split input files, one after another as a single input, to an open output file over a pool of processes, giving
+    the output of a serial run. Parts are written under part_prefix. Returns a splitter holding the summed counts, and
+    the error and line counter at which a serial run would have stopped (if it would)."""
+    if chunk_bytes is None:
+        total_bytes = sum([os.path.getsize(in_filename) for in_filename in in_filenames])
+        chunk_bytes = min(CHUNK_BYTES, total_bytes // (processes * CHUNKS_PER_PROCESS) + 1)
+    chunks = [(in_filename, start, end) for in_filename in in_filenames for (start, end) in line_chunks(in_filename, chunk_bytes)]
+    result = splitter_class(unq_ID_prefix)
+
+    # Workers are forked, so that the calling script is not run again in each.
+    split_pool = multiprocessing.get_context("fork").Pool(processes)
+    jobs = []
+    try:
+        # First pass, for the line counter and message type at the start of each chunk.
+        summaries = split_pool.map(summarize_chunk, [(splitter_class, in_filename, start, end, chunk_lines) for (in_filename, start, end) in chunks])
+        line_counter = 0
+        last_msg_type = np.nan
+        for (index, ((in_filename, start, end), summary)) in enumerate(zip(chunks, summaries)):
+            jobs.append((splitter_class, unq_ID_prefix, in_filename, start, end, line_counter, last_msg_type, part_prefix + ".part%05d" % index, chunk_lines))
+            if summary is not None:
+                (complete_count, last_msg_type) = splitter_class.resolve(summary, last_msg_type)
+                line_counter += complete_count
+
+        # Second pass, appending each part to the output in order as it is ready, up to any chunk that stops.
+        for (job, (counts, error, line_counter)) in zip(jobs, split_pool.imap(split_chunk, jobs)):
+            with open(job[7], 'r') as part_file:
+                shutil.copyfileobj(part_file, out_records)
+            os.remove(job[7])
+            for (kind, count) in counts.items():
+                result.counts[kind] += count
+            result.line_counter = line_counter
+            if error is not None:
+                result.error = error
+                break
+    finally:
+        split_pool.terminate()
+        split_pool.join()
+        for job in jobs:
+            if os.path.exists(job[7]):
+                os.remove(job[7])
+    return result
+
+# End
@@ -0,0 +1,268 @@
+#!/usr/bin/python
+#
+# taggart_raw.py - Pre-parsing of *.raw files of Terrestrial AIS data,
+# sourced from Dr. Chris Taggart's East Coast network of receivers, shared
+# by 0_taggart_TAIS_pre_parser.py and the NM4 parsing scripts. NMEA lines
+# are prefixed with the UTC date (yyyymmddTHHMMSS.000Z) of the preceding
+# date header, given in America/Halifax local time, and empty lines are
+# dropped. The UTC prefix is formatted once per date header, converting
+# local time through a table of the America/Halifax UTC offset transitions
+# (derived from pytz) rather than localizing every header.
+#
+# To read a time range of a file without pre-parsing all of it, a sidecar
+# index (the file name plus ".idx") of the UTC time and byte offset of each
+# date header is kept beside it, built on first use and extended from the
+# last indexed offset as the file grows.
+
+import os, sys, calendar
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from pytz import timezone
+import pytz
+
+# Establish the timezones to be used.
+utctz = pytz.utc
+localtz = timezone('America/Halifax')
+
+# Size of the buffers used for reading and writing files.
+io_buffer_size = 1 << 20
+
+# UTC offset transitions of the local timezone, by year, each a sorted
+# list of (local time the offset takes effect, UTC offset).
+offset_transitions = {}
+
+# Formatted UTC prefixes and epoch seconds, by date header text.
+utc_headers = {}
+
+# Suffix of the sidecar date header index of an input file.
+index_suffix = ".idx"
+index_comment = "# T-AIS date header index: UTC epoch seconds,byte offset\n"
+
+# Function (local_utc_offset) - The UTC offset of a local (America/Halifax) time, as interpreted
+# by pytz localize (ambiguous and skipped times are taken as standard time).
+def local_utc_offset(local_date):
+
+    return localtz.localize(local_date).utcoffset()
+
+# Function (year_offset_transitions) - Build the table of UTC offset transitions of a year, in
+# local time. Offsets change on the hour, at most once a month, so each change found between
+# the first days of consecutive months is narrowed down by bisection to the hour.
+def year_offset_transitions(year):
+
+    hour = timedelta(hours=1)
+    month_start = datetime(year, 1, 1)
+    transitions = [(month_start, local_utc_offset(month_start))]
+    for month in range(2, 14):
+        next_month_start = datetime(year + month // 13, (month - 1) % 12 + 1, 1)
+        if local_utc_offset(next_month_start) != transitions[-1][1]:
+            (before, after) = (month_start, next_month_start)
+            while after - before > hour:
+                middle = before + ((after - before) // hour // 2) * hour
+                if local_utc_offset(middle) == transitions[-1][1]:
+                    before = middle
+                else:
+                    after = middle
+            transitions.append((after, local_utc_offset(after)))
+        month_start = next_month_start
+    return transitions
+
+# Function (local_to_utc) - Convert a local (America/Halifax) time to UTC, through the offset
+# transition table of its year.
+def local_to_utc(local_date):
+
+    transitions = offset_transitions.get(local_date.year)
+    if transitions is None:
+        transitions = year_offset_transitions(local_date.year)
+        offset_transitions[local_date.year] = transitions
+    index = bisect_right(transitions, (local_date, timedelta.max)) - 1
+    return local_date - transitions[index][1]
+
+# Function (utc_header) - Format the output line prefix (yyyymmddTHHMMSS.000Z, UTC) for a date
+# header's text (dd,mm,yy,HH,MM,SS,zone in local time, the zone itself being ignored as before),
+# returned with the header's time in UTC epoch seconds.
+def utc_header(date_text):
+
+    header = utc_headers.get(date_text)
+    if header is None:
+        (day, month, year, hour, minute, second) = [int(value) for value in date_text.split(",")[0:6]]
+        # Two digit years as for strptime %y.
+        year += 2000 if year < 69 else 1900
+        utc_date = local_to_utc(datetime(year, month, day, hour, minute, second))
+        prefix = "%04d%02d%02dT%02d%02d%02d.000Z " % (utc_date.year, utc_date.month, utc_date.day, utc_date.hour, utc_date.minute, utc_date.second)
+        header = (prefix, calendar.timegm(utc_date.timetuple()))
+        utc_headers[date_text] = header
+    return header
+
+# Function (prefixed_lines) - Generate the output lines of a T-AIS input, its NMEA lines prefixed
+# with the UTC date of the preceding date header, dropping empty lines. Given a time slice (start,
+# end) in epoch seconds, only the lines under date headers from start up to end are kept.
+def prefixed_lines(in_T_AIS_records, in_filename="", time_slice=None):
+
+    # Initialize a date prefix to be stamped across output NMEA lines.
+    curr_prefix = None
+    in_slice = True
+
+    # Iterate over the lines in the incoming records.
+    for line in in_T_AIS_records:
+
+        # Strip any leading / trailing whitespace characters from
+        # the input line.
+        strip_line = line.strip()
+
+        # If the line is empty, skip it.
+        if (strip_line == ""):
+            continue
+
+        # If the line is a date header, format its value for the
+        # succeeding lines.
+        elif (strip_line[-5:] == "data:"):
+            (curr_prefix, curr_epoch) = utc_header(strip_line[:-5].strip())
+            if time_slice is not None:
+                in_slice = time_slice[0] <= curr_epoch < time_slice[1]
+
+        # NMEA lines ahead of any date header cannot be dated.
+        elif curr_prefix is None:
+            sys.stderr.write("Skipping undated line in " + in_filename + ": " + strip_line + "\n")
+
+        # If the line is not empty, nor a date, copy it to output,
+        # with the UTC date as a prefix.
+        elif in_slice:
+            yield curr_prefix + strip_line + "\n"
+
+# Function (scan_headers) - Scan the date headers of a T-AIS input file from a byte offset,
+# returning the (UTC epoch, byte offset) of each, and the offset up to which it was scanned.
+# A last line without a newline may still be being written, and is left for a later scan.
+def scan_headers(in_filename, offset=0):
+
+    entries = []
+    with open(in_filename, 'rb', buffering=io_buffer_size) as in_file:
+        in_file.seek(offset)
+        for line in in_file:
+            if not line.endswith(b"\n"):
+                break
+            strip_line = line.strip()
+            if strip_line[-5:] == b"data:":
+                entries.append((utc_header(strip_line[:-5].strip().decode('ascii'))[1], offset))
+            offset += len(line)
+    return (entries, offset)
+
+# Function (read_index) - Read the sidecar index of a T-AIS input file, returning its entries and
+# the offset up to which the file was indexed, or ([], 0) if there is no usable index.
+def read_index(in_filename):
+
+    entries = []
+    try:
+        with open(in_filename + index_suffix, 'r') as index_file:
+            for line in index_file:
+                if line.startswith("#"):
+                    continue
+                (key, value) = line.strip().split(",")
+                if key == "end":
+                    return (entries, int(value))
+                entries.append((int(key), int(value)))
+    except (IOError, ValueError):
+        pass
+    # A missing, unreadable or unfinished index is rebuilt.
+    return ([], 0)
+
+# Function (index_matches) - Check that an index is still of the file as it is on disk, i.e. the
+# file has not shrunk, and its last indexed date header is in place.
+def index_matches(in_filename, entries, indexed):
+
+    if indexed > os.path.getsize(in_filename):
+        return False
+    if not entries:
+        return True
+    (epoch, offset) = entries[-1]
+    with open(in_filename, 'rb') as in_file:
+        in_file.seek(offset)
+        strip_line = in_file.readline().strip()
+    try:
+        return strip_line[-5:] == b"data:" and utc_header(strip_line[:-5].strip().decode('ascii'))[1] == epoch
+    except (ValueError, UnicodeDecodeError):
+        return False
+
+# Function (load_index) - Load the date header index of a T-AIS input file, building the sidecar
+# index if there is none, or extending it over any lines appended to the file since. If the index
+# cannot be written, it is still used for this run.
+def load_index(in_filename):
+
+    (entries, indexed) = read_index(in_filename)
+    if not index_matches(in_filename, entries, indexed):
+        (entries, indexed) = ([], 0)
+    (new_entries, new_indexed) = scan_headers(in_filename, indexed)
+    if new_indexed != indexed or indexed == 0:
+        entries.extend(new_entries)
+        indexed = new_indexed
+        index_filename = in_filename + index_suffix
+        temp_filename = index_filename + ".%d" % os.getpid()
+        try:
+            with open(temp_filename, 'w') as index_file:
+                index_file.write(index_comment)
+                index_file.writelines(["%d,%d\n" % entry for entry in entries])
+                index_file.write("end,%d\n" % indexed)
+            os.replace(temp_filename, index_filename)
+        except (IOError, OSError) as msg:
+            sys.stderr.write("Unable to write index " + index_filename + ": " + str(msg) + "\n")
+    return (entries, indexed)
+
+# Function (slice_region) - The byte range (start, end) of a T-AIS input file holding the date
+# headers in a time slice (start, end) in epoch seconds, with the lines under them, from its index.
+# Headers need not be in time order; any out of slice headers within the range are skipped as the
+# lines are pre-parsed.
+def slice_region(in_filename, time_slice):
+
+    (entries, indexed) = load_index(in_filename)
+    (region_start, region_end) = (None, None)
+    for (index, (epoch, offset)) in enumerate(entries):
+        if time_slice[0] <= epoch < time_slice[1]:
+            if region_start is None:
+                region_start = offset
+            region_end = index + 1
+    if region_start is None:
+        return (0, 0)
+    if region_end < len(entries):
+        return (region_start, entries[region_end][1])
+    return (region_start, os.path.getsize(in_filename))
+
+# Function (region_lines) - Generate the lines of a byte range of a file, as text.
+def region_lines(in_filename, start, end):
+
+    with open(in_filename, 'rb', buffering=io_buffer_size) as in_file:
+        in_file.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            line = in_file.readline()
+            if not line:
+                break
+            remaining -= len(line)
+            yield line.decode('utf-8', 'replace')
+
+# Class (PreParsedSource) - The pre-parsed lines of a T-AIS input, read through readline() as
+# by the NM4 decoder (parse_ais_messages), and optionally also written to an intermediate file.
+class PreParsedSource:
+
+    def __init__(self, in_T_AIS_records, in_filename="", intermediate=None, time_slice=None):
+        self.in_T_AIS_records = in_T_AIS_records
+        self.lines = prefixed_lines(in_T_AIS_records, in_filename, time_slice)
+        self.intermediate = intermediate
+
+    def readline(self):
+        line = next(self.lines, "")
+        if line and self.intermediate is not None:
+            self.intermediate.write(line)
+        return line
+
+    def close(self):
+        self.in_T_AIS_records.close()
+
+# Function (open_pre_parsed) - Open a T-AIS input file for reading as pre-parsed lines, only the
+# region holding a time slice (start, end) in epoch seconds being read if one is given.
+def open_pre_parsed(in_filename, intermediate=None, time_slice=None):
+
+    if time_slice is None:
+        return PreParsedSource(open(in_filename, 'r', buffering=io_buffer_size), in_filename, intermediate)
+    (start, end) = slice_region(in_filename, time_slice)
+    return PreParsedSource(region_lines(in_filename, start, end), in_filename, intermediate, time_slice)
+
+# End
@@ -8,6 +8,10 @@ import sys
 import os
 import time
 
+# Shared field schemas, from 01_Raw_Data_Handling.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "01_Raw_Data_Handling"))
+from field_schema import compile_extractor
+
 # Function (ins_number) to determine if a string represents a number (specifically, an mmsi, code from: http://stackoverflow.com/questions/354038/how-do-i-check-if-a-string-is-a-number-float-in-python).
 def is_number(s):
     try:
@@ -64,6 +68,10 @@ out_message_records[2].write("ext_timestamp,msgid,mmsi,nav_stat,sog,cog,tr_hdg,l
 #other
 out_message_records[3].write("Field set depends on message type, see 0_gpsd_ais_ONC_parsing.py \n")
 
+# Formatting of the movement records of each message type group, from tokens led by the reformatted date (see field_schema.py).
+extract_1_2_3 = compile_extractor('NM4_tracks_1_2_3')
+extract_18_19 = compile_extractor('NM4_tracks_18_19')
+
 # Process each input file reference passed as input.
 for infile_index in range(len(sys.argv) - 3):
 
@@ -97,7 +105,8 @@ for infile_index in range(len(sys.argv) - 3):
                                 
                     # ext_timestamp,msgid,mmsi,nav_stat,sog,cog,tr_hdg,lat,lon,pos_acc
                     # ONC Parsed: 0,1,3,4,6,10,11,9,8,7
-                    out_message_records[0].write(out_date + "," + pipetokenizedline[1] + "," + pipetokenizedline[3] + "," + pipetokenizedline[4] + "," + pipetokenizedline[6] + "," + pipetokenizedline[10] + "," + pipetokenizedline[11] + "," + pipetokenizedline[9] + "," + pipetokenizedline[8] + "," + pipetokenizedline[7] + "\n")
+                    pipetokenizedline[0] = out_date
+                    out_message_records[0].write(extract_1_2_3(pipetokenizedline))
 
                 #5 - Write all tokens.
                 elif(input_msg_type in ("5")):
@@ -119,8 +128,8 @@ for infile_index in range(len(sys.argv) - 3):
 
                     #ext_timestamp,msgid,mmsi,nav_stat,sog,cog,tr_hdg,lat,lon,pos_acc
                     # ONC Parsed:  0,1,3,N/A,5,9,10,8,7,6
-                    out_message_records[2].write(out_date + "," + pipetokenizedline[1] + "," + pipetokenizedline[3] + "," + "" + "," + pipetokenizedline[5] + "," 
-                    + pipetokenizedline[9] + "," + pipetokenizedline[10] + "," + pipetokenizedline[8] + "," + pipetokenizedline[7] + "," + pipetokenizedline[6] + "," + "\n")
+                    pipetokenizedline[0] = out_date
+                    out_message_records[2].write(extract_18_19(pipetokenizedline))
                     
                 #other - Write all tokens.
                 else:
@@ -7,6 +7,10 @@ import sys
 import os
 import time
 
+# Shared field schemas, from 01_Raw_Data_Handling.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "01_Raw_Data_Handling"))
+from field_schema import compile_extractor
+
 # Usage string for the script.
 usage_string = "Usage: split_eE_AIS_pre_tracks.py outputdirectory outputfilenameprefix inputfilename1 [inputfilename2 ...] \n\nSplits pre-parsed position-referenced eE AIS records (Postgres Export) into sub files by message type, then mmsi pre track creation. Developed in support of the NEMES project (http://www.nemesproject.com/).\n"
 
@@ -53,6 +57,11 @@ out_message_records[2].write("ext_timestamp,msgid,mmsi,nav_stat,sog,cog,tr_hdg,l
 #other
 out_message_records[3].write("Field set depends on message type, see split_eE_AIS_for_PG_base_table_w_parsing.py \n")
 
+# Formatting of the movement records of each message type group (see field_schema.py).
+extract_1_2_3 = compile_extractor('eE_tracks_1_2_3')
+extract_18_19 = compile_extractor('eE_tracks_18_19')
+extract_27 = compile_extractor('eE_tracks_27')
+
 # Process each input file reference passed as input.
 for infile_index in range(len(sys.argv) - 3):
 
@@ -81,7 +90,7 @@ for infile_index in range(len(sys.argv) - 3):
                 if(input_msg_type in ("1", "2", "3")):
 
                     # ext_timestamp,msgid,mmsi,nav_stat,sog,cog,tr_hdg,lat,lon,pos_acc
-                    out_message_records[0].write(pipetokenizedline[3].strip() + "," + pipetokenizedline[1].strip() + "," + pipetokenizedline[0].strip() + "," + pipetokenizedline[13].strip() + "," + pipetokenizedline[15].strip() + "," + pipetokenizedline[19].strip() + "," + pipetokenizedline[20].strip() + "," + pipetokenizedline[18].strip() + "," + pipetokenizedline[17].strip() + "," + pipetokenizedline[16].strip() + "\n")
+                    out_message_records[0].write(extract_1_2_3(pipetokenizedline))
 
 
                 #18_19 
@@ -89,13 +98,13 @@ for infile_index in range(len(sys.argv) - 3):
 
                     #ext_timestamp,msgid,mmsi,nav_stat,sog,cog,tr_hdg,lat,lon,pos_acc
                     #3,1,0,none,19,23,24,22,21,20
-                    out_message_records[1].write(pipetokenizedline[3].strip() + "," + pipetokenizedline[1].strip() + "," + pipetokenizedline[0].strip() + "," + "" + "," + pipetokenizedline[19].strip() + "," + pipetokenizedline[23].strip() + "," + pipetokenizedline[24].strip() + "," + pipetokenizedline[22].strip() + "," + pipetokenizedline[21].strip() + "," + pipetokenizedline[20].strip() + "," + "\n")
+                    out_message_records[1].write(extract_18_19(pipetokenizedline))
                     
                 #27
                 elif(input_msg_type in ("27")):
                     #ext_timestamp,msgid,mmsi,nav_stat,sog,cog,tr_hdg,lat,lon,pos_acc
                     #3,1,0,13,14,18,none,16,17,15
-                    out_message_records[2].write(pipetokenizedline[3].strip() + "," + pipetokenizedline[1].strip() + "," + pipetokenizedline[0].strip() + "," + pipetokenizedline[13].strip() + "," + pipetokenizedline[14].strip() + "," + pipetokenizedline[18].strip() + "," + "" + "," + pipetokenizedline[17].strip() + "," + pipetokenizedline[16].strip() + "," + pipetokenizedline[15].strip() + "," + "\n")
+                    out_message_records[2].write(extract_27(pipetokenizedline))
 
                     
                 #other - write out input line as received.
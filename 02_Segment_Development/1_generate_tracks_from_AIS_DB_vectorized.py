@@ -8,6 +8,11 @@
 
 # 2018-09-20: Adding CSV input file processing, converting argument handling to argparser.
 
+# 2026-10-19: Adding NM4 input file processing (--nm4in), decoded in process via the NM4 decoders.
+
+# 2026-10-19: Adding MMSI bucket input (--bucketin), as written by the NM4 decoders (--buckets), with
+#  buckets split and segmented independently over a pool of processes.
+
 # Disable numpy warnings about type - change due to mismatched build of numpy vs python
 #https://stackoverflow.com/questions/40845304/runtimewarning-numpy-dtype-size-changed-may-indicate-binary-incompatibility
 import warnings
@@ -45,6 +50,9 @@ from itertools import compress
 # Import argument parser
 import argparse
 
+# Import process pool for processing MMSI buckets in parallel.
+from multiprocessing import Pool
+
 # Import parser for dates in csv files for conversion to dataframe.
 import dateutil.parser
 
@@ -59,6 +67,10 @@ min_speed_bound_kts = 0.5
 
 #Maximum inferred speed boundary (for point-to-point tracks, GIS file creation) (knots 2016-04-01)
 max_speed_bound_kts = 86.3930885411603
+
+# Location of the NM4 decoder module (nm4_decoder.py), and the NM4 line prefix formats it accepts.
+nm4_decoder_directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "01_Raw_Data_Handling")
+nm4_prefix_formats = ['auto', 'eE', 'DMAS', 'Taggart']
 #########################################################
 
 """
@@ -242,6 +254,62 @@ def generate_dataframe_csv(in_csvfile):
 
     return loaded_dataframe
 
+# Function (generate_dataframe_nm4) - Function to instantiate a dataframe for processing, decoding
+# NM4 input files directly into typed tables via the NM4 decoder module, in the line prefix format
+# indicated ('auto' to detect per file), over a pool of processes if more than one is indicated.
+def generate_dataframe_nm4(in_nm4files, in_nm4format, in_processes=1):
+
+    # Load the decoder module.
+    if nm4_decoder_directory not in sys.path:
+        sys.path.insert(0, nm4_decoder_directory)
+    import nm4_decoder
+
+    if(in_nm4format == 'auto'):
+        in_nm4format = None
+
+    # Decode the position reports (types 1, 2, 3, 18 and 19) with scaled lon, lat, sog and cog values.
+    decoded_tables = nm4_decoder.decode_files(in_nm4files, types=[1,2,3,18,19], fields=['mmsi','status','speed','course','heading','lat','lon'], scaled=True, as_frame=True, prefix_format=in_nm4format, processes=in_processes)
+    if(len(decoded_tables) == 0):
+        print("No position reports decoded from NM4 input.")
+        return None
+
+    # Rename the decoded fields to match the csv / db input, Class B reports carry no navigational status.
+    decoded_frames = []
+    for decoded_frame in decoded_tables.values():
+        if 'status' not in decoded_frame:
+            decoded_frame['status'] = np.nan
+        decoded_frames.append(decoded_frame.rename(columns={'msgtype':'message_id','status':'navigational_status','speed':'sog','course':'cog','lat':'latitude','lon':'longitude'}))
+    loaded_dataframe = pd.concat(decoded_frames, ignore_index=True)
+    loaded_dataframe = loaded_dataframe[['time','message_id','mmsi','navigational_status','sog','cog','heading','latitude','longitude']]
+    loaded_dataframe['time'] = loaded_dataframe['time'].astype('datetime64[ns]')
+
+    # Sort the dataframe on mmsi, time, message_id, latitude, longitude, cog, sog, heading (for repeatability)
+    loaded_dataframe.sort_values(by=['mmsi','time','message_id','latitude','longitude','cog','sog','heading'],inplace=True)
+
+    # Reset index to match new sorting 
+    loaded_dataframe.reset_index(drop=True)
+
+    return loaded_dataframe
+
+# End Function (generate_dataframe_nm4)
+
+# Function (generate_dataframe_bucket) - Function to instantiate a dataframe for processing, using a 
+# single MMSI bucket csv as written by the NM4 decoders (--buckets). All of the reports of a vessel lie
+# in one bucket, in receive time order, so a stable sort on mmsi alone groups them without reordering.
+def generate_dataframe_bucket(in_bucketfile):
+
+    # Load the bucket file to a dataframe, Class B reports leave the navigational status empty.
+    loaded_dataframe = pd.read_csv(in_bucketfile,header=0,index_col=False,usecols=['time','message_id','mmsi','navigational_status','sog','cog','heading','latitude','longitude'],na_values='',dtype={'navigational_status':'float64'})
+    loaded_dataframe = loaded_dataframe[['time','message_id','mmsi','navigational_status','sog','cog','heading','latitude','longitude']]
+    loaded_dataframe['time'] = pd.to_datetime(loaded_dataframe['time'], format='%Y-%m-%d %H:%M:%S').astype('datetime64[ns]')
+
+    # Group the dataframe on mmsi, keeping each vessel's reports in time order.
+    loaded_dataframe.sort_values(by=['mmsi'],kind='mergesort',inplace=True)
+
+    return loaded_dataframe.reset_index(drop=True)
+
+# End Function (generate_dataframe_bucket)
+
 # Function (generate_dataframe_pgdb) - Function to instantiate a dataframe for processing, based on 
 # Postgres DB connection.
 def generate_dataframe_pgdb(in_connect_string, in_tablename):
@@ -444,6 +512,9 @@ def generate_short_segments(in_dataframe, segment_split_directory, segment_other
     # Select the mmsi records in sorted order on mmsi.
     dataframe_mmsis = in_dataframe['mmsi'].unique()
 
+    # Group the records on mmsi, for fetching the points of each vessel in turn.
+    dataframe_mmsi_groups = in_dataframe.groupby('mmsi', sort=False)
+
     #Establish a progressbar for iterating over incoming records
     in_records_bar = progressbar.ProgressBar()
 
@@ -470,7 +541,7 @@ def generate_short_segments(in_dataframe, segment_split_directory, segment_other
 
             # Use the current mmsi to fetch a second dataframe holding the point data 
             # for the current vessel, sorted on date / message_id / lat / lon.
-            dataframe_points = in_dataframe.query('mmsi == @mmsidatarow')
+            dataframe_points = dataframe_mmsi_groups.get_group(mmsidatarow.item())
 # DEBUG Re: sorting            dataframe_points.sort_values(by=['time', 'message_id', 'latitude', 'longitude'])
             dataframe_points.sort_values(by=['time', 'message_id', 'latitude', 'longitude', 'cog', 'sog', 'heading'])
             
@@ -1151,6 +1222,9 @@ def generate_threshold_tracks(source_dataframe, segment_split_directory, segment
     # Select the mmsi records in sorted order on mmsi.
     dataframe_mmsis = source_dataframe['mmsi'].unique()
 
+    # Group the records on mmsi, for fetching the points of each vessel in turn.
+    dataframe_mmsi_groups = source_dataframe.groupby('mmsi', sort=False)
+
     #Establish a progressbar for iterating over incoming records
     in_records_bar = progressbar.ProgressBar()
 
@@ -1180,7 +1254,7 @@ def generate_threshold_tracks(source_dataframe, segment_split_directory, segment
 
             # Use the current mmsi to fetch a second dataframe holding the point data 
             # for the current vessel, sorted on date / message_id / lat / lon.
-            dataframe_points = source_dataframe.query('mmsi == @mmsidatarow')
+            dataframe_points = dataframe_mmsi_groups.get_group(mmsidatarow.item())
             dataframe_points.sort_values(by=['time', 'message_id', 'latitude', 'longitude', 'cog', 'sog', 'heading'])
             
             # Update the number of total input points
@@ -1253,6 +1327,50 @@ def generate_threshold_tracks(source_dataframe, segment_split_directory, segment
 
 # End Function generate_threshold_tracks
 
+# Function generate_bucket_segments - Pool worker, splitting and segmenting (short or thresholded) the
+# vessels of a single MMSI bucket file. TRACK_ARGS holds the max elapsed time for short segments, or
+# the track separation time and max point speed for thresholded tracks.
+def generate_bucket_segments(in_args):
+
+    (bucket_filename, split_file_directory, segment_split_directory, segment_other_split_directory, short_track_indicator, track_args) = in_args
+
+    # Load the bucket, skipping any that hold no reports.
+    bucket_dataframe = generate_dataframe_bucket(bucket_filename)
+    if(bucket_dataframe.shape[0] == 0):
+        return None
+
+    # Split the bucket into separate text files based on mmsi.
+    split_pre_tracks(bucket_dataframe, split_file_directory)
+
+    if(short_track_indicator):
+        return generate_short_segments(bucket_dataframe, segment_split_directory, segment_other_split_directory, track_args[0])
+    else:
+        return generate_threshold_tracks(bucket_dataframe, segment_split_directory, segment_other_split_directory, track_args[0], track_args[1])
+
+# End Function generate_bucket_segments
+
+# Function generate_bucketed_segments - Split and segment all of the MMSI bucket files in a directory
+# over a pool of processes, returning the segment records of all buckets together.
+def generate_bucketed_segments(bucket_directory, split_file_directory, segment_split_directory, segment_other_split_directory, short_track_indicator, track_args, processes):
+
+    bucket_filenames = sorted(glob(os.path.join(bucket_directory, "positions_*.csv")))
+    bucket_jobs = [(bucket_filename, split_file_directory, segment_split_directory, segment_other_split_directory, short_track_indicator, track_args) for bucket_filename in bucket_filenames]
+
+    # Vessels never span buckets, so the buckets are processed independently.
+    bucket_pool = Pool(processes)
+    try:
+        bucket_segment_arrays = bucket_pool.map(generate_bucket_segments, bucket_jobs)
+    finally:
+        bucket_pool.close()
+        bucket_pool.join()
+
+    bucket_segment_arrays = [segment_array for segment_array in bucket_segment_arrays if segment_array is not None and len(segment_array) > 0]
+    if(len(bucket_segment_arrays) == 0):
+        return None
+    return np.concatenate(bucket_segment_arrays)
+
+# End Function generate_bucketed_segments
+
 # Function generate_threshold_GIS - Write out a GIS representation of the output
 # of a threshold based segmentation.
 def generate_threshold_GIS(segment_split_array, gis_directory, out_filename_prefix, outputEPSG):
@@ -1509,8 +1627,13 @@ def main():
     p.add_argument('outdirectory', type=str, help='The target directory into which output results will be generated.')
     p.add_argument('out_filename_prefix', type=str, help='The base filename prefix under which the output should be written.')
     group1 = p.add_mutually_exclusive_group(required=True)
-    group1.add_argument('--textin', type=str, nargs=1, dest='IN_FILENAME', required=False, help='Indicates that the input will be in text form. IN_FILENAME is location of the text input file. Only one of --textin or --dbin may be selected.')
-    group1.add_argument('--dbin', type=str, nargs=2, metavar=('IN_TABLENAME','CONNECT_STRING_FILENAME'), required=False, help='Indicates that the input will be a db table. IN_TABLENAME is the schema.tablename of the input data table, while CONNECT_STRING_FILENAME is a reference to a .pgpass connect string file. Only one of --textin or --dbin may be selected.')
+    group1.add_argument('--textin', type=str, nargs=1, dest='IN_FILENAME', required=False, help='Indicates that the input will be in text form. IN_FILENAME is location of the text input file. Only one of --textin, --dbin, --nm4in or --bucketin may be selected.')
+    group1.add_argument('--dbin', type=str, nargs=2, metavar=('IN_TABLENAME','CONNECT_STRING_FILENAME'), required=False, help='Indicates that the input will be a db table. IN_TABLENAME is the schema.tablename of the input data table, while CONNECT_STRING_FILENAME is a reference to a .pgpass connect string file. Only one of --textin, --dbin, --nm4in or --bucketin may be selected.')
+    group1.add_argument('--nm4in', type=str, nargs='+', dest='NM4_FILENAMES', required=False, help='Indicates that the input will be raw NM4 AIS, decoded directly. NM4_FILENAMES are the locations of the NM4 input files (optionally, globbable wildcards). Only one of --textin, --dbin, --nm4in or --bucketin may be selected.')
+    group1.add_argument('--bucketin', type=str, nargs=1, dest='BUCKET_DIRECTORY', required=False, help='Indicates that the input will be MMSI bucket csv files (positions_*.csv), as written by the NM4 decoders with --buckets. BUCKET_DIRECTORY is the location of the bucket files, which are processed independently. Only one of --textin, --dbin, --nm4in or --bucketin may be selected.')
+    p.add_argument('--nm4format', type=str, choices=nm4_prefix_formats, default='auto', dest='NM4_FORMAT', required=False, help='The line prefix format of NM4 input: DMAS or Taggart (date prefix, ONC / Taggart pre-parsed), eE (exactEarth tag block) or auto (detected from the first line of each file). Defaults to auto if omitted.')
+    p.add_argument('--nm4processes', type=int, default=1, dest='NM4_PROCESSES', required=False, help='The number of processes over which NM4 input files are decoded. Defaults to 1 if omitted.')
+    p.add_argument('--bucketprocesses', type=int, default=1, dest='BUCKET_PROCESSES', required=False, help='The number of processes over which MMSI bucket files are split and segmented. Defaults to 1 if omitted.')
     group2 = p.add_mutually_exclusive_group(required=True)
     group2.add_argument('--shorttrk', nargs=1, type=float, dest='MAX_ELAPSED_TIME', required=False, help='Indicates that point-to-point tracks should be created. MAX_ELAPSED_TIME is the maximum time interval (in seconds) to be permitted between subsequent points in a track. Only one of --shorttrk or --fulltrk may be selected.')
     group2.add_argument('--fulltrk', nargs=2, type=float, metavar=('TRACK_SEPARATION_TIME','MAX_POINT_SPEED'), required=False, help='Indicates that full vessels paths should be created. TRACK_SEPARATION_TIME is the maximum time interval (in seconds) to be permitted between subsequent points in a track; points may be discarded mid-track if the remainder constitutes a valid track. MAX_POINT_SPEED is the maximum implied speed (distance between points / time between points; in kph) to be permitted between subsequent points within a track. Points not meeting this threshold are dropped. Only one of --shorttrk or --fulltrk may be selected.')
@@ -1556,6 +1679,23 @@ def main():
             p.print_help()
             quit()
 
+    # If NM4 based processing was selected, check that the input files exist.
+    elif(not args.NM4_FILENAMES is None):
+
+        for in_nm4_fileref in args.NM4_FILENAMES:
+            if(len(glob(in_nm4_fileref)) == 0):
+                print("Input NM4 data file (" + in_nm4_fileref + ") not found.\n")
+                p.print_help()
+                quit()
+
+    # If bucket based processing was selected, check that the bucket files exist.
+    elif(not args.BUCKET_DIRECTORY is None):
+
+        if(len(glob(os.path.join(args.BUCKET_DIRECTORY[0], "positions_*.csv"))) == 0):
+            print("Input bucket files (" + os.path.join(args.BUCKET_DIRECTORY[0], "positions_*.csv") + ") not found.\n")
+            p.print_help()
+            quit()
+
     # Otherwise, if textfile-based processing was selected, retrieve the filename.
     else:
         
@@ -1578,8 +1718,23 @@ def main():
         cmd_max_point_speed = args.fulltrk[1]
         short_track_indicator = 0
         
+    # Bucket files are loaded separately, within the processing of each bucket.
+    if(not args.BUCKET_DIRECTORY is None):
+        source_dataframe = None
+
+    # Load data into dataframe from NM4 files here.
+    elif(not args.NM4_FILENAMES is None):
+
+        # Decode the NM4 files directly into a dataframe of the fields required to generate tracks.
+        source_dataframe = generate_dataframe_nm4(args.NM4_FILENAMES, args.NM4_FORMAT, args.NM4_PROCESSES)
+
+        # If the decoding yielded no positions, print an usage message and abort.
+        if(source_dataframe is None):
+            p.print_usage()
+            quit()
+
     # Load data into dataframe from file here.
-    if(args.dbin is None):
+    elif(args.dbin is None):
 
         # Attempt to load the specified csv file into a dataframe, retrieving the 
         # fields required to generate tracks.
@@ -1615,6 +1770,22 @@ def main():
             print("\nError creating output directories, aborting.")
             quit()
         
+    # If bucket input was selected, split and segment the buckets independently, 
+    # then generate the GIS representations of all of the segments together.
+    if(not args.BUCKET_DIRECTORY is None):
+
+        if(short_track_indicator):
+            print("\nShort (point-to-point) track generation, by MMSI bucket.")
+            segment_array = generate_bucketed_segments(args.BUCKET_DIRECTORY[0], cmd_split_file_directory, cmd_segment_split_directory, cmd_segment_other_split_directory, short_track_indicator, (cmd_max_elapsed_time,), args.BUCKET_PROCESSES)
+            generate_short_GIS(segment_array, cmd_gis_directory, cmd_out_filename_prefix, cmd_max_elapsed_time, cmd_outputEPSG)
+            print("Speed bounds: " + str(min_speed_bound_kts) + " < speed in knots < " + str(max_speed_bound_kts))
+        else:
+            print("\nThresholded track generation, by MMSI bucket.")
+            segment_array = generate_bucketed_segments(args.BUCKET_DIRECTORY[0], cmd_split_file_directory, cmd_segment_split_directory, cmd_segment_other_split_directory, short_track_indicator, (cmd_track_separation_time, cmd_max_point_speed), args.BUCKET_PROCESSES)
+            generate_threshold_GIS(segment_array, cmd_gis_directory, cmd_out_filename_prefix, cmd_outputEPSG)
+
+        return
+
     # Split the data table into separate text files based on mmsi.
     split_pre_tracks(source_dataframe, cmd_split_file_directory)
     
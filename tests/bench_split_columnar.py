@@ -0,0 +1,41 @@
+# Benchmark of the ONC splitting script's modes: times a serial run, --columnar
+# and (with more than one CPU) -p on generated pre-parsed lines, checking that
+# each writes the serial output.
+#
+# Usage: python tests/bench_split_columnar.py [lines [processes]]
+
+import os, pathlib, subprocess, sys, tempfile, time
+
+from test_split_modes import SCRIPT_DIR, TEMPLATES, MUTATIONS, write_input
+
+SCRIPT = os.path.join(SCRIPT_DIR, "1_split_ONC_AIS_for_PG_base_table_w_parsing.py")
+
+def run(options, in_filename, out_filename):
+    "Run the script with the given options, returning the seconds taken and its output."
+    start = time.time()
+    subprocess.check_output([sys.executable, SCRIPT] + options + ["20190401", out_filename, in_filename])
+    seconds = time.time() - start
+    with open(out_filename, 'rb') as out_file:
+        output = out_file.read()
+    os.remove(out_filename)
+    return (seconds, output)
+
+lines = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+processes = int(sys.argv[2]) if len(sys.argv) > 2 else os.cpu_count()
+
+with tempfile.TemporaryDirectory() as tmp_dir:
+    in_filename = os.path.join(tmp_dir, "in.txt")
+    out_filename = os.path.join(tmp_dir, "out.txt")
+
+    # Mostly well formed lines, as in practice, with a malformed value in about 1 in 100.
+    write_input(pathlib.Path(in_filename), lines, 1, TEMPLATES, MUTATIONS, rate=0.01)
+    print("Lines: " + str(lines) + ", bytes: " + str(os.path.getsize(in_filename)))
+
+    modes = [["--columnar"]]
+    if processes > 1:
+        modes.append(["-p", str(processes)])
+    (serial_seconds, serial) = run([], in_filename, out_filename)
+    print("serial: " + "%.2f" % serial_seconds + " s")
+    for options in modes:
+        (seconds, output) = run(options, in_filename, out_filename)
+        print(" ".join(options) + ": " + "%.2f" % seconds + " s, " + "%.1f" % (serial_seconds / seconds) + "x" + ("" if output == serial else " (OUTPUT DIFFERS)"))
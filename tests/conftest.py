@@ -0,0 +1,31 @@
+# Test setup - the modules under test live beside the scripts in
+# 01_Raw_Data_Handling, which is not a package, so it is put on the path.
+
+import os, sys
+
+raw_data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "01_Raw_Data_Handling")
+sys.path.insert(0, os.path.abspath(raw_data_dir))
+
+import pytest
+
+@pytest.fixture
+def pg_connect_string():
+    "A connect string for a local, throwaway Postgres server (AIS_TEST_PG, else the libpq defaults); skips the test if there is none."
+    psycopg2 = pytest.importorskip("psycopg2")
+    connect_string = os.environ.get("AIS_TEST_PG", "")
+    try:
+        psycopg2.connect(connect_string).close()
+    except psycopg2.Error:
+        pytest.skip("no local Postgres server to test against")
+    return connect_string
+
+@pytest.fixture
+def pg_cursor(pg_connect_string):
+    "A cursor on the test server, for reading back what was loaded (autocommit)."
+    import psycopg2
+    connection = psycopg2.connect(pg_connect_string)
+    connection.autocommit = True
+    cursor = connection.cursor()
+    yield cursor
+    cursor.close()
+    connection.close()
@@ -0,0 +1,43 @@
+# Tests of the coordinate validation and repair (coordinate_repair.py) shared
+# by the splitting scripts.
+
+import numpy as np
+
+from coordinate_repair import SCALAR_RUN, add_counts, coordinate_floats, repair_coordinate, repair_coordinates
+
+def test_repair_exponent_fraction():
+    assert repair_coordinate("1.5E2.0") == ("1.5E2", "exponent_fraction")
+    assert repair_coordinate("-4.4e-1.25") == ("-4.4e-1", "exponent_fraction")
+    assert repair_coordinate(" .5E+3.0 ") == (".5E+3", "exponent_fraction")
+
+def test_repair_invalid():
+    for value in ("", "abc", "1.5E", "1.5E2.", "1.5E2.0x", "E2.0", None):
+        assert repair_coordinate(value) == (None, "invalid")
+
+def test_repair_column():
+    (values, valid, counts) = repair_coordinates(["-63.5", "1.5E2.0", "bad", "", "44"], '')
+    assert list(values) == ["-63.5", "1.5E2", '', '', "44"]
+    assert list(valid) == [True, True, False, False, True]
+    assert counts == {"exponent_fraction": 1, "invalid": 2}
+
+def test_repair_long_column():
+    # Longer than a scalar run, so the column is first converted whole, then in halves.
+    column = ["%d.25" % index for index in range(SCALAR_RUN * 5)]
+    column[3] = "2.5E1.0"
+    column[SCALAR_RUN * 4] = "x"
+    (values, valid, counts) = repair_coordinates(column)
+    assert values[3] == "2.5E1"
+    assert values[SCALAR_RUN * 4] is None
+    assert valid.sum() == len(column) - 1
+    assert counts == {"exponent_fraction": 1, "invalid": 1}
+
+def test_coordinate_floats():
+    (values, valid, counts) = repair_coordinates(["1.5E2.0", "nope", "-0.5"], '')
+    floats = coordinate_floats(values, valid)
+    assert floats[0] == 150.0
+    assert np.isnan(floats[1])
+    assert floats[2] == -0.5
+
+def test_add_counts():
+    totals = add_counts({}, {"exponent_fraction": 2, "invalid": 0})
+    assert add_counts(totals, {"exponent_fraction": 1, "invalid": 3}) == {"exponent_fraction": 3, "invalid": 3}
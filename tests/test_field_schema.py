@@ -0,0 +1,33 @@
+# Tests of the field schemas (field_schema.py) shared by the splitting scripts,
+# in particular that an extractor leaves the tokens it is given unchanged.
+
+from field_schema import compile_extractor, schema_fields
+
+def test_tokens_unchanged():
+    extract = compile_extractor('split_1_2_3')
+    tokens = [str(index) for index in range(16)]
+    before = list(tokens)
+    extract(tokens)
+    assert tokens == before
+
+def test_repeated_calls_agree():
+    extract = compile_extractor('split_5')
+    tokens = [str(index) for index in range(21)]
+    assert extract(tokens) == extract(tokens)
+
+def test_split_fields_and_escape():
+    extract = compile_extractor('split_1_2_3')
+    tokens = [str(index) for index in range(16)]
+    tokens[4] = "a\\b"
+    line = extract(tokens)
+    fields = line[:-1].split('|')
+    assert line.endswith("\n")
+    assert len(fields) == len(schema_fields('split_1_2_3'))
+    assert fields[:5] == ['3', '1', '2', '0', '']
+    assert fields[13] == "a\\\\b"
+    assert fields[-1] == ''
+
+def test_strip_and_null():
+    extract = compile_extractor('eE_tracks_18_19')
+    tokens = [" %d " % index for index in range(25)]
+    assert extract(tokens) == "3,1,0,,19,23,24,22,21,20,\n"
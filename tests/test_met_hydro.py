@@ -0,0 +1,34 @@
+# Tests of the observation times of DAC 1 / FID 11 met/hydro reports
+# (nm4_decoder.met_hydro_time), given as day, hour and minute only and placed
+# in the month of their receive time, or the month before.
+
+import calendar
+
+from nm4_decoder import met_hydro_time
+
+def utc(year, month, day, hour=0, minute=0):
+    return calendar.timegm((year, month, day, hour, minute, 0))
+
+def test_same_month():
+    assert met_hydro_time(utc(2019, 3, 15, 12), 15, 11, 50) == utc(2019, 3, 15, 11, 50)
+
+def test_previous_month():
+    assert met_hydro_time(utc(2019, 3, 1, 0, 10), 28, 23, 50) == utc(2019, 2, 28, 23, 50)
+
+def test_previous_year():
+    assert met_hydro_time(utc(2019, 1, 1, 0, 5), 31, 23, 55) == utc(2018, 12, 31, 23, 55)
+
+def test_day_missing_from_previous_month():
+    # February 2019 has no 29th or 30th, which timegm would carry into March.
+    assert met_hydro_time(utc(2019, 3, 2, 1), 30, 23, 0) is None
+    assert met_hydro_time(utc(2019, 3, 2, 1), 29, 23, 0) is None
+    assert met_hydro_time(utc(2020, 3, 2, 1), 29, 23, 0) == utc(2020, 2, 29, 23, 0)
+    assert met_hydro_time(utc(2019, 5, 1, 1), 31, 12, 0) is None
+
+def test_out_of_range_fields():
+    received = utc(2019, 3, 15, 12)
+    assert met_hydro_time(None, 15, 11, 50) is None
+    assert met_hydro_time(received, 0, 11, 50) is None
+    assert met_hydro_time(received, 32, 11, 50) is None
+    assert met_hydro_time(received, 15, 24, 0) is None
+    assert met_hydro_time(received, 15, 11, 60) is None
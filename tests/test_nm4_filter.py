@@ -0,0 +1,109 @@
+# Tests of the AISFilter criteria applied while decoding NM4 lines
+# (nm4_decoder.py), in particular of the receive time window, which is
+# judged on the first fragment of each message.
+
+import io
+
+from nm4_decoder import AISFilter, make_filter, parse_ais_messages
+
+TYPE1 = "!AIVDM,1,1,,A,14eG71001ssPO>fJSenQj1Ht0000,0*55\n"
+TYPE5 = ["!AIVDM,2,1,4,A,54eG71P2;=`0<H77;?AHE=<Dj3H0000000000016<PD:<51=NBj0C2APF000,0*08\n",
+         "!AIVDM,2,2,4,A,00000000000,2*20\n"]
+TYPE18 = "!AIVDM,1,1,,A,B4eG7300=nnSp=6Vfq0p@eb4P000,0*71\n"
+
+def aivdm(fields):
+    "A single fragment AIVDM sentence carrying the given (width, value) fields, values being two's complement."
+    bits = "".join([format(value & (2**width - 1), "0%db" % width) for (width, value) in fields])
+    pad = -len(bits) % 6
+    bits += "0" * pad
+    payload = "".join([chr(48 + n + (8 if n > 39 else 0)) for n in [int(bits[i:i + 6], 2) for i in range(0, len(bits), 6)]])
+    body = "AIVDM,1,1,,A,%s,%d" % (payload, pad)
+    checksum = 0
+    for c in body:
+        checksum ^= ord(c)
+    return "!%s*%02X\n" % (body, checksum)
+
+def type1(lon, lat):
+    "A type 1 position report, lon and lat in 1/10000 minutes."
+    return aivdm([(6, 1), (2, 0), (30, 316000001), (4, 0), (8, 0), (10, 50), (1, 0), (28, lon), (27, lat), (12, 900), (9, 90), (6, 10), (2, 0), (3, 0), (1, 0), (19, 0)])
+
+def type27(lon, lat):
+    "A type 27 long range position report, lon and lat in 1/10 minutes."
+    return aivdm([(6, 27), (2, 0), (30, 316000002), (1, 0), (1, 0), (4, 0), (18, lon), (17, lat), (6, 5), (9, 90), (1, 0), (1, 0)])
+
+def ee_first(received, sentence):
+    "An eE line carrying a receive time, as the first (or only) fragment of a message."
+    return "\\c:%d,s:sat1*00\\" % received + sentence
+
+def ee_continuation(sentence):
+    "An eE continuation line, whose tag block has no receive time."
+    return "\\g:2-2-4*00\\" + sentence
+
+def decoded(lines, aisfilter=None, skiperr=True):
+    "Decode lines, returning (message type, prefix) for each message."
+    source = io.StringIO("".join(lines))
+    return [(cooked[0][1], date) for (raw, cooked, bogon, date) in parse_ais_messages(source, skiperr=skiperr, aisfilter=aisfilter)]
+
+def test_no_filter_keeps_multipart():
+    lines = [ee_first(100, TYPE1), ee_first(200, TYPE5[0]), ee_continuation(TYPE5[1])]
+    assert [msgtype for (msgtype, date) in decoded(lines)] == [1, 5]
+
+def test_window_keeps_multipart_messages():
+    lines = [ee_first(100, TYPE1), ee_first(200, TYPE5[0]), ee_continuation(TYPE5[1]), ee_first(300, TYPE18)]
+    messages = decoded(lines, AISFilter(window=(150, 400)))
+    assert messages == [(5, "\\c:200,s:sat1*00"), (18, "\\c:300,s:sat1*00")]
+
+def test_window_drops_multipart_messages_outside():
+    lines = [ee_first(100, TYPE5[0]), ee_continuation(TYPE5[1]), ee_first(200, TYPE1)]
+    assert decoded(lines, AISFilter(window=(150, 400))) == [(1, "\\c:200,s:sat1*00")]
+
+def test_window_end_excluded():
+    lines = [ee_first(100, TYPE1), ee_first(200, TYPE18)]
+    assert decoded(lines, AISFilter(window=(100, 200))) == [(1, "\\c:100,s:sat1*00")]
+
+def test_dropped_message_leaves_no_stale_prefix():
+    # A message whose first fragment is in the window but whose checksum
+    # fails is thrown away, and must not lend its prefix to the next.
+    bad_first = TYPE5[0].replace("*08", "*09")
+    lines = [ee_first(200, bad_first), ee_continuation(TYPE5[1]), ee_first(250, TYPE1)]
+    assert decoded(lines) == [(1, "\\c:250,s:sat1*00")]
+    assert decoded(lines, AISFilter(window=(150, 400))) == [(1, "\\c:250,s:sat1*00")]
+
+def test_abandoned_partial_leaves_no_stale_prefix():
+    # A first fragment never followed by its continuation.
+    lines = [ee_first(200, TYPE5[0]), ee_first(250, TYPE1)]
+    assert decoded(lines) == [(1, "\\c:250,s:sat1*00")]
+
+def test_slice_applies_as_window():
+    lines = [ee_first(100, TYPE1), ee_first(200, TYPE5[0]), ee_continuation(TYPE5[1])]
+    assert [msgtype for (msgtype, date) in decoded(lines, make_filter(time_slice=(150, 250)))] == [5]
+
+def test_mmsi_filter():
+    lines = [ee_first(100, TYPE1), ee_first(200, TYPE5[0]), ee_continuation(TYPE5[1])]
+    mmsis = set([dict([(inst.name, value) for (inst, value) in cooked])['mmsi'] for (raw, cooked, bogon, date) in parse_ais_messages(io.StringIO("".join(lines)), skiperr=True)])
+    assert [msgtype for (msgtype, date) in decoded(lines, AISFilter(mmsi_allow=mmsis))] == [1, 5]
+    assert decoded(lines, AISFilter(mmsi_allow=set([1]))) == []
+    assert decoded(lines, AISFilter(mmsi_deny=mmsis)) == []
+
+def test_position_ok_polygon():
+    square = AISFilter(polygon=[(-64, 44), (-63, 44), (-63, 45), (-64, 45)])
+    assert square.bbox == (-64, 44, -63, 45)
+    assert square.position_ok(-63.5, 44.5)
+    assert not square.position_ok(-62.5, 44.5)
+
+def test_region_keeps_unavailable_positions():
+    # Halifax, somewhere far off, and positions given as not available
+    # (lon 181 / lat 91), which are kept as messages without a position.
+    box = AISFilter(bbox=(-64, 44, -63, 45))
+    inside = [type1(-63 * 600000 - 300000, 44 * 600000 + 300000), type27(-63 * 600 - 300, 44 * 600 + 300)]
+    outside = [type1(10 * 600000, 10 * 600000), type27(10 * 600, 10 * 600)]
+    unavailable = [type1(181 * 600000, 91 * 600000), type1(181 * 600000, 44 * 600000), type1(-63 * 600000, 91 * 600000),
+                   type27(181 * 600, 91 * 600)]
+    assert [msgtype for (msgtype, date) in decoded(inside + outside + unavailable)] == [1, 27, 1, 27, 1, 1, 1, 27]
+    assert [msgtype for (msgtype, date) in decoded(inside + outside + unavailable, box)] == [1, 27, 1, 1, 1, 27]
+
+def test_sample_is_stable():
+    sampler = AISFilter(sample=3)
+    kept = [mmsi for mmsi in range(316000000, 316000300) if sampler.mmsi_ok(mmsi)]
+    assert kept == [mmsi for mmsi in range(316000000, 316000300) if AISFilter(sample=3).mmsi_ok(mmsi)]
+    assert 0 < len(kept) < 300
@@ -0,0 +1,51 @@
+# Tests of the decode plans (nm4_decoder.decode_plan) that project the
+# decoded fields onto a requested list, alone and with an AISFilter.
+
+import io
+
+import pytest
+
+from nm4_decoder import AISFilter, aivdm_decode, decode_plan, parse_ais_messages
+from test_nm4_filter import TYPE1, TYPE5, TYPE18, ee_continuation, ee_first
+
+def fields_of(lines, fields=None, aisfilter=None):
+    "Decode lines, returning a {name: value} dict for each message."
+    source = io.StringIO("".join(lines))
+    return [dict([(inst.name, value) for (inst, value) in cooked]) for (raw, cooked, bogon, date) in parse_ais_messages(source, skiperr=True, fields=fields, aisfilter=aisfilter)]
+
+def test_full_plan_is_decode_table():
+    assert decode_plan() is aivdm_decode
+
+def test_unknown_field_rejected():
+    with pytest.raises(ValueError):
+        decode_plan(['mmsi', 'nosuchfield'])
+
+def test_plan_reused():
+    assert decode_plan(['mmsi', 'lon']) is decode_plan(['lon', 'mmsi'])
+
+def test_projection_reports_msgtype_and_requested_fields():
+    lines = [TYPE1] + TYPE5 + [TYPE18]
+    messages = fields_of(lines, ['mmsi', 'lon'])
+    assert [sorted(message) for message in messages] == [['lon', 'mmsi', 'msgtype'], ['mmsi', 'msgtype'], ['lon', 'mmsi', 'msgtype']]
+
+def test_projection_matches_full_decode():
+    lines = [TYPE1] + TYPE5 + [TYPE18]
+    full = fields_of(lines)
+    projected = fields_of(lines, ['mmsi', 'lat', 'lon', 'shipname', 'sog'])
+    assert len(projected) == len(full)
+    for (message, whole) in zip(projected, full):
+        assert message == dict([(name, whole[name]) for name in message])
+
+def test_alias_names():
+    assert fields_of([TYPE1], ['speed']) == fields_of([TYPE1], ['sog'])
+
+def test_filter_with_projection_keeps_multipart():
+    lines = [ee_first(100, TYPE1), ee_first(200, TYPE5[0]), ee_continuation(TYPE5[1]), ee_first(300, TYPE18)]
+    messages = fields_of(lines, ['shipname'], AISFilter(window=(150, 400)))
+    assert messages[0] == {'msgtype': 5, 'shipname': 'VESSEL 6'}
+    assert [message['msgtype'] for message in messages] == [5, 18]
+
+def test_mmsi_filter_on_multipart():
+    lines = [TYPE1] + TYPE5 + [TYPE18]
+    messages = fields_of(lines, ['mmsi'], AISFilter(mmsi_allow=set([316000006])))
+    assert messages == [{'msgtype': 5, 'mmsi': 316000006}]
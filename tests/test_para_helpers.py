@@ -0,0 +1,182 @@
+# Tests that the "other" message rows of the cypara loader, packed a whole
+# column at a time by para_helpers.pack_other_rows, are byte-identical to
+# those packed a row at a time by the create_packed_other_rows it replaced.
+# para_helpers is Cython (Python 2 language level), compiled by pyximport.
+
+import os, random, re, sys
+
+import numpy as np
+import pytest
+
+pd = pytest.importorskip("pandas")
+pyximport = pytest.importorskip("pyximport")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "01_Raw_Data_Handling", "cypara_sql_loader"))
+pyximport.install(language_level=2)
+
+from para_helpers import pack_other_rows
+
+# The row-wise packing replaced by pack_other_rows, as it was (less its
+# parse error message), for reference.
+def create_packed_other_rows(message_id_value, row_values):
+
+    #4_11
+    if(message_id_value in (4, 11)):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['raim_flag']), str(row_values['communication_state']), str(row_values['utc_year']), str(row_values['utc_month']), str(row_values['utc_day']), str(row_values['utc_hour']), str(row_values['utc_minute']), str(row_values['utc_second']), str(row_values['fixing_device']), str(row_values['transmission_control']), str(row_values['spare'])])
+
+    #6
+    elif(message_id_value == 6):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['sequence']), str(row_values['destination_id']), str(row_values['retransmit_flag']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['spare'])])
+
+    #7_13
+    elif(message_id_value in (7, 13)):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['destination_id_1']), str(row_values['sequence_1']), str(row_values['destination_id_2']), str(row_values['sequence_2']), str(row_values['destination_id_3']), str(row_values['sequence_3']), str(row_values['destination_id_4']), str(row_values['sequence_4']), str(row_values['spare'])])
+
+    #8
+    elif(message_id_value == 8):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['spare'])])
+
+    #9
+    elif(message_id_value == 9):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['sog']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['cog']), str(row_values['raim_flag']), str(row_values['communication_flag']), str(row_values['communication_state']), str(row_values['utc_second']), str(row_values['altitude']), str(row_values['altitude_sensor']), str(row_values['data_terminal']), str(row_values['mode']), str(row_values['spare'])])
+
+    #10
+    elif(message_id_value == 10):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['regional']), str(row_values['destination_id']), str(row_values['spare'])])
+
+    #12
+    elif(message_id_value == 12):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['sequence']), str(row_values['destination_id']), str(row_values['retransmit_flag']), str(row_values['safety_text']), str(row_values['non-standard_bits']), str(row_values['spare'])])
+
+    #14
+    elif(message_id_value == 14):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['safety_text']), str(row_values['non-standard_bits']), str(row_values['name_extension']), str(row_values['spare']), str(row_values['spare2'])])
+
+    #15
+    elif(message_id_value == 15):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['destination_id_1']), str(row_values['destination_id_2']), str(row_values['message_id_1_1']), str(row_values['offset_1_1']), str(row_values['message_id_1_2']), str(row_values['offset_1_2']), str(row_values['message_id_2_1']), str(row_values['offset_2_1']), str(row_values['spare'])])
+
+    #16
+    elif(message_id_value == 16):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['destination_id_a']), str(row_values['offset_a']), str(row_values['increment_a']), str(row_values['destination_id_b']), str(row_values['offsetb']), str(row_values['incrementb']), str(row_values['spare'])])
+
+    #17
+    elif(message_id_value == 17):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['regional']), str(row_values['data']), str(row_values['data_msg_type']), str(row_values['station_id']), str(row_values['z_count']), str(row_values['num_data_words']), str(row_values['health']), str(row_values['spare'])])
+
+    #19
+    elif(message_id_value == 19):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['vessel_name']), str(row_values['ship_type']), str(row_values['dimension_to_bow']), str(row_values['dimension_to_stern']), str(row_values['dimension_to_port']), str(row_values['dimension_to_starboard']), str(row_values['sog']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['cog']), str(row_values['heading']), str(row_values['regional']), str(row_values['raim_flag']), str(row_values['communication_flag']), str(row_values['communication_state']), str(row_values['utc_second']), str(row_values['fixing_device']), str(row_values['data_terminal']), str(row_values['mode']), str(row_values['unit_flag']), str(row_values['display']), str(row_values['dsc']), str(row_values['band']), str(row_values['msg22']), str(row_values['spare']), str(row_values['spare2'])])
+
+    #20
+    elif(message_id_value == 20):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['offset1']), str(row_values['num_slots1']), str(row_values['timeout1']), str(row_values['increment_1']), str(row_values['offset_2']), str(row_values['number_slots_2']), str(row_values['timeout_2']), str(row_values['increment_2']), str(row_values['offset_3']), str(row_values['number_slots_3']), str(row_values['timeout_3']), str(row_values['increment_3']), str(row_values['offset_4']), str(row_values['number_slots_4']), str(row_values['timeout_4']), str(row_values['increment_4']), str(row_values['spare'])])
+
+    #21
+    elif(message_id_value == 21):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['dimension_to_bow']), str(row_values['dimension_to_stern']), str(row_values['dimension_to_port']), str(row_values['dimension_to_starboard']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['raim_flag']), str(row_values['utc_second']), str(row_values['fixing_device']), str(row_values['mode']), str(row_values['name_extension']), str(row_values['name_extension_padding']), str(row_values['aton_type']), str(row_values['aton_name']), str(row_values['off_position']), str(row_values['aton_status']), str(row_values['virtual_aton']), str(row_values['channel_a']), str(row_values['spare']), str(row_values['spare2'])])
+
+    #22
+    elif(message_id_value == 22):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['channel_a']), str(row_values['channel_b']), str(row_values['tx_rx_mode']), str(row_values['power']), str(row_values['message_indicator']), str(row_values['channel_a_bandwidth']), str(row_values['channel_b_bandwidth']), str(row_values['transzone_size']), str(row_values['longitude_1']), str(row_values['latitude_1']), str(row_values['longitude_2']), str(row_values['latitude_2']), str(row_values['spare'])])
+
+    #23
+    elif(message_id_value == 23):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['ship_type']), str(row_values['tx_rx_mode']), str(row_values['longitude_1']), str(row_values['latitude_1']), str(row_values['longitude_2']), str(row_values['latitude_2']), str(row_values['station_type']), str(row_values['report_interval']), str(row_values['quiet_time']), str(row_values['spare'])])
+
+    #25
+    elif(message_id_value == 25):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['destination_id']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['destination_indicator']), str(row_values['binary_flag'])])
+
+    #26
+    elif(message_id_value == 26):
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['communication_flag']), str(row_values['communication_state']), str(row_values['destination_id']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['destination_indicator']), str(row_values['binary_flag'])])
+
+    else:
+
+        packed_data = "|".join([str(row_values['mmsi']), str(row_values['message_id']), str(row_values['repeat_indicator']), str(row_values['orig_date']), str(row_values['millisecond']), str(row_values['region']), str(row_values['country']), str(row_values['base_station']), str(row_values['online_data']), str(row_values['group_code']), str(row_values['sequence_id']), str(row_values['channel']), str(row_values['data_length']), str(row_values['vessel_name']), str(row_values['call_sign']), str(row_values['imo']), str(row_values['ship_type']), str(row_values['dimension_to_bow']), str(row_values['dimension_to_stern']), str(row_values['dimension_to_port']), str(row_values['dimension_to_starboard']), str(row_values['draught']), str(row_values['destination']), str(row_values['ais_version']), str(row_values['navigational_status']), str(row_values['rot']), str(row_values['sog']), str(row_values['accuracy']), str(row_values['longitude']), str(row_values['latitude']), str(row_values['cog']), str(row_values['heading']), str(row_values['regional']), str(row_values['maneuver']), str(row_values['raim_flag']), str(row_values['communication_flag']), str(row_values['communication_state']), str(row_values['utc_year']), str(row_values['utc_month']), str(row_values['utc_day']), str(row_values['utc_hour']), str(row_values['utc_minute']), str(row_values['utc_second']), str(row_values['fixing_device']), str(row_values['transmission_control']), str(row_values['eta_month']), str(row_values['eta_day']), str(row_values['eta_hour']), str(row_values['eta_minute']), str(row_values['sequence']), str(row_values['destination_id']), str(row_values['retransmit_flag']), str(row_values['country_code']), str(row_values['functional_id']), str(row_values['data']), str(row_values['destination_id_1']), str(row_values['sequence_1']), str(row_values['destination_id_2']), str(row_values['sequence_2']), str(row_values['destination_id_3']), str(row_values['sequence_3']), str(row_values['destination_id_4']), str(row_values['sequence_4']), str(row_values['altitude']), str(row_values['altitude_sensor']), str(row_values['data_terminal']), str(row_values['mode']), str(row_values['safety_text']), str(row_values['non-standard_bits']), str(row_values['name_extension']), str(row_values['name_extension_padding']), str(row_values['message_id_1_1']), str(row_values['offset_1_1']), str(row_values['message_id_1_2']), str(row_values['offset_1_2']), str(row_values['message_id_2_1']), str(row_values['offset_2_1']), str(row_values['destination_id_a']), str(row_values['offset_a']), str(row_values['increment_a']), str(row_values['destination_id_b']), str(row_values['offsetb']), str(row_values['incrementb']), str(row_values['data_msg_type']), str(row_values['station_id']), str(row_values['z_count']), str(row_values['num_data_words']), str(row_values['health']), str(row_values['unit_flag']), str(row_values['display']), str(row_values['dsc']), str(row_values['band']), str(row_values['msg22']), str(row_values['offset1']), str(row_values['num_slots1']), str(row_values['timeout1']), str(row_values['increment_1']), str(row_values['offset_2']), str(row_values['number_slots_2']), str(row_values['timeout_2']), str(row_values['increment_2']), str(row_values['offset_3']), str(row_values['number_slots_3']), str(row_values['timeout_3']), str(row_values['increment_3']), str(row_values['offset_4']), str(row_values['number_slots_4']), str(row_values['timeout_4']), str(row_values['increment_4']), str(row_values['aton_type']), str(row_values['aton_name']), str(row_values['off_position']), str(row_values['aton_status']), str(row_values['virtual_aton']), str(row_values['channel_a']), str(row_values['channel_b']), str(row_values['tx_rx_mode']), str(row_values['power']), str(row_values['message_indicator']), str(row_values['channel_a_bandwidth']), str(row_values['channel_b_bandwidth']), str(row_values['transzone_size']), str(row_values['longitude_1']), str(row_values['latitude_1']), str(row_values['longitude_2']), str(row_values['latitude_2']), str(row_values['station_type']), str(row_values['report_interval']), str(row_values['quiet_time']), str(row_values['part_number']), str(row_values['vendor_id']), str(row_values['mother_ship_mmsi']), str(row_values['destination_indicator']), str(row_values['binary_flag']), str(row_values['gnss_status']), str(row_values['spare']), str(row_values['spare2']), str(row_values['spare3']), str(row_values['spare4'])])
+
+    # Replace all instances of |nan| and |None| with ||. Perform in two passes to handle adjacent values.
+    packed_data = packed_data.replace('|nan|','||').replace('|nan|','||')
+    if packed_data.endswith('|nan'):
+        packed_data = packed_data[:-3]
+    packed_data = packed_data.replace('|None|','||').replace('|None|','||')
+    if packed_data.endswith('|None'):
+        packed_data = packed_data[:-4]
+
+    return packed_data
+
+# Every column read by the reference packing.
+COLUMNS = sorted(set(re.findall(r"row_values\['([^']+)'\]", open(__file__).read())))
+
+MESSAGE_TYPES = [4, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 19, 20, 21, 22, 23, 25, 26, 99]
+
+def other_frame(rows, seed):
+    "A frame of 'other' messages of every type, columns being integer, float or text with nulls (NaN or None), as read by the loader."
+    generator = random.Random(seed)
+    index = generator.sample(range(rows * 3), rows)
+    columns = {'message_id': [generator.choice(MESSAGE_TYPES) for row in range(rows)],
+               'unq_id_prefix': ['SE'] * rows,
+               'lineno': index}
+    for name in COLUMNS:
+        if name in columns:
+            continue
+        kind = generator.choice(('int', 'float', 'text', 'null'))
+        values = []
+        for row in range(rows):
+            if kind != 'int' and generator.random() < 0.3:
+                values.append(None if kind == 'text' and generator.random() < 0.5 else np.nan)
+            elif kind in ('int', 'null'):
+                values.append(generator.randrange(1000))
+            elif kind == 'float':
+                values.append(generator.randrange(-18000, 18000) / 100.0)
+            else:
+                values.append(generator.choice(['a', 'b c', '2019-01-15 00:00:01', 'nan', 'None x']))
+        if kind == 'text':
+            columns[name] = pd.Series(values, dtype=object)
+        elif kind == 'null':
+            columns[name] = pd.Series([np.nan] * rows)
+        else:
+            columns[name] = pd.Series(values)
+    frame = pd.DataFrame(columns)
+    frame.index = index
+    return frame
+
+def test_packed_as_row_wise():
+    frame = other_frame(600, 1)
+    expected = frame.apply(lambda row: create_packed_other_rows(row['message_id'], row), axis=1)
+    packed = pack_other_rows(frame)
+    assert list(packed.index) == list(frame.index)
+    assert packed.tolist() == expected.tolist()
+
+def test_adjacent_and_trailing_nulls():
+    frame = other_frame(len(MESSAGE_TYPES), 2)
+    frame['message_id'] = MESSAGE_TYPES
+    for name in COLUMNS:
+        if name not in ('message_id', 'unq_id_prefix', 'lineno', 'mmsi'):
+            frame[name] = pd.Series([None] * len(frame), index=frame.index, dtype=object)
+    frame.loc[frame.index[::2], 'spare'] = np.nan
+    expected = frame.apply(lambda row: create_packed_other_rows(row['message_id'], row), axis=1)
+    assert pack_other_rows(frame).tolist() == expected.tolist()
+
+def test_empty_frame():
+    frame = other_frame(0, 3)
+    assert len(pack_other_rows(frame)) == 0
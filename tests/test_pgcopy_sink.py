@@ -0,0 +1,74 @@
+# Tests of PGCopySink (nm4_decoder.py), streaming decoded messages into
+# Postgres by binary COPY, and of --pg on the eE parsing script, against a
+# local throwaway server (skipped if there is none).
+
+import io, os, subprocess, sys
+
+from nm4_decoder import PGCopySink, parse_ais_messages
+
+LINES = ("\\c:1554076800,s:sat1*67\\!AIVDM,1,1,,A,14eG71001ssPO>fJSenQj1Ht0000,0*55\n"
+         "\\c:1554076807,s:sat1*60\\!AIVDM,1,1,,A,14eG70P01ssB6rLIPC3Qj1Ht0000,0*42\n"
+         "\\c:1554076821,s:sat1*64\\!AIVDM,2,1,4,A,54eG71P2;=`0<H77;?AHE=<Dj3H0000000000016<PD:<51=NBj0C2APF000,0*08\n"
+         "\\g:2-2-4*00\\!AIVDM,2,2,4,A,00000000000,2*20\n"
+         "\\c:1554076828,s:sat1*6D\\!AIVDM,1,1,,A,B4eG7300=nnSp=6Vfq0p@eb4P000,0*71\n")
+
+def decoded_values():
+    "(msgtype, date, values by field name) of each message in LINES."
+    return [(cooked[0][1], date, dict([(inst.name, value) for (inst, value) in cooked]))
+            for (raw, cooked, bogon, date) in parse_ais_messages(io.StringIO(LINES), skiperr=True)]
+
+def drop_tables(cursor, prefix):
+    cursor.execute("SELECT tablename FROM pg_tables WHERE tablename LIKE %s", (prefix + "%",))
+    for (table,) in cursor.fetchall():
+        cursor.execute("DROP TABLE " + table)
+
+def test_sink_rows_read_back(pg_connect_string, pg_cursor):
+    prefix = "ais_test_sink_%d_" % os.getpid()
+    sink = PGCopySink(pg_connect_string, prefix, batch_rows=1)
+    try:
+        for (raw, cooked, bogon, date) in parse_ais_messages(io.StringIO(LINES), skiperr=True):
+            sink.write(cooked, date)
+        sink.commit()
+        sink.close()
+        for (msgtype, date, values) in decoded_values():
+            pg_cursor.execute("SELECT date, mmsi, msgtype FROM " + prefix + "msg" + str(msgtype) + " WHERE date = %s", (date,))
+            assert pg_cursor.fetchall() == [(date, values['mmsi'], msgtype)]
+        pg_cursor.execute("SELECT lon, lat, speed FROM " + prefix + "msg1 ORDER BY date")
+        assert pg_cursor.fetchall() == [(values['lon'], values['lat'], values['speed']) for (msgtype, date, values) in decoded_values() if msgtype == 1]
+        pg_cursor.execute("SELECT shipname FROM " + prefix + "msg5")
+        assert pg_cursor.fetchall() == [(values['shipname'],) for (msgtype, date, values) in decoded_values() if msgtype == 5]
+    finally:
+        drop_tables(pg_cursor, prefix)
+
+def test_sink_rollback_discards(pg_connect_string, pg_cursor):
+    prefix = "ais_test_rollback_%d_" % os.getpid()
+    sink = PGCopySink(pg_connect_string, prefix)
+    try:
+        for (raw, cooked, bogon, date) in parse_ais_messages(io.StringIO(LINES), skiperr=True):
+            sink.write(cooked, date)
+        sink.rollback()
+        sink.close()
+        pg_cursor.execute("SELECT count(*) FROM pg_tables WHERE tablename LIKE %s", (prefix + "%",))
+        assert pg_cursor.fetchone() == (0,)
+    finally:
+        drop_tables(pg_cursor, prefix)
+
+def test_ee_script_pg(pg_connect_string, pg_cursor, tmp_path):
+    prefix = "ais_test_script_%d_" % os.getpid()
+    pg_cursor.execute("SELECT current_setting('port'), current_database(), current_user")
+    (port, dbname, user) = pg_cursor.fetchone()
+    host = pg_cursor.connection.get_dsn_parameters().get('host', 'localhost')
+    connect_file = tmp_path / "connect.txt"
+    connect_file.write_text(":".join([host, port, dbname, user, os.environ.get("PGPASSWORD", "")]) + "\n")
+    in_file = tmp_path / "in.nm4"
+    in_file.write_text(LINES)
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "01_Raw_Data_Handling", "0_gpsd_eE_ais_NM4_parsing.py")
+    try:
+        output = subprocess.check_output([sys.executable, script, "--pg=" + str(connect_file) + "," + prefix, "-f", str(in_file)])
+        assert output == b""
+        pg_cursor.execute("SELECT date, mmsi FROM " + prefix + "msg1 ORDER BY date")
+        assert pg_cursor.fetchall() == [(date, values['mmsi']) for (msgtype, date, values) in decoded_values() if msgtype == 1]
+        pg_cursor.execute("SELECT count(*) FROM " + prefix + "msg5")
+        assert pg_cursor.fetchone() == (1,)
+    finally:
+        drop_tables(pg_cursor, prefix)
@@ -0,0 +1,50 @@
+# Tests of PGTextCopySink (pgcopy_text.py), streaming text COPY lines into a
+# table in batched transactions, against a local throwaway server (skipped
+# if there is none).
+
+import os
+
+from pgcopy_text import PGTextCopySink, escape_text
+
+def test_escape_text():
+    assert escape_text("a\\b\tc\nd\re") == "a\\\\b\\tc\\nd\\re"
+
+def test_bad_line_rejected(pg_connect_string, pg_cursor):
+    table = "ais_test_text_%d" % os.getpid()
+    pg_cursor.execute("CREATE TABLE " + table + " (lineno integer, name text)")
+    try:
+        sink = PGTextCopySink(pg_connect_string, table, batch_rows=8)
+        # Lines written in pieces, as the splitting scripts may, with one
+        # line the table will not accept in the middle of the batch.
+        lines = ["%d\tname %d\n" % (lineno, lineno) for lineno in range(1, 11)]
+        lines[4] = "five\tbad\n"
+        sink.write("".join(lines[:3]) + lines[3][:2])
+        sink.write(lines[3][2:])
+        sink.writelines(lines[4:])
+        sink.close()
+        assert (sink.sent, sink.rejected) == (9, 1)
+        assert sink.retried > 0
+        pg_cursor.execute("SELECT lineno, name FROM " + table + " ORDER BY lineno")
+        assert pg_cursor.fetchall() == [(lineno, "name %d" % lineno) for lineno in range(1, 11) if lineno != 5]
+        pg_cursor.execute("SELECT line, error FROM " + table + "_reject")
+        rejects = pg_cursor.fetchall()
+        assert [line for (line, error) in rejects] == ["five\tbad"]
+        assert "integer" in rejects[0][1]
+    finally:
+        pg_cursor.execute("DROP TABLE IF EXISTS " + table)
+        pg_cursor.execute("DROP TABLE IF EXISTS " + table + "_reject")
+
+def test_partial_last_line_sent(pg_connect_string, pg_cursor):
+    table = "ais_test_partial_%d" % os.getpid()
+    pg_cursor.execute("CREATE TABLE " + table + " (lineno integer, name text)")
+    try:
+        sink = PGTextCopySink(pg_connect_string, table)
+        sink.write("1\tone\n2\ttwo")
+        sink.close()
+        assert (sink.sent, sink.rejected) == (2, 0)
+        pg_cursor.execute("SELECT count(*) FROM " + table)
+        assert pg_cursor.fetchone() == (2,)
+        pg_cursor.execute("SELECT count(*) FROM pg_tables WHERE tablename = %s", (table + "_reject",))
+        assert pg_cursor.fetchone() == (0,)
+    finally:
+        pg_cursor.execute("DROP TABLE IF EXISTS " + table)
@@ -0,0 +1,102 @@
+# Tests that the ways of running the splitting scripts (serial, --columnar
+# and a process pool with -p) write the same output, unique IDs included,
+# for an input with the malformed values (and line endings) the columnar parse
+# must match.
+
+import os, random, subprocess, sys
+
+import pytest
+
+SCRIPT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "01_Raw_Data_Handling")
+
+# One pre-parsed line of each message type, as dmas.uvic.ca (or the tower network) gives them.
+TEMPLATES = [
+    "20190401T%s.000Z|1|0|3160000%02d|0|0|123|1|-39567330|26250728|456|44|30|0|0|0",
+    "20190401T%s.000Z|5|0|3160000%02d|0|9123456|CFA1234|VESSEL 1|70|100|20|10|12|1|4|2|13|30|75|HALIFAX|0",
+    "20190401T%s.000Z|18|0|3160000%02d|0|55|0|-35889327|26330729|900|91|20|0|1|0|0|1|0|0|0|0",
+    "20190401T%s.000Z|19|0|3160000%02d|0|35|0|-37656353|25007211|1800|180|10|0|PLEASURE ONE|37|10|5|2|2|1|0|0|0",
+    "20190401T%s.000Z|24|0|3160000%02d|1|36|VEND|VC1234|5|4|1|1",
+    "20190401T%s.000Z|27|0|3160000%02d|1|0|0|-40142|27830|10|200|0",
+    ]
+
+# Malformed values, each set into (or cut from) the tokens of a line.
+MUTATIONS = [
+    lambda t: t.__setitem__(8, "1.5E2.0"),
+    lambda t: t.__setitem__(9, "-4E+1.25"),
+    lambda t: t.__setitem__(8, "abc"),
+    lambda t: t.__setitem__(9, " 45.5 "),
+    lambda t: t.__setitem__(8, "nan"),
+    lambda t: t.__setitem__(1, " 1"),
+    lambda t: t.__setitem__(0, "20190401X000000.000Z"),
+    lambda t: t.__setitem__(3, "31600000000"),
+    lambda t: t.__setitem__(3, "mmsi"),
+    lambda t: t.__setitem__(5, "a\\b"),
+    lambda t: t.__setitem__(7, "\\N"),
+    lambda t: t.__setitem__(7, "V\u00c9SSEL"),
+    lambda t: t.__setitem__(8, "-.5"),
+    lambda t: t.__setitem__(1, "0" + t[1]),
+    lambda t: t.__delitem__(slice(10, None)),
+    lambda t: t.append("extra"),
+    ]
+
+# Message types the ONC splitter flags, but which abort the tT splitter.
+TYPE_MUTATIONS = [
+    lambda t: t.__setitem__(1, "x"),
+    lambda t: t.__setitem__(1, "1.5"),
+    ]
+
+def write_input(path, count, seed, templates, mutations, end="\n", rate=0.2):
+    "Write count lines of mixed message types, a rate of them malformed (and some ending in CRLF), to path."
+    generator = random.Random(seed)
+    lines = []
+    for index in range(count):
+        when = "%02d%02d%02d" % (index // 3600 % 24, index // 60 % 60, index % 60)
+        tokens = (generator.choice(templates) % (when, generator.randrange(20))).split("|")
+        if generator.random() < rate:
+            generator.choice(mutations)(tokens)
+        line = "|".join(tokens)
+        if generator.random() < 0.02:
+            line = "  " + line + " \t"
+        if generator.random() < 0.02:
+            line += "\r"
+        lines.append(line)
+    path.write_text("\n".join(lines) + end, encoding="utf-8")
+
+def split(tmp_path, script, options, inputs, name):
+    "Run a splitting script on the inputs, returning its output file's contents."
+    output = tmp_path / name
+    subprocess.check_output([sys.executable, os.path.join(SCRIPT_DIR, script)] + options + ["20190401", str(output)] + [str(path) for path in inputs])
+    return output.read_bytes()
+
+@pytest.fixture
+def inputs(tmp_path):
+    paths = [tmp_path / "in1.txt", tmp_path / "in2.txt"]
+    write_input(paths[0], 500, 1, TEMPLATES, MUTATIONS + TYPE_MUTATIONS, end="")
+    write_input(paths[1], 137, 2, TEMPLATES, MUTATIONS + TYPE_MUTATIONS)
+    return paths
+
+@pytest.fixture
+def tt_inputs(tmp_path):
+    paths = [tmp_path / "tt1.txt", tmp_path / "tt2.txt"]
+    write_input(paths[0], 500, 3, TEMPLATES[:2], MUTATIONS)
+    write_input(paths[1], 137, 4, TEMPLATES[:2], MUTATIONS)
+    return paths
+
+@pytest.mark.parametrize("options", [["--columnar"], ["--columnar", "--chunk-lines=7"], ["-p", "3"]])
+def test_onc_modes_agree(tmp_path, inputs, options):
+    script = "1_split_ONC_AIS_for_PG_base_table_w_parsing.py"
+    serial = split(tmp_path, script, [], inputs, "serial.txt")
+    assert serial.count(b"\n") > 200
+    assert split(tmp_path, script, options, inputs, "other.txt") == serial
+
+def test_onc_binary_pool_agrees(tmp_path, inputs):
+    script = "1_split_ONC_AIS_for_PG_base_table_w_parsing.py"
+    serial = split(tmp_path, script, ["--format=pgbinary"], inputs, "serial.bin")
+    assert split(tmp_path, script, ["--format=pgbinary", "-p", "2"], inputs, "pool.bin") == serial
+
+@pytest.mark.parametrize("processes", ["1", "3"])
+def test_tt_pool_agrees(tmp_path, tt_inputs, processes):
+    script = "1_split_tT_AIS_for_PG_base_table_w_parsing.py"
+    serial = split(tmp_path, script, ["H"], tt_inputs, "serial.txt")
+    assert serial.count(b"\n") > 600
+    assert split(tmp_path, script, ["-p", processes, "H"], tt_inputs, "pool.txt") == serial